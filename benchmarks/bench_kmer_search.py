@@ -0,0 +1,129 @@
+"""
+Compare k-mer indexed motif search against the LIKE scan search_db falls back to.
+
+Run from the repository root:
+    python benchmarks/bench_kmer_search.py --sequences 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.kmer_index import configured_kmer_index, ensure_kmer_tables, index_sequences, find_motif_ids
+from modules.utils import set_state
+
+SCHEMA = """
+    CREATE TABLE GenomicData (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lab_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT,
+        seq_order INTEGER,
+        UNIQUE(lab_id, key)
+    )
+"""
+
+
+def build_database(engine, n_sequences, mean_length, k, batch_size=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    alphabet = np.frombuffer(b"ACGT", dtype=np.uint8)
+    with engine.begin() as connection:
+        connection.execute(text(SCHEMA))
+        ensure_kmer_tables(connection)
+        set_state(connection, "kmer_index_k", str(k))
+        set_state(connection, "kmer_index_complete", "1")
+
+    sample = []
+    next_id = 1
+    for batch_start in range(0, n_sequences, batch_size):
+        n = min(batch_size, n_sequences - batch_start)
+        lengths = np.maximum(rng.normal(mean_length, mean_length / 5, n).astype(int), k)
+        bases = alphabet[rng.integers(0, 4, lengths.sum())].tobytes().decode()
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        rows = [
+            {"id": next_id + i, "lab_id": f"UL{(batch_start + i) // 1000:05d}",
+             "key": f"read{batch_start + i}", "value": bases[offsets[i]:offsets[i + 1]], "seq_order": i}
+            for i in range(n)
+        ]
+        with engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (id, lab_id, key, value, seq_order)
+                VALUES (:id, :lab_id, :key, :value, :seq_order)
+            """), rows)
+            index_sequences(connection, [(row["id"], row["value"]) for row in rows], k)
+        sample.append(rows[0]["value"])
+        next_id += n
+        print(f"  loaded {batch_start + n:,} / {n_sequences:,} sequences", end="\r", flush=True)
+    print()
+    return sample
+
+
+def time_query(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", type=int, default=1_000_000)
+    parser.add_argument("--length", type=int, default=150, help="mean sequence length")
+    parser.add_argument("--motif-length", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--db", help="database path (default: a temporary file)")
+    args = parser.parse_args()
+
+    _, k = configured_kmer_index()
+    workdir = None
+    if args.db is None:
+        workdir = tempfile.TemporaryDirectory()
+        args.db = os.path.join(workdir.name, "kmer_bench.sqlite")
+    engine = create_engine(f"sqlite:///{args.db}")
+
+    print(f"Building {args.sequences:,} sequences (mean length {args.length}, k={k})...")
+    start = time.perf_counter()
+    sample = build_database(engine, args.sequences, args.length, k)
+    print(f"Load + index: {time.perf_counter() - start:.1f}s, "
+          f"database size {os.path.getsize(args.db) / 1e6:,.0f} MB")
+
+    rng = np.random.default_rng(2)
+    like_query = text("SELECT id FROM GenomicData WHERE value LIKE :kw ORDER BY id")
+    indexed_times, like_times = [], []
+    for seq in [sample[i % len(sample)] for i in range(args.queries)]:
+        offset = int(rng.integers(0, max(len(seq) - args.motif_length, 1)))
+        motif = seq[offset:offset + args.motif_length]
+        with engine.connect() as connection:
+            indexed, indexed_ids = time_query(lambda: find_motif_ids(connection, motif), args.repeats)
+            like, like_ids = time_query(
+                lambda: [row[0] for row in connection.execute(like_query, {"kw": f"%{motif}%"})], args.repeats
+            )
+        if indexed_ids != like_ids:
+            raise AssertionError(f"Indexed and LIKE results differ for motif {motif}")
+        indexed_times.append(indexed)
+        like_times.append(like)
+
+    indexed_ms = statistics.median(indexed_times) * 1000
+    like_ms = statistics.median(like_times) * 1000
+    print(f"\nMedian latency over {args.queries} motifs of length {args.motif_length}:")
+    print(f"  k-mer index: {indexed_ms:10.2f} ms")
+    print(f"  LIKE scan:   {like_ms:10.2f} ms")
+    print(f"  speedup:     {like_ms / indexed_ms:10.1f}x")
+
+    engine.dispose()
+    if workdir is not None:
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
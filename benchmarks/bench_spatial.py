@@ -0,0 +1,127 @@
+"""
+Compare R*Tree radius search against a full scan of sample coordinates.
+
+Run from the repository root:
+    python benchmarks/bench_spatial.py --samples 200000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.spatial import (ensure_sample_locations, refresh_sample_locations, radius_boxes,
+                             bbox_candidates, haversine_km)
+
+SCHEMA = """
+    CREATE TABLE MetadataWide (
+        lab_id TEXT PRIMARY KEY,
+        latitude REAL,
+        longitude REAL
+    )
+"""
+
+
+def build_database(engine, n_samples, batch_size=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    with engine.begin() as connection:
+        connection.execute(text(SCHEMA))
+        ensure_sample_locations(connection)
+    for batch_start in range(0, n_samples, batch_size):
+        n = min(batch_size, n_samples - batch_start)
+        # Uniform over the sphere, so density does not pile up at the poles
+        lats = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+        lons = rng.uniform(-180, 180, n)
+        rows = [{"lab_id": f"UL{batch_start + i:07d}", "lat": float(lats[i]), "lon": float(lons[i])}
+                for i in range(n)]
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO MetadataWide VALUES (:lab_id, :lat, :lon)"), rows)
+            refresh_sample_locations(connection, [row["lab_id"] for row in rows])
+        print(f"  loaded {batch_start + n:,} / {n_samples:,} samples", end="\r", flush=True)
+    print()
+
+
+def rtree_radius(connection, lat, lon, radius_km):
+    found = set()
+    for box in radius_boxes(lat, lon, radius_km):
+        for lab_id, sample_lat, sample_lon in bbox_candidates(connection, *box):
+            if haversine_km(lat, lon, sample_lat, sample_lon) <= radius_km:
+                found.add(lab_id)
+    return found
+
+
+def scan_radius(connection, lat, lon, radius_km):
+    rows = connection.execute(text("""
+        SELECT lab_id, latitude, longitude FROM MetadataWide
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """))
+    return {lab_id for lab_id, sample_lat, sample_lon in rows
+            if haversine_km(lat, lon, sample_lat, sample_lon) <= radius_km}
+
+
+def time_query(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--radius", type=float, default=250.0, help="search radius in km")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--db", help="database path (default: a temporary file)")
+    args = parser.parse_args()
+
+    workdir = None
+    if args.db is None:
+        workdir = tempfile.TemporaryDirectory()
+        args.db = os.path.join(workdir.name, "spatial_bench.sqlite")
+    engine = create_engine(f"sqlite:///{args.db}")
+
+    print(f"Building {args.samples:,} sample locations...")
+    start = time.perf_counter()
+    build_database(engine, args.samples)
+    print(f"Load + index: {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(2)
+    centres = [(float(np.degrees(np.arcsin(rng.uniform(-1, 1)))), float(rng.uniform(-180, 180)))
+               for _ in range(args.queries)]
+    # Always include a query that straddles the antimeridian
+    centres[0] = (0.0, 179.9)
+    rtree_times, scan_times, hits = [], [], []
+    with engine.connect() as connection:
+        for lat, lon in centres:
+            rtree, rtree_ids = time_query(lambda: rtree_radius(connection, lat, lon, args.radius), args.repeats)
+            scan, scan_ids = time_query(lambda: scan_radius(connection, lat, lon, args.radius), args.repeats)
+            if rtree_ids != scan_ids:
+                raise AssertionError(f"R*Tree and scan results differ around ({lat}, {lon})")
+            rtree_times.append(rtree)
+            scan_times.append(scan)
+            hits.append(len(rtree_ids))
+
+    rtree_ms = statistics.median(rtree_times) * 1000
+    scan_ms = statistics.median(scan_times) * 1000
+    print(f"\nMedian latency over {args.queries} radius queries of {args.radius:g} km "
+          f"(median {statistics.median(hits):g} hits):")
+    print(f"  R*Tree:    {rtree_ms:10.2f} ms")
+    print(f"  full scan: {scan_ms:10.2f} ms")
+    print(f"  speedup:   {scan_ms / rtree_ms:10.1f}x")
+
+    engine.dispose()
+    if workdir is not None:
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure how long main.py takes to show its menu, and where import time goes.
+
+Uses `python -X importtime` for a per-module breakdown and times a real
+start-to-menu run (choosing Exit straight away). Exits non-zero if the
+median time to the menu exceeds --target seconds.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py --target 0.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXIT_CHOICE = "12\n"
+
+
+def import_times(module):
+    """Return [(cumulative_us, self_us, name)] from python -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def time_to_menu(repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "main.py"], cwd=ROOT, input=EXIT_CHOICE,
+                       capture_output=True, text=True, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--target", type=float, default=0.5, help="maximum median seconds to the menu")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--module", action="append", default=[],
+                        help="also report the import cost of this module (repeatable)")
+    args = parser.parse_args()
+
+    rows = import_times("main")
+    print(f"Interpreter start-up plus main imports: {sum(self_us for _, self_us, _ in rows) / 1000:.1f} ms")
+    print("Slowest imports (cumulative):")
+    for cumulative_us, _, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    # What the first search or import pays when it loads its modules
+    for module in args.module or ["modules.search", "modules.data_import"]:
+        total = sum(self_us for _, self_us, _ in import_times(module))
+        print(f"Importing {module}: {total / 1000:.1f} ms (paid on first use)")
+
+    timings = time_to_menu(args.repeats)
+    median = statistics.median(timings)
+    print(f"\nTime to menu: median {median * 1000:.0f} ms over {args.repeats} runs "
+          f"(min {min(timings) * 1000:.0f} ms, target {args.target * 1000:.0f} ms)")
+    if median > args.target:
+        print("Startup is slower than the target.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+End-to-end benchmark of import, search, export and delete on a synthetic
+dataset (see benchmarks/synthetic.py), run against a throwaway database.
+
+Results are written as JSON. With --baseline, each timing is compared with a
+stored run and the script exits non-zero if any got slower by more than
+--threshold (default 25%).
+
+Run from the repository root:
+    python benchmarks/run_suite.py --lab-ids 200 --sequences 50 --output bench.json
+    python benchmarks/run_suite.py --baseline bench.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yaml
+
+# Timings below this many seconds are too noisy to flag as regressions
+NOISE_FLOOR = 0.005
+
+
+def prepare_workspace(workdir):
+    """
+    Copy config/ into workdir with the database pointed at a fresh file, and
+    make workdir the current directory so every module uses that database.
+    """
+    os.makedirs(os.path.join(workdir, "config"))
+    with open(os.path.join(ROOT, "config", "config.yaml")) as file:
+        config = yaml.safe_load(file)
+    config["database"]["path"] = os.path.join(workdir, "bench.sqlite")
+    config.setdefault("search", {})["cache_path"] = ""
+    with open(os.path.join(workdir, "config", "config.yaml"), "w") as file:
+        yaml.safe_dump(config, file)
+    shutil.copy(os.path.join(ROOT, "config", "schema.yaml"), os.path.join(workdir, "config", "schema.yaml"))
+    os.chdir(workdir)
+
+    from modules.utils import clear_config_cache
+    clear_config_cache()
+
+
+def timed(fn, repeats=1):
+    """Run fn quietly `repeats` times; return (median seconds, all runs, last result)."""
+    runs, result = [], None
+    for _ in range(repeats):
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - start)
+    return statistics.median(runs), runs, result
+
+
+def run_suite(dataset, repeats):
+    from modules.migrations import migrate
+    from modules.data_import import import_metadata, import_fasta
+    from modules.search import search_db
+    from modules.export_utils import export_metadata, export_sequences
+    from modules.delete import delete_lab_id
+    from modules.utils import load_schema
+
+    migrate(verbose=False)
+    results = {}
+
+    def record(name, seconds, runs, **extra):
+        results[name] = {"seconds": round(seconds, 6), "runs": [round(run, 6) for run in runs], **extra}
+        print(f"  {name:<18} {seconds * 1000:10.1f} ms")
+
+    seconds, runs, _ = timed(lambda: import_metadata(dataset["metadata"]))
+    record("import_metadata", seconds, runs, rows_per_sec=round(dataset["lab_ids"] * len(load_schema()["metadata_columns"]) / seconds))
+
+    fasta = list(dataset["fasta"].items())
+    seconds, runs, _ = timed(lambda: [import_fasta(path, lab_id=lab) for lab, path in fasta])
+    record("import_fasta", seconds, runs, mbases_per_sec=round(dataset["bases"] / seconds / 1e6, 2))
+
+    labs = [lab for lab, _ in fasta]
+    probe = labs[len(labs) // 2]
+    for name, keyword in (("search_lab_id", probe), ("search_keyword", dataset["keyword"]),
+                          ("search_motif", dataset["motif"])):
+        seconds, runs, found = timed(lambda: search_db(keyword, use_cache=False), repeats)
+        record(name, seconds, runs, results=0 if found is None else len(found))
+
+    seconds, runs, rows = timed(lambda: export_sequences("export.fasta.gz", "fasta"))
+    record("export_fasta", seconds, runs, rows=rows)
+    seconds, runs, rows = timed(lambda: export_metadata("export.csv", "csv"))
+    record("export_metadata", seconds, runs, rows=rows)
+
+    victims = iter(labs[:repeats])
+    seconds, runs, _ = timed(lambda: delete_lab_id(next(victims)), min(repeats, len(labs)))
+    record("delete_lab_id", seconds, runs)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison with a baseline run and return the names that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':<18} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:<18} {'-':>10} {result['seconds'] * 1000:9.1f}ms {'new':>8}")
+            continue
+        old, new = before["seconds"], result["seconds"]
+        change = (new - old) / old if old > 0 else 0.0
+        flag = ""
+        if change > threshold and new - old > NOISE_FLOOR:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<18} {old * 1000:9.1f}ms {new * 1000:9.1f}ms {change:+7.0%}{flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lab-ids", type=int, default=200)
+    parser.add_argument("--sequences", type=int, default=50, help="sequences per lab ID")
+    parser.add_argument("--length", type=int, default=1500, help="mean sequence length")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5, help="runs per search and delete benchmark")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    from benchmarks.synthetic import generate_dataset
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Generating {args.lab_ids} lab IDs x {args.sequences} sequences (seed {args.seed})...")
+        dataset = generate_dataset(os.path.join(workdir, "data"), args.lab_ids, args.sequences,
+                                   args.length, args.seed)
+        prepare_workspace(os.path.join(workdir, "run"))
+        try:
+            results = run_suite(dataset, args.repeats)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "lab_ids": args.lab_ids,
+            "sequences": dataset["sequences"],
+            "bases": dataset["bases"],
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nWrote {output}")
+
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        if baseline.get("meta", {}).get("sequences") != report["meta"]["sequences"]:
+            print("Warning: the baseline was run at a different scale.")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmarks slower than the baseline by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Generate a synthetic dataset shaped like the lab's real data: one metadata
+sheet with every schema.yaml column and one FASTA file per lab ID.
+
+Run from the repository root:
+    python benchmarks/synthetic.py out_dir --lab-ids 200 --sequences 50
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.utils import load_schema
+
+TAXA = ["Mortierella elongata", "Mortierella alpina", "Umbelopsis isabellina", "Linnemannia gamsii",
+        "Mucor circinelloides", "Rhizopus arrhizus", "Fusarium oxysporum", "Penicillium chrysogenum"]
+BACTERIA = ["Burkholderia sp.", "Mycoavidus cysteinexigens", "Pseudomonas fluorescens", "Bacillus subtilis"]
+METHODS = ["CTAB", "Qiagen DNeasy", "Zymo Quick-DNA", "Phenol-chloroform"]
+PEOPLE = ["Dr. Smith", "Dr. Jones", "A. Rivera", "K. Chen", "M. Okafor"]
+PROJECTS = ["NSF grant", "USDA seed", "Internal", ""]
+
+# A motif planted in a known share of sequences, so motif searches have hits
+MOTIF = "GATTACAGGCTTAACCGGTA"
+MOTIF_RATE = 0.02
+
+
+def lab_id(i):
+    return f"UL{i:05d}"
+
+
+def metadata_sheet(n_lab_ids, rng):
+    """Return a DataFrame with one row per lab ID and every schema.yaml column."""
+    n = n_lab_ids
+    start = date(2022, 1, 1)
+    values = {
+        "Uehling Lab ID": [lab_id(i) for i in range(n)],
+        "Sample Location Plate": [f"P{i // 96 + 1}-{'ABCDEFGH'[i % 8]}{i % 12 + 1}" for i in range(n)],
+        "GC3F Submission Sample ID": [f"GC{i:06d}" for i in range(n)],
+        "Alternate ID 1": [f"ALT{i}" for i in range(n)],
+        "Alternate ID 2": [f"B{rng.integers(1, 10**6)}" for _ in range(n)],
+        "Lab Unique ID 3": [f"LU{i:05d}" for i in range(n)],
+        "Extracted by": rng.choice(PEOPLE, n),
+        "Top ITS Blast Hit": rng.choice(TAXA, n),
+        "ITS Top Hit Similarity": np.round(rng.uniform(85, 100, n), 2),
+        "ITS Taxonomy Comments": rng.choice(["", "possible new species", "contaminated plate", "confirmed"], n),
+        "Top 16S Blast Hit": rng.choice(BACTERIA, n),
+        "16S Top Hit Similarity": np.round(rng.uniform(80, 100, n), 2),
+        "16S Taxonomy Comments": rng.choice(["", "endosymbiont", "free-living"], n),
+        "Project Funding": rng.choice(PROJECTS, n),
+        "Latitude": np.round(np.degrees(np.arcsin(rng.uniform(-1, 1, n))), 5),
+        "Longitude": np.round(rng.uniform(-180, 180, n), 5),
+        "Location ID": [f"LOC{rng.integers(1, 500)}" for _ in range(n)],
+        "DNA Extraction Method": rng.choice(METHODS, n),
+        "Extraction Date": [start + timedelta(days=int(d)) for d in rng.integers(0, 1000, n)],
+    }
+    columns = load_schema()["metadata_columns"]
+    return pd.DataFrame({col: values.get(col, [f"{col} {i}" for i in range(n)]) for col in columns})
+
+
+def sequence_lengths(n, mean_length, rng):
+    """Log-normal read/contig lengths (long right tail), clipped to [50, 50 * mean]."""
+    sigma = 0.6
+    mu = np.log(mean_length) - sigma ** 2 / 2
+    return np.clip(rng.lognormal(mu, sigma, n), 50, 50 * mean_length).astype(int)
+
+
+def write_fasta(path, lab, n_sequences, mean_length, rng):
+    """Write one lab ID's FASTA file (60-column lines). Returns the number of bases."""
+    alphabet = np.frombuffer(b"ACGT", dtype=np.uint8)
+    lengths = sequence_lengths(n_sequences, mean_length, rng)
+    bases = 0
+    with open(path, "w") as handle:
+        for i, length in enumerate(lengths):
+            seq = alphabet[rng.integers(0, 4, length)].tobytes().decode()
+            if length > len(MOTIF) and rng.random() < MOTIF_RATE:
+                at = int(rng.integers(0, length - len(MOTIF)))
+                seq = seq[:at] + MOTIF + seq[at + len(MOTIF):]
+            handle.write(f">{lab}_contig{i} length={length}\n")
+            for j in range(0, length, 60):
+                handle.write(seq[j:j + 60] + "\n")
+            bases += int(length)
+    return bases
+
+
+def generate_dataset(out_dir, n_lab_ids, sequences_per_lab, mean_length=1500, seed=1):
+    """
+    Write metadata.xlsx and fasta/<lab_id>.fasta under out_dir.
+    Returns a description of what was generated.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(out_dir, "fasta"), exist_ok=True)
+    sheet = metadata_sheet(n_lab_ids, rng)
+    metadata_path = os.path.join(out_dir, "metadata.xlsx")
+    sheet.to_excel(metadata_path, index=False)
+
+    fasta_paths, bases = {}, 0
+    for i in range(n_lab_ids):
+        lab = lab_id(i)
+        path = os.path.join(out_dir, "fasta", f"{lab}.fasta")
+        bases += write_fasta(path, lab, sequences_per_lab, mean_length, rng)
+        fasta_paths[lab] = path
+    return {
+        "metadata": metadata_path,
+        "fasta": fasta_paths,
+        "lab_ids": n_lab_ids,
+        "sequences": n_lab_ids * sequences_per_lab,
+        "bases": bases,
+        "motif": MOTIF,
+        "keyword": TAXA[0].split()[0],
+        "seed": seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--lab-ids", type=int, default=200)
+    parser.add_argument("--sequences", type=int, default=50, help="sequences per lab ID")
+    parser.add_argument("--length", type=int, default=1500, help="mean sequence length")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    info = generate_dataset(args.out_dir, args.lab_ids, args.sequences, args.length, args.seed)
+    print(f"Wrote {info['lab_ids']} lab IDs and {info['sequences']} sequences "
+          f"({info['bases']:,} bases) to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,142 @@
+-- Current schema for reference. Existing databases are brought up to date by
+-- modules/migrations.py (run automatically at startup).
+
 -- Metadata Table
 CREATE TABLE Metadata (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     lab_id TEXT NOT NULL,
     key TEXT NOT NULL,
     value TEXT,
+    file_uploaded DATETIME DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(lab_id, key)
 );
 
+CREATE INDEX idx_metadata_key_value ON Metadata (key, value);
+CREATE INDEX idx_metadata_file_uploaded ON Metadata (file_uploaded);
+
 -- GenomicData Table
 CREATE TABLE GenomicData (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     lab_id TEXT NOT NULL,
     key TEXT NOT NULL,
     value TEXT,
+    seq_order INTEGER,
+    file_uploaded DATETIME DEFAULT CURRENT_TIMESTAMP,
+    seq_length INTEGER,
+    seq_hash TEXT,
     UNIQUE(lab_id, key)
-);
\ No newline at end of file
+);
+
+CREATE INDEX idx_genomic_lab_order ON GenomicData (lab_id, seq_order);
+CREATE INDEX idx_genomic_file_uploaded ON GenomicData (file_uploaded);
+CREATE INDEX idx_genomic_lab_length ON GenomicData (lab_id, seq_length);
+CREATE INDEX idx_genomic_seq_hash ON GenomicData (seq_hash);
+
+-- SequenceBlob (content-addressed sequence bodies shared by GenomicData rows
+-- through seq_hash; refcount = number of referencing rows)
+CREATE TABLE SequenceBlob (
+    hash TEXT PRIMARY KEY,
+    value,
+    length INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0
+);
+
+-- ImportCheckpoint Table (resume point for streaming FASTA imports)
+CREATE TABLE ImportCheckpoint (
+    file_path TEXT NOT NULL,
+    lab_id TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    seq_order INTEGER NOT NULL,
+    updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+    fingerprint TEXT,
+    PRIMARY KEY (file_path, lab_id)
+);
+
+
+-- DbState Table (database-wide bookkeeping such as index status)
+CREATE TABLE DbState (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- KmerIndex Table (k-mer -> sequence postings for motif search)
+CREATE TABLE KmerIndex (
+    kmer INTEGER NOT NULL,
+    seq_id INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (kmer, seq_id)
+) WITHOUT ROWID;
+
+-- MetadataFTS (FTS5 full-text index over Metadata, kept in sync by triggers)
+CREATE VIRTUAL TABLE MetadataFTS USING fts5(
+    lab_id, key, value,
+    content='Metadata', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER Metadata_fts_insert AFTER INSERT ON Metadata BEGIN
+    INSERT INTO MetadataFTS (rowid, lab_id, key, value)
+    VALUES (new.id, new.lab_id, new.key, new.value);
+END;
+
+CREATE TRIGGER Metadata_fts_delete AFTER DELETE ON Metadata BEGIN
+    INSERT INTO MetadataFTS (MetadataFTS, rowid, lab_id, key, value)
+    VALUES ('delete', old.id, old.lab_id, old.key, old.value);
+END;
+
+CREATE TRIGGER Metadata_fts_update AFTER UPDATE ON Metadata BEGIN
+    INSERT INTO MetadataFTS (MetadataFTS, rowid, lab_id, key, value)
+    VALUES ('delete', old.id, old.lab_id, old.key, old.value);
+    INSERT INTO MetadataFTS (rowid, lab_id, key, value)
+    VALUES (new.id, new.lab_id, new.key, new.value);
+END;
+
+-- MetadataWide (one typed row per lab_id pivoted from Metadata). Its columns
+-- and indexes come from metadata_columns/metadata_types/metadata_indexes in
+-- config/schema.yaml, so it is created by modules/metadata_wide.py.
+
+-- SampleLocation (R*Tree over sample coordinates, refreshed with MetadataWide)
+CREATE VIRTUAL TABLE SampleLocation USING rtree(
+    id, min_lat, max_lat, min_lon, max_lon, +lab_id
+);
+
+-- Statistics kept up to date by imports and deletes (modules/db_stats.py)
+CREATE TABLE LabStats (
+    lab_id TEXT PRIMARY KEY,
+    metadata_rows INTEGER NOT NULL DEFAULT 0,
+    metadata_uploaded DATETIME,
+    sequences INTEGER NOT NULL DEFAULT 0,
+    bases INTEGER NOT NULL DEFAULT 0,
+    min_length INTEGER,
+    max_length INTEGER,
+    n50 INTEGER,
+    sequences_uploaded DATETIME,
+    histogram TEXT
+);
+
+CREATE TABLE TableStats (
+    name TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    bases INTEGER NOT NULL DEFAULT 0,
+    last_uploaded DATETIME
+);
+
+CREATE TABLE LengthHistogram (
+    bucket INTEGER PRIMARY KEY,
+    sequences INTEGER NOT NULL DEFAULT 0,
+    bases INTEGER NOT NULL DEFAULT 0
+);
+
+-- SequenceSketch (MinHash sketch per sequence) and SketchBand (LSH buckets)
+CREATE TABLE SequenceSketch (
+    seq_id INTEGER PRIMARY KEY,
+    kmers INTEGER NOT NULL,
+    sketch BLOB NOT NULL
+);
+
+CREATE TABLE SketchBand (
+    band_hash INTEGER NOT NULL,
+    seq_id INTEGER NOT NULL,
+    PRIMARY KEY (band_hash, seq_id)
+) WITHOUT ROWID;
@@ -1,16 +1,43 @@
 import os
-from modules.data_import import import_metadata, import_fasta
-from modules.data_output import display_data_by_lab_id, print_row_key_value
-from modules.search import search_db
-from modules.db_info import get_database_info  # Import the new function
-from modules.delete import delete_lab_id, delete_metadata, delete_fasta
-from modules.delete import display_lab_id_data
-from modules.export_utils import select_rows, export_table, export_pretty
+import sys
+import glob
+
+# Project modules pull in pandas, numpy and SQLAlchemy, so each menu action
+# imports what it needs when it runs. That keeps the menu quick to appear
+# (see benchmarks/bench_startup.py).
+
+_database_ready = False
+
+def prepare_database():
+    """Bring older databases up to the current schema, once per session."""
+    global _database_ready
+    if not _database_ready:
+        from modules.migrations import migrate
+        migrate(verbose=False)
+        _database_ready = True
+
+
+def profile_menu_action(choice):
+    """cProfile a menu action when instrumentation.profile_dir is set in config.yaml."""
+    from modules.instrumentation import profile_command
+    return profile_command(f"menu-{choice}")
 
 
 def import_data_ui():
+    from modules.data_import import import_metadata, import_fasta
+    from modules.batch_import import import_files
+
     print("\n--Import Data--")
-    file_type = input("Select file type: 1)Excel  2)Fasta\n")
+    file_type = input("Select file type: 1)Excel  2)Fasta  3)Batch (many files at once)\n")
+    if file_type.lower() == "batch" or file_type == "3":
+        pattern = input("Enter a file pattern in example_files/ (e.g. run7/*.fasta): ").strip()
+        file_paths = sorted(glob.glob(os.path.join("example_files", pattern)))
+        if not file_paths:
+            print("No files match that pattern.")
+            return
+        print(f"Importing {len(file_paths)} files. FASTA lab IDs are taken from file names (e.g. UL012_run3.fasta).")
+        import_files(file_paths)
+        return
     file_name = input("Enter file name (including file extention): ")
     file_path = "example_files/" + file_name
     print(f"File type: {file_type}")
@@ -21,9 +48,11 @@ def import_data_ui():
     elif file_type.lower() == "fasta" or file_type == "2":
         import_fasta(file_path)
     else:  
-        print("Unknown file type. Please select 1 or 2.")
+        print("Unknown file type. Please select 1, 2 or 3.")
 
 def search_data_ui():
+    from modules.search import search_page, export_search
+
     print("\n-- Search Data --")
     search_term = input("Enter a keyword to search: ").strip()
 
@@ -31,16 +60,172 @@ def search_data_ui():
         print("Search term cannot be empty.")
         return
 
-    results = search_db(search_term)
-
+    # Results are fetched a page at a time, so a broad keyword stays quick
+    try:
+        results, cursor = search_page(search_term)
+    except Exception as e:
+        print(f"Error querying data: {e}")
+        return
     if results.empty:
         print("No results found.")
         return
 
+    page, page_cursor = 1, None
+    while True:
+        print(f"\nResults for '{search_term}' (page {page}):")
+        print(results.to_string(index=False))
+        options = "[n]ext page, " if cursor else ""
+        choice = input(f"{options}[e]xport this page, export [a]ll results, or press enter to finish: ").strip().lower()
+        if choice == "n" and cursor:
+            page_cursor = cursor
+            results, cursor = search_page(search_term, page_cursor)
+            page += 1
+        elif choice == "e":
+            # The page shows previews; export the same rows with whole values
+            export_prompt(search_page(search_term, page_cursor, full=True)[0])
+            return
+        elif choice == "a":
+            os.makedirs('exported_files', exist_ok=True)
+            file_name = input("Enter file name (.csv will be added if not present): ").strip()
+            if not file_name.endswith((".csv", ".csv.gz")):
+                file_name += ".csv"
+            export_search(search_term, os.path.join('exported_files', file_name))
+            return
+        else:
+            return
+
+
+def query_samples_ui():
+    from modules.query import parse_predicate, iter_query
+    from modules.utils import print_row_key_value
+
+    print("\n-- Query Samples --")
+    print("Enter one condition per line, then a blank line to run. Examples:")
+    print("  ITS Top Hit Similarity >= 97")
+    print("  Extraction Date between 2025-01-01 and 2025-06-30")
+    print("  DNA Extraction Method = Method A")
+    print("  has_fasta")
+    predicates = []
+    while True:
+        line = input("Condition: ").strip()
+        if not line:
+            break
+        try:
+            predicates.append(parse_predicate(line))
+        except ValueError as e:
+            print(e)
+
+    if not predicates:
+        print("No conditions entered.")
+        return
+
+    count = 0
+    try:
+        for row in iter_query(predicates):
+            print_row_key_value({k: v for k, v in row.items() if v is not None}, title=row["Uehling Lab ID"])
+            count += 1
+    except ValueError as e:
+        print(e)
+        return
+    print(f"\n{count} matching samples.")
+
+
+def location_search_ui():
+    from modules.search import search_bbox, search_radius
+
+    print("\n-- Search by Location --")
+    mode = input("Search by 1) radius around a point or 2) bounding box? (1/2): ").strip()
+    try:
+        if mode == "1":
+            lat = float(input("Latitude: "))
+            lon = float(input("Longitude: "))
+            radius = float(input("Radius (km): "))
+            results = search_radius(lat, lon, radius)
+        elif mode == "2":
+            min_lat = float(input("Minimum latitude: "))
+            max_lat = float(input("Maximum latitude: "))
+            min_lon = float(input("Minimum longitude (west edge): "))
+            max_lon = float(input("Maximum longitude (east edge): "))
+            results = search_bbox(min_lat, max_lat, min_lon, max_lon)
+        else:
+            print("Invalid choice. Please select 1 or 2.")
+            return
+    except ValueError:
+        print("Coordinates must be numbers.")
+        return
+
+    if results.empty:
+        print("No samples found in that area.")
+        return
+    print(results.to_string(index=False))
     export_prompt(results)
 
 
+def motif_search_ui():
+    from modules.motif_search import parse_motifs, find_motifs, KNOWN_PRIMERS
+
+    print("\n-- Primer/Motif Search --")
+    print("Enter primers or motifs separated by commas: NAME=SEQUENCE (IUPAC codes allowed),")
+    print(f"a sequence, or a known primer ({', '.join(KNOWN_PRIMERS)}). Both strands are searched.")
+    try:
+        motifs = parse_motifs(input("Motifs: ").split(","))
+    except ValueError as e:
+        print(e)
+        return
+    if not motifs:
+        print("No motifs entered.")
+        return
+    lab_ids = input("Limit to lab IDs (comma separated, blank for all): ").strip()
+    lab_ids = [lab_id.strip() for lab_id in lab_ids.split(",") if lab_id.strip()] or None
+
+    results = find_motifs(motifs, lab_ids=lab_ids)
+    if results is None or results.empty:
+        return
+    print(results.head(20).to_string(index=False))
+    if len(results) > 20:
+        print(f"... {len(results) - 20} more")
+    export_prompt(results)
+
+
+def similarity_search_ui():
+    from modules.similarity import find_similar
+
+    print("\n-- Similarity Search --")
+    query = input("Query FASTA file path or sequence: ").strip()
+    if not query:
+        print("No query entered.")
+        return
+    top = input("Hits per query sequence (default 10): ").strip()
+    results = find_similar(query, top_k=int(top) if top.isdigit() else 10)
+    if results.empty:
+        print("No similar sequences found.")
+        return
+    print(results[["query", "lab_id", "key", "jaccard", "ani", "shared_hashes"]].to_string(index=False))
+    export_prompt(results)
+
+
+def region_ui():
+    from modules.regions import parse_region, read_regions_file, extract_regions
+
+    print("\n-- Region Extraction --")
+    print("Positions are 0-based and the end is excluded (as in motif search results).")
+    path = input("Regions file (lab_id, key, start, end [, strand] per line), or press enter for one region: ").strip()
+    try:
+        if path:
+            regions = read_regions_file(path)
+        else:
+            regions = [parse_region(input("Lab ID: "), input("Sequence key: "), input("Start: "), input("End: "),
+                                    input("Strand (+/-, default +): ") or "+")]
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+    file_name = input("Save to FASTA file in exported_files (press enter to print): ").strip()
+    extract_regions(regions, os.path.join("exported_files", file_name) if file_name else None)
+
+
 def export_prompt(results):
+    from modules.export_utils import select_rows, export_table, export_pretty
+
     if results.empty:
         return
     choice = input("\nWould you like to export these results? (y/n): ").strip().lower()
@@ -51,13 +236,17 @@ def export_prompt(results):
     export_df = select_rows(results)
 
     # Choose format
-    fmt = input("Export as [1] CSV, [2] Excel, or [3] TXT? (1/2/3): ").strip()
+    fmt = input("Export as [1] CSV, [2] Excel, [3] TXT, [4] TSV, or [5] Parquet? (1/2/3/4/5): ").strip()
     if fmt == '1':
         ext, file_type = 'csv', 'csv'
     elif fmt == '2':
         ext, file_type = 'xlsx', 'excel'
     elif fmt == '3':
         ext, file_type = 'txt', 'txt'
+    elif fmt == '4':
+        ext, file_type = 'tsv', 'tsv'
+    elif fmt == '5':
+        ext, file_type = 'parquet', 'parquet'
     else:
         print("Invalid format, exporting as CSV.")
         ext, file_type = 'csv', 'csv'
@@ -80,12 +269,50 @@ def export_prompt(results):
         append = (ao == 'a')
 
     # Export
-    if file_type in ('csv', 'excel'):
+    if file_type == 'parquet':
+        # Imported here so pyarrow stays optional
+        from modules.snapshot import write_results_snapshot
+        try:
+            write_results_snapshot(export_df, file_path)
+        except ImportError as e:
+            print(e)
+    elif file_type in ('csv', 'tsv', 'excel'):
         export_table(export_df, file_path, file_type, append=append)
     else:
         export_pretty(export_df, file_path, append=append)
 
+def export_data_ui():
+    from modules.export_utils import export_metadata, export_sequences
+
+    print("\n-- Export Data --")
+    what = input("Export 1) sample metadata or 2) FASTA sequences? (1/2): ").strip()
+    if what not in ("1", "2"):
+        print("Invalid choice. Please select 1 or 2.")
+        return
+    formats = {"1": "csv", "2": "tsv", "3": "fasta"} if what == "2" else {"1": "csv", "2": "tsv"}
+    prompt = "[1] CSV, [2] TSV, or [3] FASTA? (1/2/3): " if what == "2" else "[1] CSV or [2] TSV? (1/2): "
+    file_type = formats.get(input("Export as " + prompt).strip(), "csv")
+    lab_ids = input("Lab IDs to export, comma separated (press enter for all): ").strip()
+    lab_ids = [lab_id.strip() for lab_id in lab_ids.split(",") if lab_id.strip()] or None
+
+    os.makedirs('exported_files', exist_ok=True)
+    file_name = input(f"Enter file name (.{file_type} will be added if not present): ").strip()
+    if not file_name.endswith((f".{file_type}", f".{file_type}.gz")):
+        file_name += f".{file_type}"
+    if not file_name.endswith(".gz") and input("Compress with gzip? (y/n): ").strip().lower() == "y":
+        file_name += ".gz"
+    file_path = os.path.join('exported_files', file_name)
+
+    # Both exporters stream from the database, so any size of export is fine
+    if what == "1":
+        export_metadata(file_path, file_type, lab_ids=lab_ids)
+    else:
+        export_sequences(file_path, file_type, lab_ids=lab_ids)
+
+
 def delete_data_ui():
+    from modules.delete import delete_lab_id, delete_metadata, delete_fasta, display_lab_id_data
+
     print("\n-- Delete Data --")
     lab_id = input("Enter the Uehling Lab ID to delete (e.g., UL001): ").strip()
     if not lab_id:
@@ -127,12 +354,22 @@ def delete_data_ui():
 def help_ui():
     print("\n-- Help --")
     print("1) Import Data: Upload Excel or Fasta files from the example_files folder.")
-    print("2) Search Data: Find entries by lab ID, extraction method, or date.")
-    print("3) Export Data: Save search results as CSV after running a query.")
-    print("4) Exit: Quit the program.")
+    print("2) Search Data: Find entries by lab ID, extraction method, or date, a page at a time, and export them.")
+    print("3) Delete Data: Remove a lab ID's metadata, sequences, or both.")
+    print("4) Help: Show this list.")
+    print("5) Database Information: Show table sizes, per-sample statistics and query timings.")
+    print("6) Query Samples: Filter samples on fields, e.g. 'ITS Top Hit Similarity >= 97'.")
+    print("7) Search by Location: Find samples within a radius or latitude/longitude box.")
+    print("8) Export Data: Write metadata or sequences to CSV, TSV or FASTA (optionally gzipped).")
+    print("9) Primer/Motif Search: Find primers (IUPAC codes allowed) on both strands of stored sequences.")
+    print("10) Similarity Search: Find stored sequences resembling a query FASTA (MinHash estimate).")
+    print("11) Region Extraction: Pull subsequences (e.g. primer flanks) from stored sequences by position.")
+    print("12) Exit: Quit the program.")
     return
 
 def display_results(results):
+    from modules.utils import print_row_key_value
+
     if results.empty:
         print("No results found.")
     else:
@@ -151,24 +388,53 @@ def main():
         print("3) Delete Data")
         print("4) Help")
         print("5) Database Information")
-        print("6) Exit")
+        print("6) Query Samples")
+        print("7) Search by Location")
+        print("8) Export Data")
+        print("9) Primer/Motif Search")
+        print("10) Similarity Search")
+        print("11) Region Extraction")
+        print("12) Exit")
 
         choice = input("Enter your choice: ")
-        if choice == "1":
-            import_data_ui()
-        elif choice == "2":
-            search_data_ui()
-        elif choice == "3":
-            delete_data_ui()
+        if choice in ("1", "2", "3", "5", "6", "7", "8", "9", "10", "11"):
+            prepare_database()
+            with profile_menu_action(choice):
+                run_menu_action(choice)
         elif choice == "4":
             help_ui()
-        elif choice == "5":
-            get_database_info()
-        elif choice == "6":
+        elif choice == "12":
             print("Goodbye!")
             break
         else:
             print("Invalid selection. Please try again.")
 
+def run_menu_action(choice):
+    if choice == "1":
+        import_data_ui()
+    elif choice == "2":
+        search_data_ui()
+    elif choice == "3":
+        delete_data_ui()
+    elif choice == "5":
+        from modules.db_info import get_database_info
+        get_database_info()
+    elif choice == "6":
+        query_samples_ui()
+    elif choice == "7":
+        location_search_ui()
+    elif choice == "8":
+        export_data_ui()
+    elif choice == "9":
+        motif_search_ui()
+    elif choice == "10":
+        similarity_search_ui()
+    elif choice == "11":
+        region_ui()
+
 if __name__ == "__main__":
+    # Any arguments switch to the headless CLI, e.g. python main.py import --manifest run7.yaml
+    if len(sys.argv) > 1:
+        from modules.cli import run
+        sys.exit(run(sys.argv[1:]))
     main()
@@ -0,0 +1,355 @@
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import text
+
+from modules.utils import load_schema, bump_generation
+from modules.seq_codec import encode_sequence, configured_encoding
+from modules.kmer_index import prepare_kmer_index, kmer_postings, write_postings
+from modules.similarity import prepare_sketches, sketch_rows, write_sketches, delete_sketches
+from modules.sequence_store import (configured_dedup, ensure_blob_table, blob_rows, store_blobs,
+                                    release_sequences)
+from modules.fasta_store import configured_store, externalize
+from modules import data_import
+from modules.instrumentation import get_instrumentation
+from modules.db_stats import refresh_lab_stats, add_lab_sequences, finish_lab_stats
+
+# Batch import of many files at once. Worker processes parse, validate and
+# encode files (and compute their k-mer postings) and hand record batches to
+# the calling process through a bounded queue. The calling process is the
+# only SQLite writer, so workers never contend for the database lock, and the
+# queue bound stops fast parsers from running ahead of the writer's memory.
+
+BATCH_SIZE = 500
+QUEUE_BATCHES = 16
+FASTA_EXTENSIONS = (".fasta", ".fa", ".fna", ".fas", ".ffn")
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+LAB_ID_PATTERN = re.compile(r"UL\d+", re.IGNORECASE)
+# IUPAC nucleotide codes plus gap characters
+VALID_BASES = re.compile(r"^[ACGTURYSWKMBDHVN.\-]*$", re.IGNORECASE)
+
+
+def lab_id_from_filename(file_path):
+    """Return the lab ID in a file name such as UL012_run3.fasta, or None."""
+    match = LAB_ID_PATTERN.search(os.path.basename(file_path))
+    return match.group(0).upper() if match else None
+
+
+def file_kind(file_path):
+    """Return "fasta", "excel" or None, from the file extension."""
+    name = file_path.lower()
+    if name.endswith(FASTA_EXTENSIONS):
+        return "fasta"
+    if name.endswith(EXCEL_EXTENSIONS):
+        return "excel"
+    return None
+
+
+def validate_fasta(file_path):
+    """
+    Check a FASTA file before any of it is written: it must contain records,
+    with unique non-empty IDs and only IUPAC nucleotide codes.
+    """
+    seen = set()
+    with open(file_path, "rb") as handle:
+        for record_id, sequence, _ in data_import.iter_fasta(handle):
+            if not record_id:
+                raise ValueError("record with an empty header")
+            if record_id in seen:
+                raise ValueError(f"duplicate record ID '{record_id}'")
+            if not VALID_BASES.match(sequence):
+                raise ValueError(f"record '{record_id}' contains non-nucleotide characters")
+            seen.add(record_id)
+    if not seen:
+        raise ValueError("no FASTA records found")
+    return len(seen)
+
+
+def _parse_fasta(index, file_path, lab_id, encoding, dedup, kmer_size, sketch_params, batch_size, queue):
+    """
+    Worker: validate and stream one FASTA file into the queue as batches of
+    (key, encoded value, bases) with k-mer postings and similarity sketches
+    keyed by batch position. With dedup, values go in SequenceBlob entries
+    (one per row) instead.
+    """
+    started = time.perf_counter()
+    try:
+        validate_fasta(file_path)
+        validated = time.perf_counter()
+        batch = []
+
+        def send():
+            numbered = [(i, seq) for i, (_, seq) in enumerate(batch)]
+            queue.put(("fasta", index, {
+                "rows": [(key, None if dedup else encode_sequence(seq, encoding), len(seq)) for key, seq in batch],
+                "blobs": blob_rows([seq for _, seq in batch], encoding) if dedup else [],
+                "postings": kmer_postings(numbered, kmer_size) if kmer_size else [],
+                "sketches": sketch_rows(numbered, sketch_params) if sketch_params else [],
+            }))
+
+        with open(file_path, "rb") as handle:
+            for record_id, sequence, _ in data_import.iter_fasta(handle):
+                batch.append((record_id, sequence))
+                if len(batch) >= batch_size:
+                    send()
+                    batch = []
+        if batch:
+            send()
+        queue.put(("done", index, {"parse": time.perf_counter() - validated, "validate": validated - started}))
+    except Exception as e:
+        queue.put(("error", index, str(e)))
+
+
+def _parse_metadata(index, file_path, queue):
+    """Worker: read and melt one metadata sheet."""
+    started = time.perf_counter()
+    try:
+        records, lab_ids = data_import.read_metadata_file(file_path)
+        queue.put(("metadata", index, {"records": records, "lab_ids": lab_ids}))
+        queue.put(("done", index, {"parse": time.perf_counter() - started}))
+    except Exception as e:
+        queue.put(("error", index, str(e)))
+
+
+class _Writer:
+    """Applies queued batches to the database; lives in the calling process."""
+
+    insert_query = text("""
+        INSERT INTO GenomicData (lab_id, key, value, seq_order, seq_length, seq_hash)
+        VALUES (:lab_id, :key, :value, :seq_order, :seq_length, :seq_hash)
+    """)
+    inserted_ids_query = text("""
+        SELECT id, key FROM GenomicData
+        WHERE lab_id = :lab_id AND key IN (SELECT value FROM json_each(:keys))
+    """)
+
+    def __init__(self, session, store=None):
+        self.session = session
+        self.store = store
+        self.metadata_columns = load_schema()["metadata_columns"]
+        self.next_order = {}
+        self.busy = 0.0
+
+    def _start_order(self, lab_id):
+        if lab_id not in self.next_order:
+            current = self.session.execute(text(
+                "SELECT MAX(seq_order) FROM GenomicData WHERE lab_id = :lab_id"
+            ), {"lab_id": lab_id}).scalar()
+            self.next_order[lab_id] = 0 if current is None else current + 1
+        return self.next_order[lab_id]
+
+    def write_fasta(self, report, payload):
+        lab_id = report["lab_id"]
+        data_import.ensure_lab_id_metadata(self.session, lab_id, self.metadata_columns)
+        order = self._start_order(lab_id)
+        rows, blobs = payload["rows"], payload["blobs"]
+        values = [value for _, value, _ in rows]
+        if self.store:
+            values, blobs = externalize(self.session, self.store, [f"{lab_id}|{key}" for key, _, _ in rows],
+                                        values, blobs)
+        store_blobs(self.session, blobs)
+        hashes = [seq_hash for seq_hash, _, _ in blobs] or [None] * len(rows)
+        self.session.execute(self.insert_query, [
+            {"lab_id": lab_id, "key": key, "value": values[i], "seq_order": order + i, "seq_length": bases,
+             "seq_hash": hashes[i]}
+            for i, (key, _, bases) in enumerate(rows)
+        ])
+        self.next_order[lab_id] = order + len(rows)
+        if payload["postings"] or payload["sketches"]:
+            keys = [key for key, _, _ in rows]
+            ids = dict((key, row_id) for row_id, key in self.session.execute(
+                self.inserted_ids_query, {"lab_id": lab_id, "keys": json.dumps(keys)}
+            ))
+            batch_ids = [ids[key] for key in keys]
+            write_postings(self.session, [(kmer, batch_ids[i], positions) for kmer, i, positions in payload["postings"]])
+            write_sketches(self.session, [(batch_ids[i], n_kmers, sketch, bands)
+                                          for i, n_kmers, sketch, bands in payload["sketches"]])
+        add_lab_sequences(self.session, lab_id, [key for key, _, _ in rows])
+        bump_generation(self.session)
+        report["keys"].extend(key for key, _, _ in rows)
+        report["sequences"] += len(rows)
+        report["bases"] += sum(bases for _, _, bases in rows)
+
+    def finish_fasta(self, report):
+        """Bring the lab ID's N50 up to date once all of a file's batches are in."""
+        finish_lab_stats(self.session, report["lab_id"])
+        self.session.commit()
+
+    def write_metadata(self, report, payload):
+        data_import.write_metadata(self.session, payload["records"], payload["lab_ids"])
+        report["rows"] = len(payload["records"])
+        report["lab_ids"] = len(payload["lab_ids"])
+
+    def discard(self, report):
+        """Remove what was already committed for a file that failed part way."""
+        if report["kind"] == "fasta" and report["keys"]:
+            params = {"lab_id": report["lab_id"], "keys": json.dumps(report["keys"])}
+            rows_query = ("SELECT id FROM GenomicData "
+                          "WHERE lab_id = :lab_id AND key IN (SELECT value FROM json_each(:keys))")
+            release_sequences(self.session, rows_query, params)
+            delete_sketches(self.session, rows_query, params)
+            self.session.execute(text(f"DELETE FROM GenomicData WHERE id IN ({rows_query})"), params)
+            refresh_lab_stats(self.session, [report["lab_id"]])
+            bump_generation(self.session)
+            self.session.commit()
+        report["sequences"] = report["bases"] = 0
+
+
+def _new_report(file_path, kind, lab_id):
+    return {"file": file_path, "kind": kind, "lab_id": lab_id, "status": "pending", "error": None,
+            "sequences": 0, "bases": 0, "rows": 0, "lab_ids": 0, "keys": [],
+            "parse_seconds": 0.0, "write_seconds": 0.0, "started": None, "finished": None}
+
+
+def import_files(file_paths, lab_ids=None, workers=None, batch_size=BATCH_SIZE, queue_batches=QUEUE_BATCHES):
+    """
+    Import many FASTA and Excel files in parallel.
+
+    `lab_ids` maps FASTA paths to lab IDs; files without an entry take the
+    lab ID in their file name (e.g. UL012_run3.fasta). If a FASTA batch
+    arrives before the sheet that describes its lab ID, placeholder metadata
+    is created and then replaced when the sheet is written. A file that fails
+    validation or writing is rolled back without stopping the others.
+
+    Returns {"files": [per-file reports], "sequences", "bases", "seconds",
+    "writer_busy"}.
+    """
+    lab_ids = lab_ids or {}
+    workers = workers or os.cpu_count() or 1
+    instrumentation = get_instrumentation()
+    reports = []
+    for path in file_paths:
+        kind = file_kind(path)
+        report = _new_report(path, kind, lab_ids.get(path) or (lab_id_from_filename(path) if kind == "fasta" else None))
+        if kind is None:
+            report.update(status="error", error="unknown file type")
+        elif kind == "fasta" and not report["lab_id"]:
+            report.update(status="error", error="no lab ID given or found in the file name")
+        elif not os.path.exists(path):
+            report.update(status="error", error="file not found")
+        reports.append(report)
+
+    start = time.perf_counter()
+    pending = [i for i, report in enumerate(reports) if report["status"] == "pending"]
+    # Sheets first, so FASTA files can refer to lab IDs they create
+    pending.sort(key=lambda i: reports[i]["kind"] != "excel")
+
+    with data_import.Session() as session:
+        data_import.ensure_checkpoint_table(session)
+        kmer_size = prepare_kmer_index(session)
+        sketch_params = prepare_sketches(session)
+        ensure_blob_table(session)
+        session.commit()
+        store = configured_store()
+        writer = _Writer(session, store)
+        # Workers send plain text when the writer appends it to the flat-file store
+        encoding, dedup = "plain" if store else configured_encoding(), configured_dedup()
+
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+            queue = manager.Queue(maxsize=queue_batches)
+            futures = {}
+            for i in pending:
+                reports[i]["status"] = "running"
+                if reports[i]["kind"] == "excel":
+                    futures[i] = pool.submit(_parse_metadata, i, reports[i]["file"], queue)
+                else:
+                    futures[i] = pool.submit(_parse_fasta, i, reports[i]["file"], reports[i]["lab_id"],
+                                             encoding, dedup, kmer_size, sketch_params, batch_size, queue)
+
+            remaining = len(pending)
+            while remaining:
+                try:
+                    kind, i, payload = queue.get(timeout=1)
+                except queue_module.Empty:
+                    # A worker that died (e.g. killed for memory) never reports back
+                    for i, future in list(futures.items()):
+                        if future.done() and future.exception() is not None:
+                            del futures[i]
+                            writer.discard(reports[i])
+                            reports[i].update(status="error", error=str(future.exception()))
+                            remaining -= 1
+                    continue
+                report = reports[i]
+                if kind in ("error", "done"):
+                    futures.pop(i, None)
+                if kind == "error":
+                    writer.discard(report)
+                    report.update(status="error", error=payload, finished=time.perf_counter())
+                    remaining -= 1
+                    continue
+                if kind == "done":
+                    # Worker stages run in other processes, so record them here
+                    for stage, seconds in payload.items():
+                        instrumentation.record_stage(stage, seconds)
+                    report["parse_seconds"] = sum(payload.values())
+                    if report["status"] == "running":
+                        report["status"] = "ok"
+                        if report["kind"] == "fasta" and report["keys"]:
+                            writer.finish_fasta(report)
+                    report["finished"] = time.perf_counter()
+                    remaining -= 1
+                    continue
+                if report["status"] != "running":
+                    continue  # a later batch of a file that already failed
+                report["started"] = report["started"] or time.perf_counter()
+                write_start = time.perf_counter()
+                try:
+                    with instrumentation.span("write"):
+                        if kind == "metadata":
+                            writer.write_metadata(report, payload)
+                        else:
+                            writer.write_fasta(report, payload)
+                        session.commit()
+                except Exception as e:
+                    session.rollback()
+                    writer.discard(report)
+                    report.update(status="error", error=str(e))
+                elapsed = time.perf_counter() - write_start
+                report["write_seconds"] += elapsed
+                writer.busy += elapsed
+        if store:
+            store.close()
+
+    seconds = time.perf_counter() - start
+    for report in reports:
+        del report["keys"]
+        # Time from the file's first written batch to its last message
+        started, finished = report.pop("started"), report.pop("finished")
+        report["seconds"] = (finished - started) if started and finished else 0.0
+    summary = {
+        "files": reports,
+        "sequences": sum(report["sequences"] for report in reports),
+        "bases": sum(report["bases"] for report in reports),
+        "metadata_rows": sum(report["rows"] for report in reports),
+        "seconds": seconds,
+        "writer_busy": writer.busy / seconds if seconds > 0 else 0.0,
+    }
+    print_import_summary(summary)
+    return summary
+
+
+def print_import_summary(summary):
+    """Print per-file and aggregate throughput for a batch import."""
+    print(f"\n{'File':<40} {'Status':<7} {'Sequences':>10} {'Bases':>14} {'Mbases/s':>9}")
+    for report in summary["files"]:
+        name = os.path.basename(report["file"])[:40]
+        if report["kind"] == "excel":
+            count = f"{report['rows']} rows"
+            rate = ""
+        else:
+            count = report["sequences"]
+            rate = f"{report['bases'] / report['seconds'] / 1e6:.1f}" if report["seconds"] > 0 and report["bases"] else ""
+        print(f"{name:<40} {report['status']:<7} {count:>10} {report['bases']:>14,} {rate:>9}")
+        if report["error"]:
+            print(f"    {report['error']}")
+    seconds = summary["seconds"]
+    rate = summary["bases"] / seconds / 1e6 if seconds > 0 else 0.0
+    print(f"\nImported {summary['sequences']} sequences ({summary['bases']:,} bases) and "
+          f"{summary['metadata_rows']} metadata rows in {seconds:.2f}s ({rate:,.1f} Mbases/sec).")
+    # Near 100% means adding workers will not help: the writer is the limit
+    print(f"Writer busy {summary['writer_busy']:.0%} of the time.")
@@ -0,0 +1,254 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+
+import yaml
+
+# Headless entry point: python main.py <command> ... (see build_parser).
+# Every command prints one JSON summary on stdout and sends the usual
+# progress messages to stderr, so runs can be scripted and parsed. The exit
+# status is 0 on success and 1 if anything failed.
+
+
+def load_manifest(path):
+    """
+    Read a manifest that maps files to lab IDs. Returns [(file_path, lab_id)],
+    with lab_id None for metadata sheets or when it should come from the file
+    name. Relative paths are resolved against the manifest's folder.
+
+    YAML:
+        files:
+          - path: run7/UL012_reads.fasta
+            lab_id: UL012
+          - path: samples.xlsx
+    CSV (header row required):
+        path,lab_id
+        run7/UL012_reads.fasta,UL012
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith((".yaml", ".yml")):
+        with open(path, "r") as file:
+            data = yaml.safe_load(file) or {}
+        entries = data.get("files", []) if isinstance(data, dict) else data
+        entries = [entry if isinstance(entry, dict) else {"path": entry} for entry in entries]
+    elif path.lower().endswith((".csv", ".tsv")):
+        with open(path, "r", newline="") as file:
+            entries = list(csv.DictReader(file, delimiter="\t" if path.lower().endswith(".tsv") else ","))
+    else:
+        raise ValueError("Manifest must be a .yaml, .yml, .csv or .tsv file.")
+
+    files = []
+    for entry in entries:
+        file_path = str(entry.get("path") or "").strip()
+        if not file_path:
+            raise ValueError(f"Manifest entry without a path: {entry}")
+        lab_id = str(entry.get("lab_id") or "").strip() or None
+        files.append((os.path.join(base, file_path), lab_id))
+    return files
+
+
+def _records(df, limit):
+    if df is None:
+        return []
+    df = df.head(limit) if limit else df
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def cmd_import(args):
+    from modules.batch_import import import_files
+
+    files = [(path, args.lab_id) for path in args.files]
+    if args.manifest:
+        files += load_manifest(args.manifest)
+    if not files:
+        raise ValueError("Nothing to import: give files or --manifest.")
+    summary = import_files([path for path, _ in files], lab_ids={path: lab_id for path, lab_id in files if lab_id},
+                           workers=args.workers)
+    ok = all(report["status"] == "ok" for report in summary["files"])
+    return ok, summary
+
+
+def cmd_search(args):
+    from modules.search import search_db, search_page, export_search
+
+    if args.output:
+        rows = export_search(args.keyword, args.output, "tsv" if ".tsv" in args.output else "csv")
+        return True, {"keyword": args.keyword, "output": args.output, "rows": rows}
+    if args.page_size or args.cursor:
+        results, cursor = search_page(args.keyword, args.cursor, args.page_size)
+        return True, {"keyword": args.keyword, "count": len(results), "next_cursor": cursor,
+                      "results": _records(results, 0)}
+
+    results = search_db(args.keyword, use_cache=not args.no_cache)
+    if results is None:
+        return False, {"keyword": args.keyword, "error": "search failed"}
+    return True, {"keyword": args.keyword, "count": len(results), "results": _records(results, args.limit)}
+
+
+def cmd_motifs(args):
+    from modules.motif_search import parse_motifs, read_motif_file, search_motifs
+
+    motifs = parse_motifs(args.motifs)
+    if args.file:
+        motifs.update(read_motif_file(args.file))
+    if not motifs:
+        raise ValueError("No motifs given: pass NAME=SEQUENCE, a primer name or --file.")
+    hits = list(search_motifs(motifs, lab_ids=args.lab_id or None))
+    counts = Counter(f"{hit['motif']} ({hit['strand']})" for hit in hits)
+    return True, {"motifs": motifs, "count": len(hits), "counts": counts,
+                  "results": hits[:args.limit] if args.limit else hits}
+
+
+def cmd_similar(args):
+    from modules.similarity import find_similar
+
+    results = find_similar(args.query, top_k=args.top)
+    return True, {"query": args.query, "count": len(results), "results": _records(results, 0)}
+
+
+def cmd_region(args):
+    from modules.regions import parse_region, read_regions_file, extract_regions
+
+    regions = read_regions_file(args.file) if args.file else []
+    if args.region:
+        if len(args.region) != 4:
+            raise ValueError("Give a region as LAB_ID KEY START END, or use --file.")
+        regions.append(parse_region(*args.region, strand=args.strand))
+    if not regions:
+        raise ValueError("No regions given: pass LAB_ID KEY START END or --file.")
+    results = extract_regions(regions, args.output)
+    if results is None:
+        return False, {"count": 0, "error": "region extraction failed"}
+    missing = [region for region in results if region["sequence"] is None]
+    if args.output:
+        results = [{name: value for name, value in region.items() if name != "sequence"} for region in results]
+    return not missing, {"count": len(results), "missing": len(missing), "output": args.output, "results": results}
+
+
+def cmd_export(args):
+    from modules.export_utils import export_metadata, export_sequences
+
+    if args.what == "metadata":
+        rows = export_metadata(args.output, args.format, lab_ids=args.lab_id or None)
+    else:
+        rows = export_sequences(args.output, args.format, lab_ids=args.lab_id or None)
+    return rows is not None, {"what": args.what, "output": args.output, "format": args.format, "rows": rows}
+
+
+def cmd_delete(args):
+    from modules.delete import delete_lab_id, delete_metadata, delete_fasta
+
+    if not args.yes:
+        raise ValueError("Deleting is permanent; pass --yes to confirm.")
+    delete = {"all": delete_lab_id, "metadata": delete_metadata, "fasta": delete_fasta}[args.what]
+    results = [delete(lab_id) for lab_id in args.lab_ids]
+    return all(result is not None for result in results), {"what": args.what, "deleted": results}
+
+
+def cmd_info(args):
+    from modules.db_info import database_info
+
+    return True, database_info(samples=args.samples)
+
+
+def cmd_recompute(args):
+    from modules.db_stats import recompute_stats
+
+    return True, recompute_stats()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Fungal Research Database (headless mode). "
+                                     "Run without arguments for the interactive menu.")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="write a cProfile dump of the command to DIR (default: instrumentation.profile_dir)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="import FASTA and Excel files")
+    p.add_argument("files", nargs="*", help="FASTA (.fasta/.fa/...) or Excel (.xlsx) files")
+    p.add_argument("--manifest", help="YAML or CSV manifest mapping files to lab IDs")
+    p.add_argument("--lab-id", help="lab ID for the FASTA files given on the command line")
+    p.add_argument("--workers", type=int, help="parser processes (default: one per core)")
+    p.set_defaults(handler=cmd_import)
+
+    p = commands.add_parser("search", help="search by lab ID or keyword")
+    p.add_argument("keyword")
+    p.add_argument("--limit", type=int, default=100, help="maximum results in the JSON output (0 for all)")
+    p.add_argument("--no-cache", action="store_true", help="bypass the search result cache")
+    p.add_argument("--page-size", type=int, help="return one page of this many results and a next_cursor")
+    p.add_argument("--cursor", help="next_cursor of the previous page")
+    p.add_argument("--output", help="stream every result to this CSV/TSV file (.gz to compress)")
+    p.set_defaults(handler=cmd_search)
+
+    p = commands.add_parser("motifs", help="search sequences for primers/motifs on both strands")
+    p.add_argument("motifs", nargs="*", help="NAME=SEQUENCE (IUPAC codes allowed), a sequence, or a known primer name")
+    p.add_argument("--file", help="FASTA or NAME=SEQUENCE text file of primers")
+    p.add_argument("--lab-id", action="append", help="only search this lab ID (repeatable)")
+    p.add_argument("--limit", type=int, default=100, help="maximum hits in the JSON output (0 for all)")
+    p.set_defaults(handler=cmd_motifs)
+
+    p = commands.add_parser("similar", help="find stored sequences similar to a query (MinHash)")
+    p.add_argument("query", help="query FASTA file or a bare sequence")
+    p.add_argument("--top", type=int, default=10, help="hits to return per query sequence")
+    p.set_defaults(handler=cmd_similar)
+
+    p = commands.add_parser("region", help="extract subsequences (0-based, end exclusive) as FASTA")
+    p.add_argument("region", nargs="*", metavar="LAB_ID KEY START END", help="one region")
+    p.add_argument("--strand", default="+", help="+ or - (reverse complement) for the single region")
+    p.add_argument("--file", help="regions file: lab_id, key, start, end [, strand] per line")
+    p.add_argument("--output", help="write the regions to this FASTA file (.gz to compress)")
+    p.set_defaults(handler=cmd_region)
+
+    p = commands.add_parser("export", help="stream metadata or sequences to a file")
+    p.add_argument("what", choices=["metadata", "sequences"])
+    p.add_argument("output", help="output file; add .gz to compress")
+    p.add_argument("--format", choices=["csv", "tsv", "fasta"], default="csv")
+    p.add_argument("--lab-id", action="append", help="only this lab ID (repeatable)")
+    p.set_defaults(handler=cmd_export)
+
+    p = commands.add_parser("delete", help="delete data for lab IDs")
+    p.add_argument("lab_ids", nargs="+")
+    p.add_argument("--what", choices=["all", "metadata", "fasta"], default="all")
+    p.add_argument("--yes", action="store_true", help="confirm the delete")
+    p.set_defaults(handler=cmd_delete)
+
+    p = commands.add_parser("info", help="show database statistics")
+    p.add_argument("--samples", type=int, default=10, help="per-lab ID breakdown for this many largest samples")
+    p.set_defaults(handler=cmd_info)
+
+    p = commands.add_parser("recompute", help="rebuild the statistics tables from scratch")
+    p.set_defaults(handler=cmd_recompute)
+    return parser
+
+
+def run(argv=None):
+    """Run one headless command and print its JSON summary. Returns the exit status."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export" and args.format == "fasta" and args.what == "metadata":
+        parser.error("metadata can only be exported as csv or tsv")
+    start = time.perf_counter()
+    # Progress messages go to stderr so stdout carries only the JSON summary
+    with redirect_stdout(sys.stderr):
+        try:
+            from modules.migrations import migrate
+            from modules.instrumentation import profile_command
+
+            migrate(verbose=False)
+            with profile_command(args.command, args.profile):
+                ok, result = args.handler(args)
+            error = None
+        except Exception as e:
+            ok, result, error = False, None, str(e)
+    summary = {"command": args.command, "ok": ok, "seconds": round(time.perf_counter() - start, 3)}
+    if error:
+        summary["error"] = error
+    if result is not None:
+        summary["result"] = result
+    print(json.dumps(summary, indent=2, default=str))
+    return 0 if ok else 1
@@ -1,23 +1,27 @@
 import pandas as pd
-from Bio import SeqIO
-from sqlalchemy import create_engine, inspect
-import yaml
+from sqlalchemy import inspect
 import os
+import json
+import time
+import hashlib
 from modules.data_output import print_row_key_value
 from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
-from modules.utils import load_schema
+from modules.utils import load_schema, get_engine, bump_generation
+from modules.seq_codec import encode_sequence, configured_encoding
+from modules.kmer_index import prepare_kmer_index, index_sequences
+from modules.similarity import prepare_sketches, sketch_rows, write_sketches
+from modules.sequence_store import configured_dedup, ensure_blob_table, blob_rows, store_blobs
+from modules.fasta_store import configured_store, externalize
+from modules.metadata_fts import ensure_metadata_fts
+from modules.metadata_wide import refresh_metadata_wide
+from modules.db_stats import refresh_lab_stats, add_lab_sequences, finish_lab_stats
+from modules.instrumentation import span
 
 
-# Load configuration (from config/config.yaml)
-with open("config/config.yaml", "r") as file:
-    config = yaml.safe_load(file)
-
-# Load DB Path 
-DB_PATH = os.path.expanduser(config["database"]["path"])  # or from config/config.yaml
-DB_URL = f"sqlite:///{DB_PATH}"
-engine = create_engine(DB_URL)
+# Shared engine configured from config/config.yaml
+engine = get_engine()
 
 Session = sessionmaker(bind=engine)
 
@@ -51,92 +55,331 @@ def validate_columns(table_name, df):
             f"Unexpected columns in file: {extra_columns}"
         )
 
-def import_metadata(file_path):
+METADATA_BATCH_SIZE = 5000
+
+def _melt_metadata(metadata, metadata_columns):
     """
-    Import metadata from an Excel file into the Metadata table.
+    Reshape a wide metadata sheet into (lab_id, key, value) rows.
+
+    Rows without a lab ID are dropped and values are stringified the same way
+    the per-cell import did, so existing data reads back unchanged.
     """
-    try:
-        print("Loading metadata...")
-        schema = load_schema()
-        metadata_columns = schema["metadata_columns"]
+    metadata = metadata.dropna(subset=["Uehling Lab ID"])
+    # Melt against a copy of the ID so "Uehling Lab ID" is also kept as a key
+    long_df = metadata[metadata_columns].assign(_lab_id=metadata["Uehling Lab ID"]).melt(
+        id_vars=["_lab_id"], var_name="key", value_name="value"
+    )
+    return pd.DataFrame({
+        "lab_id": long_df["_lab_id"].map(str),
+        "key": long_df["key"],
+        "value": long_df["value"].map(str),
+    })
+
+def read_metadata_file(file_path):
+    """
+    Read and validate a metadata sheet. Returns (records, lab_ids), where
+    records are the melted lab_id/key/value rows.
+    """
+    metadata_columns = load_schema()["metadata_columns"]
+    metadata = pd.read_excel(file_path)
 
-        metadata = pd.read_excel(file_path)
+    # Validate columns
+    missing_columns = [col for col in metadata_columns if col not in metadata.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
 
-        # Validate columns
-        missing_columns = [col for col in metadata_columns if col not in metadata.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {missing_columns}")
+    rows = _melt_metadata(metadata, metadata_columns)
+    return rows.to_dict("records"), rows["lab_id"].unique().tolist()
 
-        with Session() as session:
-            for _, row in metadata.iterrows():
-                lab_id = row["Uehling Lab ID"]
-
-                # Delete existing metadata for the lab_id
-                delete_query = text("DELETE FROM Metadata WHERE lab_id = :lab_id")
-                session.execute(delete_query, {"lab_id": lab_id})
-
-                # Insert new metadata as key-value pairs
-                for column, value in row.items():
-                    if column in metadata_columns:
-                        insert_query = text("""
-                            INSERT INTO Metadata (lab_id, key, value)
-                            VALUES (:lab_id, :key, :value)
-                        """)
-                        session.execute(insert_query, {"lab_id": lab_id, "key": column, "value": str(value)})
+def write_metadata(session, records, lab_ids, batch_size=METADATA_BATCH_SIZE):
+    """
+    Replace the metadata of the given lab IDs with `records` inside the
+    caller's transaction, and refresh them in MetadataWide.
+    """
+    delete_query = text("""
+        DELETE FROM Metadata
+        WHERE lab_id IN (SELECT value FROM json_each(:lab_ids))
+    """)
+    # Duplicate lab IDs in one sheet: the last row wins, as before
+    insert_query = text("""
+        INSERT INTO Metadata (lab_id, key, value)
+        VALUES (:lab_id, :key, :value)
+        ON CONFLICT(lab_id, key) DO UPDATE SET value = excluded.value
+    """)
+    ensure_metadata_fts(session)
+    session.execute(delete_query, {"lab_ids": json.dumps(lab_ids)})
+    for i in range(0, len(records), batch_size):
+        session.execute(insert_query, records[i:i + batch_size])
+    refresh_metadata_wide(session, lab_ids)
+    refresh_lab_stats(session, lab_ids)
+    # Invalidates cached search results
+    bump_generation(session)
+
+def import_metadata(file_path, batch_size=METADATA_BATCH_SIZE):
+    """
+    Import metadata from an Excel file into the Metadata table.
+
+    The sheet is melted to key/value rows up front, every affected lab ID is
+    cleared with a single DELETE, and rows are upserted in batches inside one
+    transaction that also refreshes those lab IDs in MetadataWide.
+    """
+    try:
+        print("Loading metadata...")
+        start = time.perf_counter()
+        with span("parse"):
+            records, lab_ids = read_metadata_file(file_path)
 
+        with Session() as session, span("write"):
+            write_metadata(session, records, lab_ids, batch_size)
             session.commit()
-        print("Metadata imported successfully.")
+
+        elapsed = time.perf_counter() - start
+        rate = len(records) / elapsed if elapsed > 0 else float("inf")
+        print(f"Metadata imported successfully: {len(records)} rows for "
+              f"{len(lab_ids)} lab IDs in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+        return {"lab_ids": len(lab_ids), "rows": len(records), "seconds": elapsed}
 
     except Exception as e:
         print(f"Error importing metadata: {e}")
 
 
-from modules.utils import load_schema
+FASTA_BATCH_SIZE = 500
+FASTA_COMMIT_BYTES = 64 * 1024 * 1024
+# Bytes hashed from the start of a FASTA file for its checkpoint fingerprint
+FINGERPRINT_BYTES = 64 * 1024
 
-def import_fasta(file_path):
+def ensure_checkpoint_table(session):
+    """
+    Create the ImportCheckpoint table used to resume interrupted FASTA imports.
+    """
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS ImportCheckpoint (
+            file_path TEXT NOT NULL,
+            lab_id TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            seq_order INTEGER NOT NULL,
+            updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+            fingerprint TEXT,
+            PRIMARY KEY (file_path, lab_id)
+        )
+    """))
+    columns = [row[1] for row in session.execute(text("PRAGMA table_info(ImportCheckpoint)"))]
+    if "fingerprint" not in columns:
+        session.execute(text("ALTER TABLE ImportCheckpoint ADD COLUMN fingerprint TEXT"))
+
+def file_fingerprint(file_path):
+    """
+    Return a cheap identity for a file: its modification time and a hash of
+    its first FINGERPRINT_BYTES. A checkpoint only resumes the same file.
+    """
+    with open(file_path, "rb") as handle:
+        digest = hashlib.blake2b(handle.read(FINGERPRINT_BYTES), digest_size=16).hexdigest()
+    return f"{os.stat(file_path).st_mtime_ns}:{digest}"
+
+def iter_fasta(handle, offset=0):
+    """
+    Stream (record_id, sequence, end_offset) tuples from a binary FASTA handle.
+
+    Parsing starts at `offset`, which must be the start of a header line.
+    `end_offset` is the byte position just past the record, so it can be stored
+    as a checkpoint and passed back in to resume.
+    """
+    handle.seek(offset)
+    position = offset
+    record_id = None
+    chunks = []
+    for line in handle:
+        if line.startswith(b">"):
+            if record_id is not None:
+                yield record_id, "".join(chunks), position
+            title = line[1:].decode().strip()
+            record_id = title.split(None, 1)[0] if title else ""
+            chunks = []
+        elif record_id is not None:
+            chunks.append(line.decode().strip())
+        position += len(line)
+    if record_id is not None:
+        yield record_id, "".join(chunks), position
+
+def ensure_lab_id_metadata(session, lab_id, metadata_columns):
+    """
+    Make sure a lab ID has Metadata rows before sequences are stored for it,
+    creating empty placeholders for every metadata column if needed.
+    """
+    # Validate that lab_id exists in Metadata
+    query = text("SELECT * FROM Metadata WHERE lab_id = :lab_id")
+    result = session.execute(query, {"lab_id": lab_id}).mappings().fetchone()
+    if result:
+        return False
+    print(f"Lab ID {lab_id} does not exist in Metadata. Creating {lab_id} entry...")
+    # Insert a placeholder for each metadata column (empty string as value)
+    insert_placeholder = text("""
+        INSERT INTO Metadata (lab_id, key, value)
+        VALUES (:lab_id, :key, :value)
+    """)
+    session.execute(insert_placeholder, [
+        {"lab_id": lab_id, "key": column, "value": ""} for column in metadata_columns
+    ])
+    refresh_metadata_wide(session, [lab_id])
+    refresh_lab_stats(session, [lab_id])
+    bump_generation(session)
+    return True
+
+def import_fasta(file_path, lab_id=None, batch_size=FASTA_BATCH_SIZE,
+                 commit_bytes=FASTA_COMMIT_BYTES, resume=True):
     """
     Import genomic data from a FASTA file into the GenomicData table.
+
+    Records are streamed from disk and written in batches with one prepared
+    INSERT, and added to the k-mer index when it is enabled. Each batch is
+    committed together with a checkpoint (file, byte offset, last seq_order),
+    so an interrupted import picks up where it stopped when run again for the
+    same file and lab ID.
     """
     try:
         print("Loading genomic data from FASTA file...")
+        start = time.perf_counter()
         schema = load_schema()
         metadata_columns = schema["metadata_columns"]
         genomic_columns = schema["genomic_columns"]
+        store = configured_store()
+        # The flat-file store keeps plain FASTA text
+        encoding = "plain" if store else configured_encoding()
+        dedup = configured_dedup()
+
+        if lab_id is None:
+            lab_id = input(f"Enter the Uehling Lab ID for this FASTA file: ").strip()
+
+        checkpoint_path = os.path.abspath(file_path)
+        file_size = os.path.getsize(file_path)
+        fingerprint = file_fingerprint(file_path)
 
-        lab_id = input(f"Enter the Uehling Lab ID for this FASTA file: ").strip()
+        # Only use columns present in the schema; the statement is built once
+        insert_cols = [col for col in genomic_columns if col in ("lab_id", "key", "value", "seq_order")]
+        insert_cols += ["seq_length", "seq_hash"]
+        insert_query = text(f"""
+            INSERT INTO GenomicData ({', '.join(insert_cols)})
+            VALUES ({', '.join(':' + col for col in insert_cols)})
+        """)
+        checkpoint_query = text("""
+            INSERT INTO ImportCheckpoint (file_path, lab_id, file_size, fingerprint, byte_offset, seq_order, updated)
+            VALUES (:file_path, :lab_id, :file_size, :fingerprint, :byte_offset, :seq_order, CURRENT_TIMESTAMP)
+            ON CONFLICT(file_path, lab_id) DO UPDATE SET
+                file_size = excluded.file_size,
+                fingerprint = excluded.fingerprint,
+                byte_offset = excluded.byte_offset,
+                seq_order = excluded.seq_order,
+                updated = excluded.updated
+        """)
+        checkpoint_key = {"file_path": checkpoint_path, "lab_id": lab_id}
+
+        inserted_ids_query = text("""
+            SELECT id, key FROM GenomicData
+            WHERE lab_id = :lab_id AND key IN (SELECT value FROM json_each(:keys))
+        """)
 
         with Session() as session:
-            # Validate that lab_id exists in Metadata
-            query = text("SELECT * FROM Metadata WHERE lab_id = :lab_id")
-            result = session.execute(query, {"lab_id": lab_id}).mappings().fetchone()
-            if not result:
-                print(f"Lab ID {lab_id} does not exist in Metadata. Creating {lab_id} entry...")
-                # Insert a placeholder for each metadata column (empty string as value)
-                for column in metadata_columns:
-                    insert_query = text("""
-                        INSERT INTO Metadata (lab_id, key, value)
-                        VALUES (:lab_id, :key, :value)
-                    """)
-                    session.execute(insert_query, {"lab_id": lab_id, "key": column, "value": ""})
-            # Insert each sequence for this lab_id, using the FASTA header as the key
-            for idx, record in enumerate(SeqIO.parse(file_path, "fasta")):
-                # Build the insert dynamically based on genomic_columns
-                values = {
-                    "lab_id": lab_id,
-                    "key": record.id,
-                    "value": str(record.seq),
-                    "seq_order": idx
-                }
-                # Only use columns present in the schema
-                insert_cols = [col for col in genomic_columns if col in values]
-                insert_query = text(f"""
-                    INSERT INTO GenomicData ({', '.join(insert_cols)})
-                    VALUES ({', '.join(':' + col for col in insert_cols)})
-                """)
-                session.execute(insert_query, {col: values[col] for col in insert_cols})
+            ensure_checkpoint_table(session)
+            ensure_metadata_fts(session)
+            kmer_size = prepare_kmer_index(session)
+            sketch_params = prepare_sketches(session)
+            ensure_blob_table(session)
+
+            ensure_lab_id_metadata(session, lab_id, metadata_columns)
 
+            offset, next_order = 0, 0
+            checkpoint = session.execute(text("""
+                SELECT file_size, fingerprint, byte_offset, seq_order FROM ImportCheckpoint
+                WHERE file_path = :file_path AND lab_id = :lab_id
+            """), checkpoint_key).mappings().fetchone()
+            # Checkpoints written before fingerprints were kept match on size alone
+            same_file = checkpoint and checkpoint["file_size"] == file_size and (
+                checkpoint["fingerprint"] is None or checkpoint["fingerprint"] == fingerprint)
+            if checkpoint and resume and same_file:
+                offset, next_order = checkpoint["byte_offset"], checkpoint["seq_order"] + 1
+                print(f"Resuming from sequence {next_order} (byte {offset:,} of {file_size:,}).")
+            elif checkpoint and resume:
+                print("The file has changed since the interrupted import; starting from the beginning.")
             session.commit()
-        print("FASTA data imported successfully.")
+
+            imported, imported_bytes = 0, 0
+            batch, batch_bytes = [], 0
+
+            def flush(end_offset):
+                # Write the batch and move the checkpoint in the same transaction
+                with span("write"):
+                    blobs = blob_rows([row["sequence"] for row in batch], encoding) if dedup else []
+                    if store:
+                        values, blobs = externalize(session, store, [f"{lab_id}|{row['key']}" for row in batch],
+                                                    [row["value"] for row in batch], blobs)
+                        for row, value in zip(batch, values):
+                            row["value"] = value
+                    store_blobs(session, blobs)
+                    for row, (seq_hash, _, _) in zip(batch, blobs):
+                        row["seq_hash"] = seq_hash
+                    session.execute(insert_query, [{col: row[col] for col in insert_cols} for row in batch])
+                    if kmer_size or sketch_params:
+                        sequences = {row["key"]: row["sequence"] for row in batch}
+                        inserted = session.execute(inserted_ids_query, {
+                            "lab_id": lab_id, "keys": json.dumps(list(sequences)),
+                        }).fetchall()
+                        rows = [(row_id, sequences[key]) for row_id, key in inserted]
+                        if kmer_size:
+                            index_sequences(session, rows, kmer_size)
+                        if sketch_params:
+                            write_sketches(session, sketch_rows(rows, sketch_params))
+                    session.execute(checkpoint_query, {
+                        **checkpoint_key,
+                        "file_size": file_size,
+                        "fingerprint": fingerprint,
+                        "byte_offset": end_offset,
+                        "seq_order": batch[-1]["seq_order"],
+                    })
+                    add_lab_sequences(session, lab_id, [row["key"] for row in batch])
+                    # Each committed batch is visible to searches, so invalidate them
+                    bump_generation(session)
+                    session.commit()
+
+            with open(file_path, "rb") as handle:
+                end_offset = offset
+                # Insert each sequence for this lab_id, using the FASTA header as the key
+                for record_id, sequence, end_offset in iter_fasta(handle, offset):
+                    batch.append({
+                        "lab_id": lab_id,
+                        "key": record_id,
+                        "value": None if dedup else encode_sequence(sequence, encoding),
+                        "seq_order": next_order,
+                        "seq_length": len(sequence),
+                        "seq_hash": None,
+                        "sequence": sequence,
+                    })
+                    next_order += 1
+                    batch_bytes += len(sequence)
+                    if len(batch) >= batch_size or batch_bytes >= commit_bytes:
+                        flush(end_offset)
+                        imported += len(batch)
+                        imported_bytes += batch_bytes
+                        batch, batch_bytes = [], 0
+                if batch:
+                    flush(end_offset)
+                    imported += len(batch)
+                    imported_bytes += batch_bytes
+
+            # The file is fully loaded, so there is nothing left to resume
+            finish_lab_stats(session, lab_id)
+            session.execute(text("""
+                DELETE FROM ImportCheckpoint WHERE file_path = :file_path AND lab_id = :lab_id
+            """), checkpoint_key)
+            session.commit()
+        if store:
+            store.close()
+
+        elapsed = time.perf_counter() - start
+        rate = imported_bytes / elapsed / 1e6 if elapsed > 0 else float("inf")
+        print(f"FASTA data imported successfully: {imported} sequences "
+              f"({imported_bytes:,} bases) in {elapsed:.2f}s ({rate:,.1f} Mbases/sec).")
+        return {"lab_id": lab_id, "sequences": imported, "bases": imported_bytes, "seconds": elapsed}
 
     except Exception as e:
         print(f"Error importing FASTA file: {e}")
@@ -1,7 +1,92 @@
 import os
 from sqlalchemy import text, inspect
-from modules.data_output import engine
-from modules.utils import load_schema
+from modules.utils import load_schema, load_config, get_engine
+from modules.migrations import add_file_uploaded_column
+from modules.instrumentation import get_instrumentation
+from modules.db_stats import table_stats, length_histogram, lab_stats
+
+# Shared engine configured from config/config.yaml
+engine = get_engine()
+
+
+def database_info(samples=10):
+    """
+    Return row counts, bases, N50, length histogram, last upload times,
+    schema version and file size of the database as a dict, with the
+    `samples` largest lab IDs broken down, plus the query/stage timings
+    collected so far in this process (see modules/instrumentation.py).
+
+    Counts come from the statistics tables kept by modules/db_stats.py, so
+    this does not scan Metadata or GenomicData.
+    """
+    info = {}
+    with engine.connect() as connection:
+        stats = table_stats(connection)
+        info["metadata"] = stats["Metadata"]
+        info["genomic_data"] = stats["GenomicData"]
+        info["lab_ids"] = stats["LabStats"]["count"]
+        info["length_histogram"], info["genomic_data"]["n50_estimate"] = length_histogram(connection)
+        info["samples"] = lab_stats(connection, limit=samples) if samples else []
+        info["schema_version"] = connection.execute(text("PRAGMA user_version")).scalar()
+
+    db_path = os.path.expanduser(load_config()["database"]["path"])
+    info["path"] = db_path
+    info["size_bytes"] = os.path.getsize(db_path) if os.path.exists(db_path) else None
+    info["instrumentation"] = get_instrumentation().summary(top=5)
+    return info
+
+
+def print_instrumentation(summary):
+    """
+    Print the statement and stage timings from Instrumentation.summary().
+    """
+    if not summary["enabled"]:
+        print("\nQuery instrumentation is off (instrumentation.enabled in config.yaml).")
+        return
+    print(f"\nQueries this session: {summary['statements']} "
+          f"({summary['distinct_statements']} distinct), {summary['sql_seconds'] * 1000:.1f} ms in SQL")
+    for entry in summary["top_statements"]:
+        print(f"  {entry['seconds'] * 1000:9.1f} ms  x{entry['count']:<5} {entry['statement']}")
+
+    if summary["stages"]:
+        print("\nStage        Calls   Total ms   SQL ms    Max ms")
+        for name, entry in sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            print(f"{name:<12} {entry['count']:>5} {entry['seconds'] * 1000:10.1f} "
+                  f"{entry['sql_seconds'] * 1000:8.1f} {entry['max_seconds'] * 1000:9.1f}")
+
+    slow = summary["slow_queries"]
+    print(f"\nSlow queries (>= {summary['slow_query_ms']:g} ms): {len(slow)}")
+    for entry in slow:
+        print(f"  {entry['seconds'] * 1000:9.1f} ms  {entry['statement'][:100]}")
+        for line in entry["plan"] or []:
+            print(f"      | {line}")
+
+
+def print_length_histogram(histogram, width=40):
+    """
+    Print the sequence-length histogram as a bar chart.
+    """
+    if not histogram:
+        return
+    print("\nSequence lengths:")
+    peak = max(entry["sequences"] for entry in histogram)
+    for entry in histogram:
+        bar = "#" * max(1, round(entry["sequences"] / peak * width))
+        print(f"{entry['min_length']:>10,} - {entry['max_length']:<10,} {entry['sequences']:>9,} {bar}")
+
+
+def print_samples(samples, total):
+    """
+    Print per-lab ID statistics from db_stats.lab_stats().
+    """
+    if not samples:
+        return
+    print(f"\nLargest samples ({len(samples)} of {total} lab IDs):")
+    print(f"{'Lab ID':<12} {'Metadata':>8} {'Sequences':>10} {'Bases':>14} {'N50':>9}  Last upload")
+    for sample in samples:
+        n50 = f"{sample['n50']:,}" if sample["n50"] else "-"
+        print(f"{sample['lab_id']:<12} {sample['metadata_rows']:>8} {sample['sequences']:>10,} "
+              f"{sample['bases']:>14,} {n50:>9}  {sample['sequences_uploaded'] or sample['metadata_uploaded'] or 'N/A'}")
 
 
 def get_database_info():
@@ -10,43 +95,31 @@ def get_database_info():
     """
     print("\n-- Database Information --")
     try:
-        # Query Metadata table
-        metadata_query = text("SELECT COUNT(*) AS count, MAX(`file_uploaded`) AS last_uploaded FROM Metadata")
-        with engine.connect() as connection:
-            metadata_info = connection.execute(metadata_query).mappings().fetchone()
-            metadata_count = metadata_info["count"]
-            metadata_last_uploaded = metadata_info["last_uploaded"]
-
-        # Query GenomicData table
-        genomic_query = text("SELECT COUNT(*) AS count, MAX(`file_uploaded`) AS last_uploaded FROM GenomicData")
-        with engine.connect() as connection:
-            genomic_info = connection.execute(genomic_query).mappings().fetchone()
-            genomic_count = genomic_info["count"]
-            genomic_last_uploaded = genomic_info["last_uploaded"]
-
-        with open("config/config.yaml", "r") as file:
-            config = yaml.safe_load(file)
-        # Calculate database size
-        db_path = os.path.expanduser(config["database"]["path"])  # Update this if using MySQL
-        if os.path.exists(db_path):
-            db_size = os.path.getsize(db_path) / (1024 ** 3)  # Convert bytes to gigabytes
-        else:
-            db_size = None
+        info = database_info()
 
         # Display information
         print("\nMetadata Table:")
-        print(f"Number of entries: {metadata_count}")
-        print(f"Last uploaded: {metadata_last_uploaded if metadata_last_uploaded else 'N/A'}")
+        print(f"Number of entries: {info['metadata']['count']}")
+        print(f"Last uploaded: {info['metadata']['last_uploaded'] or 'N/A'}")
 
         print("\nGenomicData Table:")
-        print(f"Number of entries: {genomic_count}")
-        print(f"Last uploaded: {genomic_last_uploaded if genomic_last_uploaded else 'N/A'}")
+        print(f"Number of entries: {info['genomic_data']['count']}")
+        print(f"Total bases: {info['genomic_data']['bases']:,}")
+        if info["genomic_data"]["n50_estimate"]:
+            print(f"N50: ~{info['genomic_data']['n50_estimate']:,}")
+        print(f"Last uploaded: {info['genomic_data']['last_uploaded'] or 'N/A'}")
+
+        print_length_histogram(info["length_histogram"])
+        print_samples(info["samples"], info["lab_ids"])
 
-        if db_size is not None:
-            print(f"\nTotal database size: {db_size:.2f} GB")
+        if info["size_bytes"] is not None:
+            print(f"\nTotal database size: {info['size_bytes'] / (1024 ** 3):.2f} GB")  # Convert bytes to gigabytes
         else:
             print("\nDatabase size information is not available.")
 
+        print_instrumentation(info["instrumentation"])
+        return info
+
     except Exception as e:
         print(f"Error retrieving database information: {e}")
 
@@ -64,15 +137,15 @@ def ensure_file_uploaded_field():
         # Check Metadata table
         if "file_uploaded" not in [col["name"] for col in inspector.get_columns("Metadata")]:
             print("Adding 'file_uploaded' field to Metadata table...")
-            with engine.connect() as connection:
-                connection.execute(text("ALTER TABLE Metadata ADD COLUMN file_uploaded DATETIME DEFAULT CURRENT_TIMESTAMP"))
+            with engine.begin() as connection:
+                add_file_uploaded_column(connection, "Metadata")
             print("'file_uploaded' field added to Metadata table.")
 
         # Check GenomicData table
         if "file_uploaded" not in [col["name"] for col in inspector.get_columns("GenomicData")]:
             print("Adding 'file_uploaded' field to GenomicData table...")
-            with engine.connect() as connection:
-                connection.execute(text("ALTER TABLE GenomicData ADD COLUMN file_uploaded DATETIME DEFAULT CURRENT_TIMESTAMP"))
+            with engine.begin() as connection:
+                add_file_uploaded_column(connection, "GenomicData")
             print("'file_uploaded' field added to GenomicData table.")
 
     except Exception as e:
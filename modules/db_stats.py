@@ -0,0 +1,370 @@
+import json
+import math
+import time
+from collections import Counter
+
+from sqlalchemy import text
+
+from modules.utils import get_engine
+
+# Statistics kept next to the data so db_info never scans the big tables.
+#
+# LabStats holds one row per lab ID (row counts, bases, N50, length histogram,
+# last upload times). Deletes and metadata imports refresh the touched lab
+# IDs inside their own transaction, and the difference between the old and
+# new LabStats rows is applied to the TableStats totals and the global
+# LengthHistogram; a refresh costs time in proportion to the lab ID's
+# sequences, not the database. FASTA imports instead add each batch's rows
+# with add_lab_sequences(), which reads only that batch, and bring N50 up to
+# date with finish_lab_stats() once the file is in. recompute_stats()
+# rebuilds everything if the numbers ever drift (e.g. after editing tables
+# by hand).
+
+# Histogram buckets are log-scaled: 4 per doubling of length (~19% wide)
+BUCKETS_PER_DOUBLING = 4
+# TableStats rows; the LabStats row counts lab IDs with any data
+TABLES = ("Metadata", "GenomicData", "LabStats")
+
+# Length of a stored sequence, whether plain text or packed by seq_codec
+SEQUENCE_LENGTH_SQL = "CASE WHEN typeof(value) = 'blob' THEN length(seq_decode(value)) ELSE length(value) END"
+
+STATS_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS LabStats (
+        lab_id TEXT PRIMARY KEY,
+        metadata_rows INTEGER NOT NULL DEFAULT 0,
+        metadata_uploaded DATETIME,
+        sequences INTEGER NOT NULL DEFAULT 0,
+        bases INTEGER NOT NULL DEFAULT 0,
+        min_length INTEGER,
+        max_length INTEGER,
+        n50 INTEGER,
+        sequences_uploaded DATETIME,
+        histogram TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS TableStats (
+        name TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        bases INTEGER NOT NULL DEFAULT 0,
+        last_uploaded DATETIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS LengthHistogram (
+        bucket INTEGER PRIMARY KEY,
+        sequences INTEGER NOT NULL DEFAULT 0,
+        bases INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    # Covering index for the per-lab length scan in refresh_lab_stats
+    "CREATE INDEX IF NOT EXISTS idx_genomic_lab_length ON GenomicData (lab_id, seq_length)",
+]
+
+
+def length_bucket(length):
+    """Return the histogram bucket of a sequence length."""
+    return int(math.log2(length) * BUCKETS_PER_DOUBLING) if length >= 1 else 0
+
+
+def bucket_bounds(bucket):
+    """Return the (lowest, highest) length that falls in a bucket."""
+    low = math.ceil(2 ** (bucket / BUCKETS_PER_DOUBLING))
+    high = math.ceil(2 ** ((bucket + 1) / BUCKETS_PER_DOUBLING)) - 1
+    # Rounding can put a bound in the neighbouring bucket; nudge it back
+    while low > 1 and length_bucket(low - 1) == bucket:
+        low -= 1
+    while length_bucket(high) > bucket:
+        high -= 1
+    while length_bucket(high + 1) == bucket:
+        high += 1
+    return low, high
+
+
+def n50(lengths):
+    """
+    Return the N50 of a list of lengths: the length L such that sequences of
+    length >= L hold at least half of all bases.
+    """
+    total = sum(lengths)
+    running = 0
+    for length in sorted(lengths, reverse=True):
+        running += length
+        if running * 2 >= total:
+            return length
+    return None
+
+
+def ensure_stats_tables(connection):
+    """Create the statistics tables, adding GenomicData.seq_length if needed."""
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(GenomicData)"))]
+    if "seq_length" not in columns:
+        connection.execute(text("ALTER TABLE GenomicData ADD COLUMN seq_length INTEGER"))
+    for statement in STATS_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def _lab_rows(connection, query, lab_ids):
+    return connection.execute(text(query), {"lab_ids": json.dumps(lab_ids)}).fetchall()
+
+
+def refresh_lab_stats(connection, lab_ids):
+    """
+    Recompute LabStats for the given lab IDs and apply the change to the
+    table totals and global histogram. Runs inside the caller's transaction.
+    """
+    lab_ids = list(dict.fromkeys(str(lab_id) for lab_id in lab_ids))
+    if not lab_ids:
+        return 0
+    in_labs = "lab_id IN (SELECT value FROM json_each(:lab_ids))"
+    # Rows written without a length (older code, hand edits) get one now
+    connection.execute(text(f"""
+        UPDATE GenomicData SET seq_length = {SEQUENCE_LENGTH_SQL}
+        WHERE {in_labs} AND seq_length IS NULL
+    """), {"lab_ids": json.dumps(lab_ids)})
+
+    old = {row[0]: row for row in _lab_rows(connection, f"""
+        SELECT lab_id, metadata_rows, sequences, bases, histogram FROM LabStats WHERE {in_labs}
+    """, lab_ids)}
+    metadata = {lab_id: (count, uploaded) for lab_id, count, uploaded in _lab_rows(connection, f"""
+        SELECT lab_id, COUNT(*), MAX(file_uploaded) FROM Metadata WHERE {in_labs} GROUP BY lab_id
+    """, lab_ids)}
+    uploaded = dict(_lab_rows(connection, f"""
+        SELECT lab_id, MAX(file_uploaded) FROM GenomicData WHERE {in_labs} GROUP BY lab_id
+    """, lab_ids))
+    lengths = {}
+    for lab_id, length in _lab_rows(connection, f"SELECT lab_id, seq_length FROM GenomicData WHERE {in_labs}", lab_ids):
+        lengths.setdefault(lab_id, []).append(length or 0)
+
+    new_rows = []
+    metadata_delta = sequence_delta = bases_delta = 0
+    histogram_delta = Counter()
+    bases_by_bucket = Counter()
+    for lab_id in lab_ids:
+        lab_lengths = lengths.get(lab_id, [])
+        metadata_rows, metadata_uploaded = metadata.get(lab_id, (0, None))
+        histogram, lab_bases = Counter(), Counter()
+        for length in lab_lengths:
+            bucket = length_bucket(length)
+            histogram[bucket] += 1
+            lab_bases[bucket] += length
+
+        if lab_id in old:
+            _, old_metadata, old_sequences, old_bases, old_histogram = old[lab_id]
+            metadata_delta -= old_metadata
+            sequence_delta -= old_sequences
+            bases_delta -= old_bases
+            for bucket, (count, bases) in json.loads(old_histogram or "{}").items():
+                histogram_delta[int(bucket)] -= count
+                bases_by_bucket[int(bucket)] -= bases
+        metadata_delta += metadata_rows
+        sequence_delta += len(lab_lengths)
+        bases_delta += sum(lab_lengths)
+        histogram_delta.update(histogram)
+        bases_by_bucket.update(lab_bases)
+
+        if metadata_rows or lab_lengths:
+            new_rows.append({
+                "lab_id": lab_id,
+                "metadata_rows": metadata_rows,
+                "metadata_uploaded": metadata_uploaded,
+                "sequences": len(lab_lengths),
+                "bases": sum(lab_lengths),
+                "min_length": min(lab_lengths) if lab_lengths else None,
+                "max_length": max(lab_lengths) if lab_lengths else None,
+                "n50": n50(lab_lengths),
+                "sequences_uploaded": uploaded.get(lab_id),
+                "histogram": json.dumps({str(b): [histogram[b], lab_bases[b]] for b in sorted(histogram)}),
+            })
+
+    connection.execute(text(f"DELETE FROM LabStats WHERE {in_labs}"), {"lab_ids": json.dumps(lab_ids)})
+    if new_rows:
+        connection.execute(text("""
+            INSERT INTO LabStats (lab_id, metadata_rows, metadata_uploaded, sequences, bases,
+                                  min_length, max_length, n50, sequences_uploaded, histogram)
+            VALUES (:lab_id, :metadata_rows, :metadata_uploaded, :sequences, :bases,
+                    :min_length, :max_length, :n50, :sequences_uploaded, :histogram)
+        """), new_rows)
+
+    _add_table_totals(connection, "Metadata", metadata_delta, 0,
+                      max((u for _, u in metadata.values() if u), default=None))
+    _add_table_totals(connection, "GenomicData", sequence_delta, bases_delta,
+                      max((u for u in uploaded.values() if u), default=None))
+    _add_table_totals(connection, "LabStats", len(new_rows) - len(old), 0, None)
+    _add_histogram(connection, histogram_delta, bases_by_bucket)
+    return len(new_rows)
+
+
+def _add_table_totals(connection, name, rows, bases, uploaded):
+    connection.execute(text("""
+        INSERT INTO TableStats (name, row_count, bases, last_uploaded) VALUES (:name, :rows, :bases, :uploaded)
+        ON CONFLICT(name) DO UPDATE SET
+            row_count = row_count + excluded.row_count,
+            bases = bases + excluded.bases,
+            last_uploaded = MAX(COALESCE(last_uploaded, ''), COALESCE(excluded.last_uploaded, ''))
+    """), {"name": name, "rows": rows, "bases": bases, "uploaded": uploaded})
+
+
+def _add_histogram(connection, sequences, bases):
+    changes = [{"bucket": bucket, "sequences": sequences[bucket], "bases": bases[bucket]}
+               for bucket in set(sequences) | set(bases)
+               if sequences[bucket] or bases[bucket]]
+    if changes:
+        connection.execute(text("""
+            INSERT INTO LengthHistogram (bucket, sequences, bases) VALUES (:bucket, :sequences, :bases)
+            ON CONFLICT(bucket) DO UPDATE SET
+                sequences = sequences + excluded.sequences,
+                bases = bases + excluded.bases
+        """), changes)
+        connection.execute(text("DELETE FROM LengthHistogram WHERE sequences <= 0"))
+
+
+def add_lab_sequences(connection, lab_id, keys):
+    """
+    Add sequences just inserted for a lab ID (given by key) to LabStats, the
+    table totals and the global histogram. Only the new rows are read, so a
+    batch costs the same however many sequences the lab ID already has.
+    N50 is left as it was; call finish_lab_stats() when the import is done.
+    Runs inside the caller's transaction.
+    """
+    current = connection.execute(text("""
+        SELECT sequences, bases, min_length, max_length, sequences_uploaded, histogram
+        FROM LabStats WHERE lab_id = :lab_id
+    """), {"lab_id": lab_id}).fetchone()
+    if current is None:
+        # No row to add to (stats never built for this lab ID): build it whole
+        return refresh_lab_stats(connection, [lab_id])
+
+    rows = connection.execute(text("""
+        SELECT seq_length, file_uploaded FROM GenomicData
+        WHERE lab_id = :lab_id AND key IN (SELECT value FROM json_each(:keys))
+    """), {"lab_id": lab_id, "keys": json.dumps(list(keys))}).fetchall()
+    if not rows:
+        return 0
+    lengths = [length or 0 for length, _ in rows]
+    uploaded = max((u for _, u in rows if u), default=None)
+    counts, bases = Counter(), Counter()
+    for length in lengths:
+        bucket = length_bucket(length)
+        counts[bucket] += 1
+        bases[bucket] += length
+
+    sequences, total_bases, min_length, max_length, sequences_uploaded, histogram = current
+    merged = {int(bucket): entry for bucket, entry in json.loads(histogram or "{}").items()}
+    for bucket in counts:
+        count, bucket_bases = merged.get(bucket, (0, 0))
+        merged[bucket] = [count + counts[bucket], bucket_bases + bases[bucket]]
+    known = [length for length in (min_length, max_length) if length is not None] if sequences else []
+    connection.execute(text("""
+        UPDATE LabStats SET sequences = :sequences, bases = :bases, min_length = :min_length,
+            max_length = :max_length, sequences_uploaded = :uploaded, histogram = :histogram
+        WHERE lab_id = :lab_id
+    """), {
+        "lab_id": lab_id,
+        "sequences": sequences + len(lengths),
+        "bases": total_bases + sum(lengths),
+        "min_length": min(lengths + known),
+        "max_length": max(lengths + known),
+        "uploaded": max((u for u in (sequences_uploaded, uploaded) if u), default=None),
+        "histogram": json.dumps({str(b): merged[b] for b in sorted(merged)}),
+    })
+    _add_table_totals(connection, "GenomicData", len(lengths), sum(lengths), uploaded)
+    _add_histogram(connection, counts, bases)
+    return len(lengths)
+
+
+def finish_lab_stats(connection, lab_id):
+    """
+    Recompute a lab ID's N50 after add_lab_sequences(): one pass over its
+    sequence lengths (covered by idx_genomic_lab_length) per import rather
+    than per batch.
+    """
+    lengths = [length or 0 for (length,) in connection.execute(text(
+        "SELECT seq_length FROM GenomicData WHERE lab_id = :lab_id"
+    ), {"lab_id": lab_id})]
+    connection.execute(text("UPDATE LabStats SET n50 = :n50 WHERE lab_id = :lab_id"),
+                       {"lab_id": lab_id, "n50": n50(lengths)})
+
+
+def recompute_stats(engine=None, batch_size=1000):
+    """
+    Rebuild LabStats, TableStats and LengthHistogram from the data. Use when
+    the statistics have drifted from the tables.
+    """
+    engine = engine or get_engine()
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        ensure_stats_tables(connection)
+        for table in ("LabStats", "TableStats", "LengthHistogram"):
+            connection.execute(text(f"DELETE FROM {table}"))
+        lab_ids = [row[0] for row in connection.execute(text(
+            "SELECT lab_id FROM Metadata UNION SELECT lab_id FROM GenomicData"
+        ))]
+        for i in range(0, len(lab_ids), batch_size):
+            refresh_lab_stats(connection, lab_ids[i:i + batch_size])
+        for table in TABLES:
+            # Tables must have a row even when empty, so readers see zeros
+            connection.execute(text("INSERT OR IGNORE INTO TableStats (name) VALUES (:name)"), {"name": table})
+    elapsed = time.perf_counter() - start
+    print(f"Recomputed statistics for {len(lab_ids)} lab IDs in {elapsed:.2f}s.")
+    return {"lab_ids": len(lab_ids), "seconds": elapsed}
+
+
+def table_stats(connection):
+    """Return {table: {"count", "bases", "last_uploaded"}} from TableStats."""
+    stats = {table: {"count": 0, "bases": 0, "last_uploaded": None} for table in TABLES}
+    for name, count, bases, uploaded in connection.execute(text(
+        "SELECT name, row_count, bases, last_uploaded FROM TableStats"
+    )):
+        stats[name] = {"count": count, "bases": bases, "last_uploaded": uploaded or None}
+    return stats
+
+
+def length_histogram(connection):
+    """
+    Return the global length histogram as [{"min_length", "max_length",
+    "sequences", "bases"}] in length order, plus an N50 estimate (the lower
+    bound of the bucket holding the N50).
+    """
+    rows = connection.execute(text(
+        "SELECT bucket, sequences, bases FROM LengthHistogram ORDER BY bucket"
+    )).fetchall()
+    histogram = []
+    for bucket, sequences, bases in rows:
+        low, high = bucket_bounds(bucket)
+        histogram.append({"min_length": low, "max_length": high, "sequences": sequences, "bases": bases})
+    total = sum(entry["bases"] for entry in histogram)
+    running, estimate = 0, None
+    for entry in reversed(histogram):
+        running += entry["bases"]
+        if total and running * 2 >= total:
+            estimate = entry["min_length"]
+            break
+    return histogram, estimate
+
+
+def lab_stats(connection, lab_ids=None, limit=20, order_by="bases"):
+    """
+    Return per-sample statistics as a list of dicts, either for the given
+    lab IDs or the `limit` largest samples by `order_by`.
+    """
+    if order_by not in ("bases", "sequences", "metadata_rows", "n50", "lab_id"):
+        raise ValueError(f"Cannot order lab statistics by '{order_by}'.")
+    columns = ("lab_id, metadata_rows, metadata_uploaded, sequences, bases, "
+               "min_length, max_length, n50, sequences_uploaded")
+    if lab_ids is not None:
+        rows = _lab_rows(connection, f"""
+            SELECT {columns} FROM LabStats WHERE lab_id IN (SELECT value FROM json_each(:lab_ids))
+            ORDER BY lab_id
+        """, list(lab_ids))
+    else:
+        direction = "ASC" if order_by == "lab_id" else "DESC"
+        rows = connection.execute(text(f"""
+            SELECT {columns} FROM LabStats ORDER BY {order_by} {direction}, lab_id LIMIT :limit
+        """), {"limit": limit}).fetchall()
+    return [dict(row._mapping) for row in rows]
+
+
+if __name__ == "__main__":
+    recompute_stats()
@@ -0,0 +1,104 @@
+from sqlalchemy import text
+from modules.utils import get_engine, print_row_key_value, bump_generation
+from modules.metadata_wide import refresh_metadata_wide
+from modules.db_stats import refresh_lab_stats
+from modules.similarity import delete_sketches
+from modules.sequence_store import release_sequences
+
+# Shared engine configured from config/config.yaml
+engine = get_engine()
+
+
+def display_lab_id_data(lab_id, max_sequences=10):
+    """
+    Show the metadata and FASTA records stored for a lab ID so the user can
+    confirm a delete.
+    """
+    try:
+        with engine.connect() as connection:
+            metadata = connection.execute(text(
+                "SELECT key, value FROM Metadata WHERE lab_id = :lab_id"
+            ), {"lab_id": lab_id}).fetchall()
+            sequence_count = connection.execute(text(
+                "SELECT COUNT(*) FROM GenomicData WHERE lab_id = :lab_id"
+            ), {"lab_id": lab_id}).scalar()
+            sequence_keys = connection.execute(text("""
+                SELECT key FROM GenomicData
+                WHERE lab_id = :lab_id
+                ORDER BY seq_order
+                LIMIT :limit
+            """), {"lab_id": lab_id, "limit": max_sequences}).scalars().all()
+
+        if metadata:
+            print_row_key_value(dict(metadata), title=f"Metadata for {lab_id}")
+        else:
+            print(f"No metadata found for {lab_id}.")
+
+        print(f"\nFASTA sequences for {lab_id}: {sequence_count}")
+        for key in sequence_keys:
+            print(f">{key}")
+        if sequence_count > len(sequence_keys):
+            print("...")
+
+    except Exception as e:
+        print(f"Error displaying data: {e}")
+
+
+def _delete_metadata_rows(connection, lab_id):
+    deleted = connection.execute(text("DELETE FROM Metadata WHERE lab_id = :lab_id"), {"lab_id": lab_id}).rowcount
+    refresh_metadata_wide(connection, [lab_id])
+    refresh_lab_stats(connection, [lab_id])
+    bump_generation(connection)
+    return deleted
+
+
+def _delete_fasta_rows(connection, lab_id):
+    # KmerIndex postings for these rows are left behind: ids are never reused
+    # and motif lookups join back to GenomicData, so they only cost space
+    # until the next rebuild_kmer_index()
+    rows_query = "SELECT id FROM GenomicData WHERE lab_id = :lab_id"
+    release_sequences(connection, rows_query, {"lab_id": lab_id})
+    delete_sketches(connection, rows_query, {"lab_id": lab_id})
+    deleted = connection.execute(text("DELETE FROM GenomicData WHERE lab_id = :lab_id"), {"lab_id": lab_id}).rowcount
+    # A half-finished import for this lab ID can no longer be resumed
+    connection.execute(text("DELETE FROM ImportCheckpoint WHERE lab_id = :lab_id"), {"lab_id": lab_id})
+    refresh_lab_stats(connection, [lab_id])
+    bump_generation(connection)
+    return deleted
+
+
+def delete_lab_id(lab_id):
+    """
+    Delete all metadata and FASTA data for a lab ID in one transaction.
+    """
+    try:
+        with engine.begin() as connection:
+            metadata_rows = _delete_metadata_rows(connection, lab_id)
+            fasta_rows = _delete_fasta_rows(connection, lab_id)
+        return {"lab_id": lab_id, "metadata_rows": metadata_rows, "sequences": fasta_rows}
+    except Exception as e:
+        print(f"Error deleting lab ID {lab_id}: {e}")
+
+
+def delete_metadata(lab_id):
+    """
+    Delete only the metadata for a lab ID.
+    """
+    try:
+        with engine.begin() as connection:
+            metadata_rows = _delete_metadata_rows(connection, lab_id)
+        return {"lab_id": lab_id, "metadata_rows": metadata_rows}
+    except Exception as e:
+        print(f"Error deleting metadata for {lab_id}: {e}")
+
+
+def delete_fasta(lab_id):
+    """
+    Delete only the FASTA sequences for a lab ID.
+    """
+    try:
+        with engine.begin() as connection:
+            fasta_rows = _delete_fasta_rows(connection, lab_id)
+        return {"lab_id": lab_id, "sequences": fasta_rows}
+    except Exception as e:
+        print(f"Error deleting FASTA data for {lab_id}: {e}")
@@ -0,0 +1,236 @@
+import gzip
+import os
+
+import pandas as pd
+from sqlalchemy import text
+
+from modules.utils import get_engine
+from modules.seq_codec import decode_sequence, is_file_reference
+from modules.fasta_store import read_reference, unpack_reference
+from modules.sequence_store import stored_value_sql
+from modules.metadata_wide import wide_columns, quote
+
+# Shared engine configured from config/config.yaml
+engine = get_engine()
+
+# Rows fetched per round trip by the streaming exporters
+EXPORT_CHUNK_SIZE = 5000
+FASTA_LINE_WIDTH = 60
+# Lines copied per read when exporting from the flat-file store
+FASTA_COPY_LINES = 16384
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+
+
+def open_output(file_path, append=False):
+    """
+    Open an export file for writing text. Paths ending in .gz are gzip
+    compressed as they are written; appending adds a new gzip member, which
+    gzip readers treat as one continuous stream.
+    """
+    folder = os.path.dirname(file_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    mode = "at" if append else "wt"
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, mode, encoding="utf-8", newline="")
+    return open(file_path, mode, encoding="utf-8", newline="")
+
+
+def _has_content(file_path, append):
+    return append and os.path.exists(file_path) and os.path.getsize(file_path) > 0
+
+
+def parse_row_selection(selection, n_rows):
+    """
+    Parse a row selection such as "1,3,5-7" (1-based, as shown to the user)
+    into 0-based positions. Out-of-range numbers are ignored.
+    """
+    positions = []
+    for part in selection.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(p) for p in part.split("-", 1))
+            numbers = range(start, end + 1)
+        else:
+            numbers = [int(part)]
+        positions.extend(n - 1 for n in numbers if 1 <= n <= n_rows)
+    return list(dict.fromkeys(positions))
+
+
+def select_rows(results):
+    """
+    Ask which rows of a result DataFrame to export. Returns the selected rows
+    (all of them if the user just presses enter).
+    """
+    print("\nRows available for export:")
+    numbered = results.reset_index(drop=True)
+    numbered.index = numbered.index + 1
+    print(numbered.head(50).to_string())
+    if len(numbered) > 50:
+        print(f"... {len(numbered) - 50} more rows")
+
+    selection = input("Rows to export, e.g. 1,3,5-7 (press enter for all): ").strip()
+    if not selection or selection.lower() in ("a", "all"):
+        return results
+    try:
+        positions = parse_row_selection(selection, len(results))
+    except ValueError:
+        print("Could not read that selection, exporting all rows.")
+        return results
+    if not positions:
+        print("No matching rows selected, exporting all rows.")
+        return results
+    return results.iloc[positions]
+
+
+def export_table(df, file_path, file_type="csv", append=False):
+    """
+    Write a DataFrame to CSV, TSV or Excel. Appending to CSV/TSV adds rows
+    without repeating the header; appending to Excel rewrites the sheet with
+    the old and new rows.
+    """
+    try:
+        if file_type == "excel":
+            if append and os.path.exists(file_path):
+                df = pd.concat([pd.read_excel(file_path), df], ignore_index=True)
+            df.to_excel(file_path, index=False)
+        else:
+            header = not _has_content(file_path, append)
+            with open_output(file_path, append) as handle:
+                df.to_csv(handle, sep=DELIMITERS.get(file_type, ","), index=False, header=header)
+        print(f"Exported {len(df)} rows to {file_path}")
+        return file_path
+    except Exception as e:
+        print(f"Error exporting to {file_path}: {e}")
+
+
+def export_pretty(df, file_path, append=False):
+    """
+    Write a DataFrame as an aligned plain-text table.
+    """
+    try:
+        with open_output(file_path, append) as handle:
+            if _has_content(file_path, append):
+                handle.write("\n")
+            handle.write(df.to_string(index=False))
+            handle.write("\n")
+        print(f"Exported {len(df)} rows to {file_path}")
+        return file_path
+    except Exception as e:
+        print(f"Error exporting to {file_path}: {e}")
+
+
+def write_fasta_record(handle, header, sequence, width=FASTA_LINE_WIDTH):
+    """Write one FASTA record, wrapping the sequence at `width` columns."""
+    handle.write(f">{header}\n")
+    for i in range(0, len(sequence), width):
+        handle.write(sequence[i:i + width])
+        handle.write("\n")
+
+
+def write_stored_record(handle, header, value, width=FASTA_LINE_WIDTH):
+    """
+    Write a stored GenomicData value as a FASTA record. Sequences in the
+    flat-file store are copied FASTA_COPY_LINES lines at a time instead of
+    being loaded whole.
+    """
+    if not is_file_reference(value):
+        write_fasta_record(handle, header, decode_sequence(value) or "", width)
+        return
+    handle.write(f">{header}\n")
+    step = width * FASTA_COPY_LINES
+    for start in range(0, unpack_reference(value)[2], step):
+        piece = read_reference(value, start, start + step)
+        for i in range(0, len(piece), width):
+            handle.write(piece[i:i + width])
+            handle.write("\n")
+
+
+def stream_query_to_delimited(sql, params, file_path, file_type="csv", append=False,
+                              chunksize=EXPORT_CHUNK_SIZE, converters=None):
+    """
+    Stream the rows of a query into a CSV/TSV file chunk by chunk, so memory
+    use does not depend on the size of the result. `converters` maps column
+    names to functions applied to each chunk's column before writing.
+    Returns the number of rows written.
+    """
+    rows = 0
+    header = not _has_content(file_path, append)
+    with engine.connect() as connection, open_output(file_path, append) as handle:
+        connection = connection.execution_options(stream_results=True)
+        for chunk in pd.read_sql(text(sql), con=connection, params=params or {}, chunksize=chunksize):
+            for column, convert in (converters or {}).items():
+                chunk[column] = chunk[column].map(convert)
+            chunk.to_csv(handle, sep=DELIMITERS.get(file_type, ","), index=False, header=header)
+            header = False
+            rows += len(chunk)
+    return rows
+
+
+def stream_pages_to_delimited(pages, file_path, file_type="csv", append=False):
+    """
+    Write an iterable of DataFrames (such as search result pages) to one
+    CSV/TSV file as they arrive. Returns the number of rows written.
+    """
+    rows = 0
+    header = not _has_content(file_path, append)
+    with open_output(file_path, append) as handle:
+        for page in pages:
+            page.to_csv(handle, sep=DELIMITERS.get(file_type, ","), index=False, header=header)
+            header = False
+            rows += len(page)
+    return rows
+
+
+def _lab_id_filter(lab_ids, column="lab_id"):
+    if not lab_ids:
+        return "", {}
+    names = [f"lab_id_{i}" for i in range(len(lab_ids))]
+    return f" WHERE {column} IN ({', '.join(':' + n for n in names)})", dict(zip(names, lab_ids))
+
+
+def export_metadata(file_path, file_type="csv", lab_ids=None, append=False, chunksize=EXPORT_CHUNK_SIZE):
+    """
+    Stream sample metadata (one row per lab ID, one column per schema field)
+    to a CSV or TSV file. Add .gz to the file name to compress it.
+    """
+    try:
+        columns = wide_columns()
+        select = ", ".join([f'lab_id AS "Uehling Lab ID"'] +
+                           [f"{quote(col)} AS {quote(field)}" for field, col, _ in columns])
+        where, params = _lab_id_filter(lab_ids)
+        rows = stream_query_to_delimited(f"SELECT {select} FROM MetadataWide{where} ORDER BY lab_id",
+                                         params, file_path, file_type, append, chunksize)
+        print(f"Exported metadata for {rows} samples to {file_path}")
+        return rows
+    except Exception as e:
+        print(f"Error exporting metadata: {e}")
+
+
+def export_sequences(file_path, file_type="fasta", lab_ids=None, append=False, chunksize=EXPORT_CHUNK_SIZE):
+    """
+    Stream FASTA sequences to a multi-record FASTA file (wrapped at 60
+    columns) or to a CSV/TSV file of lab_id, key and sequence. Sequences are
+    read in file order for each lab ID, `chunksize` rows at a time.
+    """
+    try:
+        where, params = _lab_id_filter(lab_ids)
+        sql = (f"SELECT lab_id, key, {stored_value_sql()} AS sequence "
+               f"FROM GenomicData{where} ORDER BY lab_id, seq_order")
+        if file_type != "fasta":
+            rows = stream_query_to_delimited(sql, params, file_path, file_type, append, chunksize,
+                                             converters={"sequence": decode_sequence})
+        else:
+            rows = 0
+            with engine.connect() as connection, open_output(file_path, append) as handle:
+                result = connection.execution_options(stream_results=True).execute(text(sql), params)
+                for batch in result.partitions(chunksize):
+                    for lab_id, key, value in batch:
+                        write_stored_record(handle, f"{key} lab_id={lab_id}", value)
+                    rows += len(batch)
+        print(f"Exported {rows} sequences to {file_path}")
+        return rows
+    except Exception as e:
+        print(f"Error exporting sequences: {e}")
@@ -0,0 +1,230 @@
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_config, bump_generation
+from modules.seq_codec import MAGIC, FLATFILE, decode_sequence, is_file_reference
+
+# Flat-file sequence storage (storage.backend: flatfile).
+#
+# Sequence bodies are appended to FASTA files store-0001.fa, store-0002.fa,
+# ... in the store folder, wrapped at a fixed line width, with a samtools
+# style .fai line per record beside them. The database keeps only a small
+# reference in GenomicData.value (or SequenceBlob.value): MAGIC + "F" + file
+# number, offset of the first base, length and line width. decode_sequence()
+# resolves references through a read-only mmap of the file, and
+# sequence_slice() reads just the bytes of the requested bases.
+#
+# Files are append-only: deleting sequences leaves their bytes behind, and
+# bytes appended by a transaction that rolls back are never referenced. As
+# with the database, there is one writing process at a time.
+
+STORE_FILE_BYTES = 1 << 30
+DEFAULT_LINE_WIDTH = 60
+_REFERENCE = struct.Struct("<IQQI")
+_STORE_NAME = re.compile(r"store-(\d+)\.fa$")
+
+# Read-only maps of store files, remapped when a file has grown
+_maps = {}
+
+
+def store_settings():
+    """Return (backend, store folder, line width) from config.yaml."""
+    storage = load_config().get("storage", {})
+    return (storage.get("backend", "sqlite"), storage.get("fasta_store", "./database/sequences"),
+            int(storage.get("fasta_line_width", DEFAULT_LINE_WIDTH)))
+
+
+def store_path(number, directory=None):
+    """Return the path of store file `number`."""
+    return os.path.join(directory or store_settings()[1], f"store-{number:04d}.fa")
+
+
+def pack_reference(number, offset, length, line_width):
+    """Return the stored value pointing at a sequence in store file `number`."""
+    return MAGIC + FLATFILE + _REFERENCE.pack(number, offset, length, line_width)
+
+
+def unpack_reference(value):
+    """Return (file number, offset, length, line width) of a file reference."""
+    return _REFERENCE.unpack_from(bytes(value), len(MAGIC) + 1)
+
+
+class FastaStore:
+    """Appends sequences to the store files; one instance per writer."""
+
+    def __init__(self, directory, line_width=DEFAULT_LINE_WIDTH, max_file_bytes=STORE_FILE_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.line_width = line_width
+        self.max_file_bytes = max_file_bytes
+        numbers = [int(match.group(1)) for match in map(_STORE_NAME.match, os.listdir(directory)) if match]
+        self.number = max(numbers, default=1)
+        self.handle = self.index = None
+
+    def _open(self):
+        if self.handle is None:
+            path = store_path(self.number, self.directory)
+            self.handle = open(path, "ab")
+            self.index = open(path + ".fai", "a")
+        self.handle.seek(0, os.SEEK_END)
+        if self.handle.tell() >= self.max_file_bytes:
+            self.close()
+            self.number += 1
+            self._open()
+
+    def append(self, records):
+        """
+        Append (name, sequence) records and return a reference per record.
+        Sequences that are not plain ASCII are returned unchanged, to be
+        stored inline. Data is flushed to disk before returning, so the
+        references can be committed.
+        """
+        if not records:
+            return []
+        self._open()
+        width = self.line_width
+        offset = self.handle.tell()
+        chunks, index_lines, references = [], [], []
+        for name, sequence in records:
+            try:
+                body = sequence.encode("ascii")
+            except UnicodeEncodeError:
+                references.append(sequence)
+                continue
+            header = f">{name}\n".encode("ascii", errors="replace")
+            start = offset + len(header)
+            lines = b"".join(body[i:i + width] + b"\n" for i in range(0, len(body), width))
+            chunks += [header, lines]
+            index_lines.append(f"{name}\t{len(body)}\t{start}\t{width}\t{width + 1}\n")
+            references.append(pack_reference(self.number, start, len(body), width))
+            offset = start + len(lines)
+        self.handle.write(b"".join(chunks))
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+        self.index.write("".join(index_lines))
+        self.index.flush()
+        return references
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.index.close()
+            self.handle = self.index = None
+
+
+def configured_store():
+    """Return a FastaStore if storage.backend is "flatfile", else None."""
+    backend, directory, line_width = store_settings()
+    if backend not in ("sqlite", "flatfile"):
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose sqlite or flatfile.")
+    return FastaStore(directory, line_width) if backend == "flatfile" else None
+
+
+def _map(number, end):
+    path = store_path(number)
+    mapped = _maps.get(path)
+    if mapped is None or len(mapped) < end:
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        _maps[path] = mapped
+    return mapped
+
+
+def read_reference(value, start=0, end=None):
+    """
+    Return bases [start, end) of a referenced sequence, reading only the
+    file bytes that hold them.
+    """
+    number, offset, length, width = unpack_reference(value)
+    start, end, _ = slice(start, end).indices(length)
+    if start >= end:
+        return ""
+    first = offset + (start // width) * (width + 1) + start % width
+    last = offset + ((end - 1) // width) * (width + 1) + (end - 1) % width + 1
+    return _map(number, last)[first:last].replace(b"\n", b"").decode("ascii")
+
+
+def externalize(connection, store, names, values, blobs):
+    """
+    Append a batch's sequence bodies to the store and swap them for file
+    references. `values` are the plain GenomicData values (None for
+    deduplicated rows) named by `names`; `blobs` are the batch's
+    SequenceBlob entries, of which only bodies not stored yet are appended.
+    Returns the new (values, blobs).
+    """
+    if blobs:
+        known = {row[0] for row in connection.execute(text("""
+            SELECT hash FROM SequenceBlob WHERE hash IN (SELECT value FROM json_each(:hashes))
+        """), {"hashes": json.dumps([seq_hash for seq_hash, _, _ in blobs])})}
+        fresh = {}
+        for seq_hash, value, _ in blobs:
+            if seq_hash not in known:
+                fresh.setdefault(seq_hash, value)
+        references = dict(zip(fresh, store.append(list(fresh.items()))))
+        blobs = [(seq_hash, references.get(seq_hash), length) for seq_hash, _, length in blobs]
+
+    pending = [i for i, value in enumerate(values) if value is not None]
+    values = list(values)
+    for i, reference in zip(pending, store.append([(names[i], values[i]) for i in pending])):
+        values[i] = reference
+    return values, blobs
+
+
+def move_to_store(batch_size=1000):
+    """
+    Move every sequence stored in the database (GenomicData and SequenceBlob
+    values) into the flat-file store, leaving references behind. Commits
+    per batch and skips rows already moved, so it can be rerun if stopped.
+    Run VACUUM afterwards to return the freed pages to the OS.
+    """
+    _, directory, line_width = store_settings()
+    store = FastaStore(directory, line_width)
+    engine = get_engine()
+    start = time.perf_counter()
+    moved, bases = 0, 0
+    try:
+        for table, name_sql in (("GenomicData", "lab_id || '|' || key"), ("SequenceBlob", "hash")):
+            with engine.connect() as connection:
+                if not connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                          {"name": table}).fetchone():
+                    continue
+            select_query = text(f"""
+                SELECT rowid, {name_sql}, value FROM {table}
+                WHERE rowid > :last_id AND value IS NOT NULL
+                ORDER BY rowid
+                LIMIT :batch_size
+            """)
+            update_query = text(f"UPDATE {table} SET value = :value WHERE rowid = :id")
+            last_id = 0
+            while True:
+                with engine.begin() as connection:
+                    rows = connection.execute(select_query, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+                    rows = [(row_id, name, decode_sequence(value)) for row_id, name, value in rows
+                            if not is_file_reference(value)]
+                    references = store.append([(name, sequence) for _, name, sequence in rows])
+                    connection.execute(update_query, [
+                        {"id": row_id, "value": reference} for (row_id, _, _), reference in zip(rows, references)
+                    ])
+                    bump_generation(connection)
+                    moved += len(rows)
+                    bases += sum(len(sequence) for _, _, sequence in rows)
+    finally:
+        store.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Moved {moved} sequences ({bases:,} bases) to {directory} in {elapsed:.2f}s.")
+    return {"moved": moved, "bases": bases, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    move_to_store(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
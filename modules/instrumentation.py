@@ -0,0 +1,244 @@
+import cProfile
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+from modules.utils import load_config
+
+# Lightweight, in-process instrumentation for the shared engine.
+#
+# - Every statement run through an instrumented engine is timed, grouped by
+#   normalized SQL text, with the rows it inserted/updated/deleted counted as
+#   affected_rows. SELECTs are fetched lazily, so they count none.
+# - span("fetch") etc. time pipeline stages, including how much of the stage
+#   was spent waiting on SQL, so slow runs can be pinned on SQL, pandas or
+#   printing.
+# - Statements slower than instrumentation.slow_query_ms are kept with their
+#   EXPLAIN QUERY PLAN and appended to instrumentation.slow_query_log.
+# - profile_command() writes a cProfile dump per command when
+#   instrumentation.profile_dir is set.
+
+DEFAULT_SLOW_QUERY_MS = 250
+MAX_SLOW_QUERIES = 50
+STATEMENT_PREVIEW = 120
+
+
+def normalize_sql(statement):
+    """Collapse whitespace so the same statement always groups together."""
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+class Instrumentation:
+    """
+    Collects statement timings, stage spans and slow queries. Safe to share
+    between threads; spans are tracked per thread.
+    """
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS, slow_query_log=None, explain=True, enabled=True):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+            self.stages = {}
+            self.slow_queries = deque(maxlen=MAX_SLOW_QUERIES)
+
+    def _active_spans(self):
+        if not hasattr(self._local, "spans"):
+            self._local.spans = []
+        return self._local.spans
+
+    # -- SQLAlchemy hooks -------------------------------------------------
+
+    def install(self, engine):
+        """Attach the timing hooks to an engine."""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    # The start time lives on the statement's execution context, so a
+    # statement that raises (and never reaches _after_execute) leaves
+    # nothing behind on the pooled connection.
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._instrumentation_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_instrumentation_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        # sqlite3 reports -1 for SELECTs, which are fetched lazily
+        rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else 0
+        self.record_statement(statement, elapsed, rows)
+        for span in self._active_spans():
+            span["sql_seconds"] += elapsed
+        if elapsed * 1000 >= self.slow_query_ms:
+            plan = None if executemany else self._explain(cursor, statement, parameters)
+            self.record_slow_query(statement, elapsed, plan)
+
+    def _explain(self, cursor, statement, parameters):
+        if not self.explain or not re.match(r"\s*(SELECT|WITH)\b", statement, re.IGNORECASE):
+            return None
+        try:
+            rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        except Exception:
+            return None
+        return [row[-1] for row in rows]
+
+    # -- Recording ----------------------------------------------------------
+
+    def record_statement(self, statement, seconds, affected_rows=0):
+        key = normalize_sql(statement)
+        with self._lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                "affected_rows": 0}
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["affected_rows"] += affected_rows
+
+    def record_stage(self, name, seconds, sql_seconds=0.0):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {"count": 0, "seconds": 0.0, "sql_seconds": 0.0, "max_seconds": 0.0}
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["sql_seconds"] += sql_seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def record_slow_query(self, statement, seconds, plan=None):
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "seconds": seconds,
+            "statement": normalize_sql(statement),
+            "plan": plan,
+        }
+        with self._lock:
+            self.slow_queries.append(entry)
+        if self.slow_query_log:
+            self._write_slow_query(entry)
+
+    def _write_slow_query(self, entry):
+        try:
+            folder = os.path.dirname(self.slow_query_log)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.slow_query_log, "a") as log:
+                log.write(f"{entry['time']} {entry['seconds'] * 1000:.1f} ms\n  {entry['statement']}\n")
+                for line in entry["plan"] or []:
+                    log.write(f"  | {line}\n")
+        except OSError:
+            pass  # Logging must never break the query that was logged
+
+    @contextmanager
+    def span(self, name):
+        """Time a pipeline stage; nested spans each count the full time."""
+        if not self.enabled:
+            yield
+            return
+        spans = self._active_spans()
+        span = {"sql_seconds": 0.0}
+        spans.append(span)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            spans.remove(span)
+            self.record_stage(name, time.perf_counter() - start, span["sql_seconds"])
+
+    def summary(self, top=10):
+        """
+        Return totals, the `top` statements by total time, per-stage timings
+        and the most recent slow queries.
+        """
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1]["seconds"], reverse=True)
+            return {
+                "enabled": self.enabled,
+                "statements": sum(entry["count"] for _, entry in statements),
+                "distinct_statements": len(statements),
+                "sql_seconds": sum(entry["seconds"] for _, entry in statements),
+                "top_statements": [
+                    {"statement": key[:STATEMENT_PREVIEW], **entry} for key, entry in statements[:top]
+                ],
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "slow_query_ms": self.slow_query_ms,
+                "slow_queries": list(self.slow_queries)[-top:],
+            }
+
+
+_instrumentation = None
+
+
+def instrumentation_settings():
+    """Return the instrumentation section of config.yaml with defaults filled in."""
+    settings = load_config().get("instrumentation") or {}
+    return {
+        "enabled": bool(settings.get("enabled", True)),
+        "slow_query_ms": float(settings.get("slow_query_ms", DEFAULT_SLOW_QUERY_MS)),
+        "slow_query_log": settings.get("slow_query_log") or None,
+        "explain": bool(settings.get("explain_slow_queries", True)),
+        "profile_dir": settings.get("profile_dir") or None,
+    }
+
+
+def get_instrumentation():
+    """Return the process-wide collector, creating it from config.yaml on first use."""
+    global _instrumentation
+    if _instrumentation is None:
+        settings = instrumentation_settings()
+        _instrumentation = Instrumentation(settings["slow_query_ms"], settings["slow_query_log"],
+                                           settings["explain"], settings["enabled"])
+    return _instrumentation
+
+
+def instrument_engine(engine):
+    """Attach the process-wide collector to an engine if instrumentation is enabled."""
+    instrumentation = get_instrumentation()
+    if instrumentation.enabled:
+        instrumentation.install(engine)
+    return instrumentation
+
+
+def span(name):
+    """Time a pipeline stage (parse, validate, write, fetch, highlight, render, ...)."""
+    return get_instrumentation().span(name)
+
+
+@contextmanager
+def profile_command(name, profile_dir=None):
+    """
+    Run the block under cProfile and dump the stats to
+    <profile_dir>/<name>-<timestamp>.prof (view with python -m pstats or
+    snakeviz). Does nothing unless profile_dir or
+    instrumentation.profile_dir is set.
+    """
+    profile_dir = profile_dir or instrumentation_settings()["profile_dir"]
+    if not profile_dir:
+        yield None
+        return
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{name}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
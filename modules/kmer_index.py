@@ -0,0 +1,326 @@
+import json
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_config, ensure_state_table, get_state, set_state
+from modules.seq_codec import decode_sequence
+from modules.sequence_store import stored_value_sql
+
+# k-mers are stored as their exact 2-bit integer encoding, so k is capped at 31
+# to fit a signed 64-bit SQLite INTEGER and lookups never see hash collisions.
+MAX_K = 31
+DEFAULT_K = 12
+# Bases per vectorised pass. The k-mer, position and sort arrays take several
+# dozen bytes per base, so this keeps them to a few hundred MB per pass
+# however large the import batch is.
+POSTINGS_CHUNK_BASES = 4 * 1024 * 1024
+# Postings of a motif's first k-mer read per step by find_motif_ids_after()
+MOTIF_CHUNK_POSTINGS = 64
+
+_CODES = np.full(256, 255, dtype=np.uint8)
+for _i, _base in enumerate(b"ACGT"):
+    _CODES[_base] = _i
+
+
+def configured_kmer_index():
+    """Return (enabled, k) for the k-mer index from config.yaml."""
+    settings = load_config().get("search", {})
+    return bool(settings.get("kmer_index", False)), int(settings.get("kmer_size", DEFAULT_K))
+
+
+def ensure_kmer_tables(connection):
+    """
+    Create the KmerIndex table. Postings are one row per (k-mer, sequence)
+    holding the sequence's match positions as a little-endian uint32 array.
+    """
+    ensure_state_table(connection)
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS KmerIndex (
+            kmer INTEGER NOT NULL,
+            seq_id INTEGER NOT NULL,
+            positions BLOB NOT NULL,
+            PRIMARY KEY (kmer, seq_id)
+        ) WITHOUT ROWID
+    """))
+
+
+def kmer_array(raw, k):
+    """
+    Return (kmers, positions) for every window of length k in an ASCII byte
+    string. Windows touching anything other than A/C/G/T are skipped.
+    """
+    codes = _CODES[np.frombuffer(raw.upper(), dtype=np.uint8)]
+    n_windows = len(codes) - k + 1
+    if n_windows <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    invalid = codes == 255
+    bad_so_far = np.concatenate(([0], np.cumsum(invalid)))
+    keep = (bad_so_far[k:] - bad_so_far[:-k]) == 0
+
+    values = np.zeros(n_windows, dtype=np.uint64)
+    clean = np.where(invalid, 0, codes).astype(np.uint64)
+    for j in range(k):
+        values = (values << np.uint64(2)) | clean[j:j + n_windows]
+    return values[keep].astype(np.int64), np.flatnonzero(keep)
+
+
+def encode_kmer(kmer):
+    """Return the integer key for a single A/C/G/T k-mer."""
+    value = 0
+    for base in kmer.upper().encode("ascii"):
+        value = (value << 2) | int(_CODES[base])
+    return value
+
+
+def _record_chunks(rows, chunk_bases):
+    """Group non-empty (seq_id, sequence) pairs into runs of about chunk_bases bases."""
+    chunk, bases = [], 0
+    for seq_id, seq in rows:
+        if not seq:
+            continue
+        if chunk and bases + len(seq) > chunk_bases:
+            yield chunk
+            chunk, bases = [], 0
+        chunk.append((seq_id, seq))
+        bases += len(seq)
+    if chunk:
+        yield chunk
+
+
+def kmer_postings(rows, k, chunk_bases=POSTINGS_CHUNK_BASES):
+    """
+    Compute postings for (seq_id, sequence) pairs, vectorised over runs of
+    records of about chunk_bases bases (a longer record is one run on its
+    own). Returns (kmer, seq_id, positions) tuples ready for KmerIndex.
+    Needs no database, so batch imports can run it in worker processes.
+    """
+    postings = []
+    for chunk in _record_chunks(rows, chunk_bases):
+        postings += _chunk_postings(chunk, k)
+    return postings
+
+
+def _chunk_postings(rows, k):
+    # Sequences are joined with an N separator so no k-mer spans two records,
+    # then k-mers are grouped by (k-mer, sequence)
+    seq_ids = np.array([seq_id for seq_id, _ in rows], dtype=np.int64)
+    lengths = np.array([len(seq) for _, seq in rows], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+    joined = "N".join(seq for _, seq in rows).encode("ascii", errors="replace")
+
+    kmers, positions = kmer_array(joined, k)
+    if len(kmers) == 0:
+        return []
+    owner = np.searchsorted(starts, positions, side="right") - 1
+    local = (positions - starts[owner]).astype("<u4")
+
+    order = np.lexsort((local, owner, kmers))
+    kmers, owner, local = kmers[order], owner[order], local[order]
+    boundaries = np.flatnonzero((np.diff(kmers) != 0) | (np.diff(owner) != 0)) + 1
+    group_starts = np.concatenate(([0], boundaries)).tolist()
+    group_ends = np.concatenate((boundaries, [len(kmers)])).tolist()
+
+    buffer = local.tobytes()
+    kmer_list = kmers.tolist()
+    owner_ids = seq_ids[owner].tolist()
+    return [
+        (kmer_list[s], owner_ids[s], buffer[4 * s:4 * e])
+        for s, e in zip(group_starts, group_ends)
+    ]
+
+
+def write_postings(connection, postings):
+    """Insert (kmer, seq_id, positions) postings into KmerIndex."""
+    if not postings:
+        return 0
+    # Postings run into the millions, so skip SQLAlchemy's per-row parameter
+    # processing and hand plain tuples straight to the driver
+    if not hasattr(connection, "exec_driver_sql"):
+        connection = connection.connection()
+    connection.exec_driver_sql(
+        "INSERT OR REPLACE INTO KmerIndex (kmer, seq_id, positions) VALUES (?, ?, ?)", postings
+    )
+    return len(postings)
+
+
+def index_sequences(connection, rows, k):
+    """
+    Add postings for (seq_id, sequence) pairs, writing each run of records
+    before computing the next. Returns the number of postings.
+    """
+    return sum(write_postings(connection, _chunk_postings(chunk, k))
+               for chunk in _record_chunks(rows, POSTINGS_CHUNK_BASES))
+
+
+def prepare_kmer_index(connection):
+    """
+    Called before an import writes sequences. Returns k if new sequences
+    should be indexed, or None if the index is disabled.
+
+    Disabling the index or changing k marks it incomplete, so search falls
+    back to LIKE until rebuild_kmer_index() is run. An empty database starts
+    out with a complete index.
+    """
+    ensure_kmer_tables(connection)
+    enabled, k = configured_kmer_index()
+    state_k = get_state(connection, "kmer_index_k")
+    if not enabled or (state_k is not None and int(state_k) != k):
+        set_state(connection, "kmer_index_complete", "0")
+        return None
+    if state_k is None:
+        has_sequences = connection.execute(text("SELECT 1 FROM GenomicData LIMIT 1")).fetchone()
+        set_state(connection, "kmer_index_k", str(k))
+        set_state(connection, "kmer_index_complete", "0" if has_sequences else "1")
+    return k
+
+
+def usable_kmer_size(connection):
+    """Return k if the index is complete and matches config.yaml, else None."""
+    enabled, k = configured_kmer_index()
+    if not enabled:
+        return None
+    try:
+        state_k = get_state(connection, "kmer_index_k")
+        complete = get_state(connection, "kmer_index_complete")
+    except Exception:
+        return None
+    if state_k is None or int(state_k) != k or complete != "1":
+        return None
+    return k
+
+
+def _motif_tiles(connection, motif):
+    """
+    Return (kmer, offset) tiles covering every base of `motif`, or None if
+    the index cannot answer for it.
+    """
+    k = usable_kmer_size(connection)
+    motif = motif.upper()
+    if k is None or len(motif) < k or set(motif) - set("ACGT"):
+        return None
+    offsets = list(range(0, len(motif) - k + 1, k))
+    if offsets[-1] != len(motif) - k:
+        offsets.append(len(motif) - k)
+    return [(encode_kmer(motif[offset:offset + k]), offset) for offset in offsets]
+
+
+def _match_tiles(connection, tiles, first_postings):
+    """
+    Return the sorted seq_ids among the first tile's (seq_id, positions)
+    postings where every other tile occurs at a consistent start position.
+    Other tiles are looked up for those seq_ids only.
+    """
+    postings_query = text("""
+        SELECT seq_id, positions FROM KmerIndex
+        WHERE kmer = :kmer AND seq_id IN (SELECT value FROM json_each(:ids))
+    """)
+    offset = tiles[0][1]
+    candidates = {seq_id: np.frombuffer(positions, dtype="<u4").astype(np.int64) - offset
+                  for seq_id, positions in first_postings}
+    for kmer, offset in tiles[1:]:
+        if not candidates:
+            break
+        starts = {
+            seq_id: np.intersect1d(candidates[seq_id], np.frombuffer(positions, dtype="<u4").astype(np.int64) - offset)
+            for seq_id, positions in connection.execute(postings_query, {"kmer": kmer, "ids": json.dumps(list(candidates))})
+        }
+        candidates = {seq_id: found for seq_id, found in starts.items() if len(found)}
+    return sorted(candidates)
+
+
+def find_motif_ids(connection, motif):
+    """
+    Return the ids of GenomicData rows containing `motif`, or None if the
+    index cannot answer the query (index unusable, motif shorter than k or
+    containing non-ACGT characters).
+
+    The motif is tiled with k-mers that cover every base; a sequence matches
+    when all tiles occur at offsets consistent with one start position. Since
+    k-mers are stored exactly, no sequence text has to be read to confirm.
+    """
+    tiles = _motif_tiles(connection, motif)
+    if tiles is None:
+        return None
+    first_postings = connection.execute(text("SELECT seq_id, positions FROM KmerIndex WHERE kmer = :kmer"),
+                                        {"kmer": tiles[0][0]}).fetchall()
+    return _match_tiles(connection, tiles, first_postings)
+
+
+def find_motif_ids_after(connection, motif, last=0, limit=100):
+    """
+    Keyset variant of find_motif_ids(): return up to `limit` matching ids
+    greater than `last`, in id order, or None if the index cannot answer.
+    The first tile's postings are walked in seq_id order on the (kmer,
+    seq_id) key a chunk at a time, stopping once `limit` ids are confirmed,
+    so the work follows `limit` rather than the total number of matches.
+    """
+    tiles = _motif_tiles(connection, motif)
+    if tiles is None:
+        return None
+    chunk_query = text("""
+        SELECT seq_id, positions FROM KmerIndex
+        WHERE kmer = :kmer AND seq_id > :last
+        ORDER BY seq_id
+        LIMIT :chunk
+    """)
+    chunk = max(limit, MOTIF_CHUNK_POSTINGS)
+    ids = []
+    while len(ids) < limit:
+        postings = connection.execute(chunk_query, {"kmer": tiles[0][0], "last": last, "chunk": chunk}).fetchall()
+        if not postings:
+            break
+        ids += _match_tiles(connection, tiles, postings)
+        last = postings[-1][0]
+        if len(postings) < chunk:
+            break
+    return ids[:limit]
+
+
+def rebuild_kmer_index(k=None, batch_size=1000):
+    """
+    Rebuild the k-mer index from scratch over every stored sequence.
+    Runs in id-ordered batches, so it can be used offline on a large store.
+    """
+    if k is None:
+        k = configured_kmer_index()[1]
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}.")
+
+    engine = get_engine()
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        ensure_kmer_tables(connection)
+        connection.execute(text("DELETE FROM KmerIndex"))
+        set_state(connection, "kmer_index_k", str(k))
+        set_state(connection, "kmer_index_complete", "0")
+
+    select_query = text(f"""
+        SELECT id, {stored_value_sql()} FROM GenomicData
+        WHERE id > :last_id
+        ORDER BY id
+        LIMIT :batch_size
+    """)
+    last_id, n_sequences, n_postings = 0, 0, 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select_query, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+            if not rows:
+                break
+            n_postings += index_sequences(connection, [(row_id, decode_sequence(value)) for row_id, value in rows], k)
+            n_sequences += len(rows)
+            last_id = rows[-1][0]
+
+    with engine.begin() as connection:
+        set_state(connection, "kmer_index_complete", "1")
+
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {n_sequences} sequences ({n_postings:,} postings, k={k}) in {elapsed:.2f}s.")
+    return {"k": k, "sequences": n_sequences, "postings": n_postings, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    rebuild_kmer_index(int(sys.argv[1]) if len(sys.argv) > 1 else None)
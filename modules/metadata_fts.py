@@ -0,0 +1,99 @@
+import re
+
+from sqlalchemy import text
+
+# External-content FTS5 index over Metadata. Triggers keep it in step with every
+# INSERT/UPDATE/DELETE on Metadata, including the upserts in import_metadata.
+FTS_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS MetadataFTS USING fts5(
+        lab_id, key, value,
+        content='Metadata', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS Metadata_fts_insert AFTER INSERT ON Metadata BEGIN
+        INSERT INTO MetadataFTS (rowid, lab_id, key, value)
+        VALUES (new.id, new.lab_id, new.key, new.value);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS Metadata_fts_delete AFTER DELETE ON Metadata BEGIN
+        INSERT INTO MetadataFTS (MetadataFTS, rowid, lab_id, key, value)
+        VALUES ('delete', old.id, old.lab_id, old.key, old.value);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS Metadata_fts_update AFTER UPDATE ON Metadata BEGIN
+        INSERT INTO MetadataFTS (MetadataFTS, rowid, lab_id, key, value)
+        VALUES ('delete', old.id, old.lab_id, old.key, old.value);
+        INSERT INTO MetadataFTS (rowid, lab_id, key, value)
+        VALUES (new.id, new.lab_id, new.key, new.value);
+    END
+    """,
+]
+
+
+def has_metadata_fts(connection):
+    """Return True if the MetadataFTS index exists in this database."""
+    return connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'MetadataFTS'"
+    )).fetchone() is not None
+
+
+def ensure_metadata_fts(connection):
+    """
+    Create the MetadataFTS index and its sync triggers if they are missing.
+    A newly created index is populated from the existing Metadata rows.
+    Returns False if this SQLite build has no FTS5 support.
+    """
+    if has_metadata_fts(connection):
+        return True
+    try:
+        for statement in FTS_STATEMENTS:
+            connection.execute(text(statement))
+    except Exception as e:
+        if "fts5" in str(e).lower():
+            return False
+        raise
+    connection.execute(text("INSERT INTO MetadataFTS (MetadataFTS) VALUES ('rebuild')"))
+    return True
+
+
+def build_fts_query(keyword):
+    """
+    Turn a free-text keyword into an FTS5 MATCH expression: every word must
+    match, and each word is a prefix ("Mort" finds "Mortierella").
+    Returns None if the keyword has no searchable words.
+    """
+    words = re.findall(r"\w+", keyword)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_metadata_fts(connection, keyword, limit=None):
+    """
+    Run a ranked full-text search over Metadata.
+
+    Returns rows of (lab_id, key, value, snippet, rank) ordered by bm25, where
+    snippet is the engine-highlighted value with matches in [brackets].
+    """
+    query = build_fts_query(keyword)
+    if query is None:
+        return []
+    sql = """
+        SELECT m.lab_id, m.key, m.value,
+               snippet(MetadataFTS, 2, '[', ']', '...', 12) AS snippet,
+               bm25(MetadataFTS) AS rank
+        FROM MetadataFTS
+        JOIN Metadata m ON m.id = MetadataFTS.rowid
+        WHERE MetadataFTS MATCH :query
+        ORDER BY rank
+    """
+    params = {"query": query}
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    return connection.execute(text(sql), params).fetchall()
@@ -0,0 +1,165 @@
+import json
+import re
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_schema
+from modules.spatial import refresh_sample_locations
+
+# MetadataWide holds one typed row per lab_id, pivoted from the Metadata
+# key/value store. It is refreshed for the touched lab IDs by every import and
+# delete, so multi-field filters become plain indexed column predicates.
+LAB_ID_COLUMN = "Uehling Lab ID"
+SQL_TYPES = {"TEXT": "TEXT", "REAL": "REAL", "INTEGER": "INTEGER", "DATE": "TEXT"}
+MISSING_VALUES = {"", "nan", "NaN", "NaT", "None", "none", "null", "NULL"}
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d-%b-%Y", "%Y/%m/%d")
+
+
+def column_name(field):
+    """Return the MetadataWide column name for a schema.yaml metadata field."""
+    return re.sub(r"\W+", "_", field.strip().lower()).strip("_")
+
+
+def quote(identifier):
+    """Quote a column name for SQL (some start with a digit, e.g. 16s_...)."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def wide_columns():
+    """
+    Return [(field, column, type)] for every metadata field except the lab ID,
+    which is the table's key.
+    """
+    schema = load_schema()
+    types = schema.get("metadata_types") or {}
+    return [
+        (field, column_name(field), str(types.get(field, "TEXT")).upper())
+        for field in schema["metadata_columns"]
+        if field != LAB_ID_COLUMN
+    ]
+
+
+def convert_value(value, value_type):
+    """
+    Convert a stored Metadata string to its MetadataWide type.
+    Blank and unparseable values become NULL.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value in MISSING_VALUES:
+        return None
+    try:
+        if value_type == "REAL":
+            return float(value)
+        if value_type == "INTEGER":
+            return int(float(value))
+        if value_type == "DATE":
+            try:
+                return datetime.fromisoformat(value).date().isoformat()
+            except ValueError:
+                pass
+            for fmt in DATE_FORMATS:
+                try:
+                    return datetime.strptime(value, fmt).date().isoformat()
+                except ValueError:
+                    continue
+            return None
+    except ValueError:
+        return None
+    return value
+
+
+def ensure_metadata_wide(connection):
+    """
+    Create MetadataWide and its indexes, adding any columns that were added
+    to schema.yaml since the table was created.
+    """
+    columns = wide_columns()
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS MetadataWide (
+            lab_id TEXT PRIMARY KEY,
+            {", ".join(f"{quote(col)} {SQL_TYPES.get(kind, 'TEXT')}" for _, col, kind in columns)}
+        )
+    """))
+    existing = {row[1] for row in connection.execute(text("PRAGMA table_info(MetadataWide)"))}
+    for _, col, kind in columns:
+        if col not in existing:
+            connection.execute(text(f"ALTER TABLE MetadataWide ADD COLUMN {quote(col)} {SQL_TYPES.get(kind, 'TEXT')}"))
+
+    for entry in load_schema().get("metadata_indexes") or []:
+        fields = entry if isinstance(entry, list) else [entry]
+        cols = [column_name(field) for field in fields]
+        name = "idx_wide_" + "__".join(cols)
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {quote(name)} ON MetadataWide ({', '.join(quote(c) for c in cols)})"
+        ))
+
+
+def refresh_metadata_wide(connection, lab_ids):
+    """
+    Re-pivot the given lab IDs from Metadata into MetadataWide (and their
+    coordinates into SampleLocation). Lab IDs with no metadata left are
+    removed. Runs inside the caller's transaction.
+    """
+    lab_ids = list(dict.fromkeys(str(lab_id) for lab_id in lab_ids))
+    if not lab_ids:
+        return 0
+    ensure_metadata_wide(connection)
+    columns = wide_columns()
+    by_field = {field: (col, kind) for field, col, kind in columns}
+    params = {"lab_ids": json.dumps(lab_ids)}
+
+    connection.execute(text("""
+        DELETE FROM MetadataWide WHERE lab_id IN (SELECT value FROM json_each(:lab_ids))
+    """), params)
+    rows = connection.execute(text("""
+        SELECT lab_id, key, value FROM Metadata
+        WHERE lab_id IN (SELECT value FROM json_each(:lab_ids))
+    """), params)
+
+    records = {}
+    for lab_id, key, value in rows:
+        record = records.setdefault(lab_id, {"lab_id": lab_id})
+        if key in by_field:
+            col, kind = by_field[key]
+            record[col] = convert_value(value, kind)
+
+    if records:
+        cols = [col for _, col, _ in columns]
+        connection.execute(text(f"""
+            INSERT INTO MetadataWide (lab_id, {", ".join(quote(c) for c in cols)})
+            VALUES (:lab_id, {", ".join(f":p{i}" for i in range(len(cols)))})
+        """), [
+            {"lab_id": record["lab_id"], **{f"p{i}": record.get(col) for i, col in enumerate(cols)}}
+            for record in records.values()
+        ])
+    # Keep the coordinate R*Tree in step with the parsed latitude/longitude
+    refresh_sample_locations(connection, lab_ids)
+    return len(records)
+
+
+def rebuild_metadata_wide(batch_size=5000):
+    """
+    Rebuild MetadataWide from scratch, e.g. after changing metadata_types in
+    schema.yaml. Column types only change if the table is dropped first, so
+    this drops and recreates it.
+    """
+    engine = get_engine()
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS MetadataWide"))
+        connection.execute(text("DROP TABLE IF EXISTS SampleLocation"))
+        ensure_metadata_wide(connection)
+        lab_ids = [row[0] for row in connection.execute(text("SELECT DISTINCT lab_id FROM Metadata"))]
+        refreshed = 0
+        for i in range(0, len(lab_ids), batch_size):
+            refreshed += refresh_metadata_wide(connection, lab_ids[i:i + batch_size])
+    print(f"Rebuilt MetadataWide for {refreshed} lab IDs in {time.perf_counter() - start:.2f}s.")
+    return refreshed
+
+
+if __name__ == "__main__":
+    rebuild_metadata_wide()
@@ -0,0 +1,229 @@
+from sqlalchemy import text
+
+from modules.utils import get_engine, set_state
+
+
+def column_names(connection, table):
+    """Return the column names of a table (empty if it does not exist)."""
+    return [row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))]
+
+
+def add_file_uploaded_column(connection, table):
+    """
+    Add a file_uploaded timestamp to an existing table.
+
+    SQLite cannot ALTER in a column with a CURRENT_TIMESTAMP default, so the
+    column is added bare and an insert trigger stamps new rows instead.
+    """
+    if "file_uploaded" in column_names(connection, table):
+        return False
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN file_uploaded DATETIME"))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_stamp_upload AFTER INSERT ON {table}
+        WHEN new.file_uploaded IS NULL
+        BEGIN
+            UPDATE {table} SET file_uploaded = CURRENT_TIMESTAMP WHERE id = new.id;
+        END
+    """))
+    return True
+
+
+def _create_base_tables(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS Metadata (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lab_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            file_uploaded DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(lab_id, key)
+        )
+    """))
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS GenomicData (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lab_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            seq_order INTEGER,
+            file_uploaded DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(lab_id, key)
+        )
+    """))
+
+
+def _add_file_uploaded(connection):
+    add_file_uploaded_column(connection, "Metadata")
+    add_file_uploaded_column(connection, "GenomicData")
+
+
+def _add_seq_order(connection):
+    if "seq_order" in column_names(connection, "GenomicData"):
+        return
+    connection.execute(text("ALTER TABLE GenomicData ADD COLUMN seq_order INTEGER"))
+    # Existing rows were inserted in file order, so id order is the best guess
+    connection.execute(text("""
+        UPDATE GenomicData SET seq_order = ranked.seq_order
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY lab_id ORDER BY id) - 1 AS seq_order
+            FROM GenomicData
+        ) AS ranked
+        WHERE GenomicData.id = ranked.id
+    """))
+
+
+def _add_access_indexes(connection):
+    for statement in (
+        # search_db lab-ID path: first sequences of a lab ID in file order
+        "CREATE INDEX IF NOT EXISTS idx_genomic_lab_order ON GenomicData (lab_id, seq_order)",
+        # field lookups such as key = 'Extracted by' AND value = ...
+        "CREATE INDEX IF NOT EXISTS idx_metadata_key_value ON Metadata (key, value)",
+        # MAX(file_uploaded) in db_info
+        "CREATE INDEX IF NOT EXISTS idx_metadata_file_uploaded ON Metadata (file_uploaded)",
+        "CREATE INDEX IF NOT EXISTS idx_genomic_file_uploaded ON GenomicData (file_uploaded)",
+    ):
+        connection.execute(text(statement))
+
+
+def _create_support_tables(connection):
+    from modules.data_import import ensure_checkpoint_table
+    from modules.kmer_index import ensure_kmer_tables
+
+    ensure_checkpoint_table(connection)
+    ensure_kmer_tables(connection)
+
+
+def _create_metadata_fts(connection):
+    from modules.metadata_fts import ensure_metadata_fts
+
+    ensure_metadata_fts(connection)
+
+
+def _create_metadata_wide(connection):
+    from modules.metadata_wide import ensure_metadata_wide, refresh_metadata_wide
+
+    ensure_metadata_wide(connection)
+    lab_ids = [row[0] for row in connection.execute(text("SELECT DISTINCT lab_id FROM Metadata"))]
+    refresh_metadata_wide(connection, lab_ids)
+
+
+def _create_sample_locations(connection):
+    from modules.spatial import ensure_sample_locations, refresh_sample_locations
+
+    ensure_sample_locations(connection)
+    lab_ids = [row[0] for row in connection.execute(text("SELECT lab_id FROM MetadataWide"))]
+    refresh_sample_locations(connection, lab_ids)
+
+
+def _create_stats_tables(connection):
+    from modules.db_stats import ensure_stats_tables, refresh_lab_stats
+
+    ensure_stats_tables(connection)
+    lab_ids = [row[0] for row in connection.execute(text(
+        "SELECT lab_id FROM Metadata UNION SELECT lab_id FROM GenomicData"
+    ))]
+    refresh_lab_stats(connection, lab_ids)
+
+
+def _create_sketch_tables(connection):
+    from modules.similarity import ensure_sketch_tables
+
+    # Existing sequences are sketched by python -m modules.similarity; until
+    # then similarity searches warn that the index is incomplete.
+    ensure_sketch_tables(connection)
+    if connection.execute(text("SELECT 1 FROM GenomicData LIMIT 1")).fetchone():
+        set_state(connection, "sketch_complete", "0")
+
+
+def _create_sequence_blobs(connection):
+    from modules.sequence_store import ensure_blob_table
+
+    # Existing rows keep their inline values; python -m modules.sequence_store
+    # moves them into SequenceBlob.
+    ensure_blob_table(connection)
+
+
+def _add_checkpoint_fingerprint(connection):
+    from modules.data_import import ensure_checkpoint_table
+
+    ensure_checkpoint_table(connection)
+
+
+# (version, description, function). Append new steps; never renumber.
+MIGRATIONS = [
+    (1, "create Metadata and GenomicData tables", _create_base_tables),
+    (2, "add file_uploaded timestamps", _add_file_uploaded),
+    (3, "add GenomicData.seq_order", _add_seq_order),
+    (4, "add indexes for lab ID, key/value and upload-time lookups", _add_access_indexes),
+    (5, "create ImportCheckpoint, DbState and KmerIndex tables", _create_support_tables),
+    (6, "create MetadataFTS full-text index", _create_metadata_fts),
+    (7, "create MetadataWide typed sample table", _create_metadata_wide),
+    (8, "create SampleLocation R*Tree", _create_sample_locations),
+    (9, "add GenomicData.seq_length and LabStats/TableStats statistics", _create_stats_tables),
+    (10, "create SequenceSketch and SketchBand similarity tables", _create_sketch_tables),
+    (11, "add GenomicData.seq_hash and content-addressed SequenceBlob table", _create_sequence_blobs),
+    (12, "add ImportCheckpoint.fingerprint", _add_checkpoint_fingerprint),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(connection):
+    """Return the schema version recorded in PRAGMA user_version."""
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrate(engine=None, verbose=True):
+    """
+    Bring the database up to the latest schema version.
+
+    The version is stored in PRAGMA user_version and bumped after each step.
+    Every step is safe to run on a database that already has some of its
+    changes, so a failed migration can simply be retried.
+    """
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        version = schema_version(connection)
+
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        if verbose:
+            print(f"Applying migration {number}: {description}...")
+        with engine.begin() as connection:
+            apply(connection)
+            connection.execute(text(f"PRAGMA user_version = {int(number)}"))
+        version = number
+    return version
+
+
+def check_query_plans(engine=None, verbose=True):
+    """
+    Run EXPLAIN QUERY PLAN on search_db's lab-ID queries and report whether
+    any of them still scans a whole table.
+
+    Returns {query name: [plan steps]}; steps starting with "SCAN" are full
+    table scans.
+    """
+    from modules.search import LAB_ID_METADATA_QUERY, LAB_ID_GENOMIC_QUERY
+
+    engine = engine or get_engine()
+    plans = {}
+    with engine.connect() as connection:
+        for name, query in (("lab_id metadata", LAB_ID_METADATA_QUERY),
+                            ("lab_id genomic", LAB_ID_GENOMIC_QUERY)):
+            rows = connection.execute(text("EXPLAIN QUERY PLAN " + query), {"lab_id": "UL001"})
+            plans[name] = [row[-1] for row in rows]
+
+    if verbose:
+        for name, steps in plans.items():
+            status = "SCANS" if any(step.startswith("SCAN") for step in steps) else "ok"
+            print(f"{name}: {status}")
+            for step in steps:
+                print(f"    {step}")
+    return plans
+
+
+if __name__ == "__main__":
+    print(f"Schema is at version {migrate()}.")
+    check_query_plans()
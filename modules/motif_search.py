@@ -0,0 +1,249 @@
+import json
+import re
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from modules.utils import get_engine
+from modules.seq_codec import decode_sequence
+from modules.sequence_store import stored_value_sql
+from modules.kmer_index import kmer_array, encode_kmer
+from modules.instrumentation import span
+
+# Multi-primer motif search over stored sequences.
+#
+# Every motif is compiled, together with its reverse complement, into one
+# seed table: a short exact window of each pattern (expanded over its IUPAC
+# codes) keyed by its 2-bit k-mer value, as in the k-mer index. A batch of
+# sequences is scanned once with numpy (kmer_array + isin), which finds the
+# seed hits for every primer on both strands in a single pass; each hit is
+# then verified against the full degenerate pattern. Cost grows with the
+# number of bases, not the number of primers.
+
+IUPAC = {
+    "A": "A", "C": "C", "G": "G", "T": "T", "U": "T",
+    "R": "AG", "Y": "CT", "S": "CG", "W": "AT", "K": "GT", "M": "AC",
+    "B": "CGT", "D": "AGT", "H": "ACT", "V": "ACG", "N": "ACGT",
+}
+_COMPLEMENT = str.maketrans("ACGTURYSWKMBDHVN", "TGCAAYRSWMKVHDBN")
+
+SEED_LENGTH = 12
+# Seed windows expanding to more exact k-mers than this are not used
+MAX_SEED_EXPANSIONS = 4096
+CONTEXT = 40
+BATCH_SIZE = 500
+
+# Common fungal ITS primers, usable by name
+KNOWN_PRIMERS = {
+    "ITS1": "TCCGTAGGTGAACCTGCGG",
+    "ITS1F": "CTTGGTCATTTAGAGGAAGTAA",
+    "ITS2": "GCTGCGTTCTTCATCGATGC",
+    "ITS3": "GCATCGATGAAGAACGCAGC",
+    "ITS4": "TCCTCCGCTTATTGATATGC",
+    "ITS86F": "GTGAATCATCGAATCTTTGAA",
+    "fITS7": "GTGARTCATCGAATCTTTG",
+    "ITS4ngs": "TCCTSCGCTTATTGATATGC",
+}
+
+
+def reverse_complement(motif):
+    """Return the reverse complement of an IUPAC nucleotide string."""
+    return motif.upper().translate(_COMPLEMENT)[::-1]
+
+
+def clean_motif(motif):
+    """Upper-case a motif and check it only holds IUPAC nucleotide codes."""
+    motif = re.sub(r"\s+", "", motif).upper()
+    if not motif:
+        raise ValueError("Empty motif.")
+    bad = sorted(set(motif) - set(IUPAC))
+    if bad:
+        raise ValueError(f"Motif '{motif}' contains non-IUPAC characters: {''.join(bad)}")
+    return motif.replace("U", "T")
+
+
+def parse_motifs(entries):
+    """
+    Turn motif entries into {name: motif}. An entry is a known primer name
+    (e.g. "ITS1F"), "NAME=SEQUENCE", or a bare sequence (named after itself).
+    """
+    motifs = {}
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        if "=" in entry:
+            name, motif = (part.strip() for part in entry.split("=", 1))
+        elif entry in KNOWN_PRIMERS:
+            name, motif = entry, KNOWN_PRIMERS[entry]
+        else:
+            name, motif = entry, entry
+        motifs[name] = clean_motif(motif)
+    return motifs
+
+
+def read_motif_file(path):
+    """
+    Read primers from a FASTA file (>name / sequence) or a text file with one
+    "NAME=SEQUENCE", "NAME SEQUENCE" or known primer name per line.
+    """
+    with open(path, "r") as file:
+        lines = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    if lines and lines[0].startswith(">"):
+        motifs, name = {}, None
+        for line in lines:
+            if line.startswith(">"):
+                name = line[1:].split(None, 1)[0]
+                motifs[name] = ""
+            elif name is not None:
+                motifs[name] += line
+        return {name: clean_motif(motif) for name, motif in motifs.items()}
+    return parse_motifs(re.sub(r"^(\S+)\s+(\S+)$", r"\1=\2", line) for line in lines)
+
+
+def _expansions(window):
+    count = 1
+    for code in window:
+        count *= len(IUPAC[code])
+    return count
+
+
+class MotifMatcher:
+    """
+    A compiled set of motifs, matched on both strands. Build once and reuse
+    for every batch of sequences.
+    """
+
+    def __init__(self, motifs, seed_length=SEED_LENGTH):
+        if not motifs:
+            raise ValueError("No motifs to search for.")
+        self.motifs = {name: clean_motif(motif) for name, motif in motifs.items()}
+        # (name, strand, pattern); "-" patterns are reverse complements
+        self.patterns = []
+        for name, motif in self.motifs.items():
+            self.patterns.append((name, "+", motif))
+            reverse = reverse_complement(motif)
+            self.patterns.append((name, "-", reverse))
+        self.regexes = [
+            re.compile("".join(code if len(IUPAC[code]) == 1 else f"[{IUPAC[code]}]" for code in pattern))
+            for _, _, pattern in self.patterns
+        ]
+        self.seed_length = min(seed_length, min(len(pattern) for _, _, pattern in self.patterns))
+
+        # seed k-mer value -> [(pattern index, offset of the seed in the pattern)]
+        self.seeds = {}
+        for index, (name, _, pattern) in enumerate(self.patterns):
+            k = self.seed_length
+            offset = min(range(len(pattern) - k + 1), key=lambda i: _expansions(pattern[i:i + k]))
+            window = pattern[offset:offset + k]
+            if _expansions(window) > MAX_SEED_EXPANSIONS:
+                raise ValueError(f"Motif '{name}' is too degenerate to search (no {k}-base window "
+                                 f"with at most {MAX_SEED_EXPANSIONS} exact forms).")
+            for bases in product(*(IUPAC[code] for code in window)):
+                self.seeds.setdefault(encode_kmer("".join(bases)), []).append((index, offset))
+        self.seed_values = np.array(sorted(self.seeds), dtype=np.int64)
+
+    def scan(self, rows, context=CONTEXT):
+        """
+        Find every motif occurrence in (row, sequence) pairs. Yields
+        (row, name, strand, start, end, matched bases, context snippet);
+        positions are 0-based on the stored (forward) strand, end exclusive.
+        """
+        rows = [(row, seq.upper()) for row, seq in rows if seq]
+        if not rows:
+            return
+        lengths = np.array([len(seq) for _, seq in rows], dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        # N separators keep seeds from spanning two sequences
+        joined = "N".join(seq for _, seq in rows)
+        values, positions = kmer_array(joined.encode("ascii", errors="replace"), self.seed_length)
+        hit = np.isin(values, self.seed_values)
+        values, positions = values[hit].tolist(), positions[hit]
+        owners = (np.searchsorted(starts, positions, side="right") - 1).tolist()
+
+        for value, position, owner in zip(values, positions.tolist(), owners):
+            row, seq = rows[owner]
+            local = position - int(starts[owner])
+            for index, offset in self.seeds[value]:
+                name, strand, pattern = self.patterns[index]
+                start = local - offset
+                end = start + len(pattern)
+                if start < 0 or end > len(seq) or not self.regexes[index].fullmatch(seq, start, end):
+                    continue
+                yield row, name, strand, start, end, seq[start:end], snippet(seq, start, end, context)
+
+
+def snippet(seq, start, end, context=CONTEXT):
+    """Return seq around [start, end) with the match in brackets, as highlight_matches does."""
+    left, right = max(start - context, 0), min(end + context, len(seq))
+    prefix = "..." if left > 0 else ""
+    suffix = "..." if right < len(seq) else ""
+    return f"{prefix}{seq[left:start]}[{seq[start:end]}]{seq[end:right]}{suffix}"
+
+
+def iter_sequences(connection, lab_ids=None, batch_size=BATCH_SIZE):
+    """
+    Stream (id, lab_id, key, sequence) from GenomicData in id-ordered
+    batches, decoding packed sequences. Yields one list per batch.
+    """
+    lab_filter = "AND lab_id IN (SELECT value FROM json_each(:lab_ids))" if lab_ids else ""
+    query = text(f"""
+        SELECT id, lab_id, key, {stored_value_sql()} FROM GenomicData
+        WHERE id > :last_id {lab_filter}
+        ORDER BY id
+        LIMIT :batch_size
+    """)
+    params = {"batch_size": batch_size, "lab_ids": json.dumps(list(lab_ids or []))}
+    last_id = 0
+    while True:
+        with span("fetch"):
+            rows = connection.execute(query, {**params, "last_id": last_id}).fetchall()
+            batch = [(row_id, lab_id, key, decode_sequence(value)) for row_id, lab_id, key, value in rows]
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1][0]
+
+
+def search_motifs(motifs, lab_ids=None, context=CONTEXT, limit=None, engine=None, batch_size=BATCH_SIZE):
+    """
+    Search stored sequences for a set of motifs/primers on both strands.
+
+    `motifs` is {name: IUPAC sequence} (see parse_motifs). Yields a dict per
+    hit with lab_id, key, motif, strand, start, end (0-based, forward
+    strand), match and context, streaming through GenomicData so memory use
+    does not grow with the database.
+    """
+    matcher = MotifMatcher(motifs)
+    engine = engine or get_engine()
+    found = 0
+    with engine.connect() as connection:
+        for batch in iter_sequences(connection, lab_ids, batch_size):
+            with span("match"):
+                hits = list(matcher.scan([((lab_id, key), seq) for _, lab_id, key, seq in batch], context))
+            for (lab_id, key), name, strand, start, end, match, context_snippet in hits:
+                yield {"lab_id": lab_id, "key": key, "motif": name, "strand": strand,
+                       "start": start, "end": end, "match": match, "context": context_snippet}
+                found += 1
+                if limit and found >= limit:
+                    return
+
+
+def find_motifs(motifs, lab_ids=None, context=CONTEXT, limit=None, engine=None):
+    """Like search_motifs, but prints a summary and returns a DataFrame."""
+    columns = ["lab_id", "key", "motif", "strand", "start", "end", "match", "context"]
+    try:
+        results = pd.DataFrame(list(search_motifs(motifs, lab_ids, context, limit, engine)), columns=columns)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+    if results.empty:
+        print("No motif matches found.")
+        return results
+    counts = results.groupby(["motif", "strand"]).size()
+    print(f"Found {len(results)} matches in {results['key'].nunique()} sequences:")
+    for (name, strand), count in counts.items():
+        print(f"  {name} ({strand}): {count}")
+    return results
@@ -0,0 +1,186 @@
+import re
+
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_schema
+from modules.metadata_wide import wide_columns, column_name, convert_value, quote
+
+# Structured sample queries over MetadataWide.
+#
+# A predicate is a (field, op, value) tuple, e.g.
+#     ("ITS Top Hit Similarity", ">=", 97)
+#     ("Extraction Date", "between", ("2025-01-01", "2025-06-30"))
+#     ("has_fasta", "=", True)
+# Fields are schema.yaml metadata names (or MetadataWide column names).
+
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "between", "contains", "in")
+HAS_FASTA = "has_fasta"
+
+# Rows probed per indexed predicate when estimating selectivity
+PROBE_LIMIT = 1000
+
+_PREDICATE_RE = re.compile(
+    r"^\s*(?P<field>.+?)\s+(?P<op>between|contains|in|>=|<=|!=|=|<|>)\s+(?P<value>.+?)\s*$",
+    re.IGNORECASE,
+)
+
+
+def _fields():
+    """Return {lower-case field or column name: (column, type)} for MetadataWide."""
+    fields = {"lab_id": ("lab_id", "TEXT"), "uehling lab id": ("lab_id", "TEXT")}
+    for field, col, kind in wide_columns():
+        fields[field.lower()] = (col, kind)
+        fields[col] = (col, kind)
+    return fields
+
+
+def _indexes():
+    """Return the column lists of every MetadataWide index."""
+    indexes = [["lab_id"]]
+    for entry in load_schema().get("metadata_indexes") or []:
+        fields = entry if isinstance(entry, list) else [entry]
+        indexes.append([column_name(field) for field in fields])
+    return indexes
+
+
+def parse_predicate(expression):
+    """
+    Parse a predicate typed at the menu, such as
+    "ITS Top Hit Similarity >= 97", "Extraction Date between 2025-01-01 and 2025-06-30",
+    "DNA Extraction Method in Method A, Method B" or "has_fasta".
+    """
+    expression = expression.strip()
+    if expression.lower() in (HAS_FASTA, "has fasta"):
+        return (HAS_FASTA, "=", True)
+    match = _PREDICATE_RE.match(expression)
+    if not match:
+        raise ValueError(f"Could not parse predicate '{expression}'. Use: <field> <op> <value>.")
+    field, op, value = match.group("field"), match.group("op").lower(), match.group("value")
+    if field.strip().lower() in (HAS_FASTA, "has fasta"):
+        return (HAS_FASTA, "=", value.strip().lower() not in ("0", "false", "no", "n"))
+    if op == "between":
+        parts = re.split(r"\s+and\s+", value, flags=re.IGNORECASE)
+        if len(parts) != 2:
+            raise ValueError(f"'between' needs two values: '{field} between <low> and <high>'.")
+        value = tuple(part.strip() for part in parts)
+    elif op == "in":
+        value = tuple(part.strip() for part in value.split(","))
+    return (field.strip(), op, value)
+
+
+def _compile_predicate(predicate, index, fields):
+    """
+    Return (sql, params, column) for one predicate. `column` is None for
+    predicates that cannot drive an index lookup.
+    """
+    field, op, value = predicate
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator '{op}'. Choose one of {OPERATORS}.")
+    if field.lower() == HAS_FASTA:
+        exists = "EXISTS (SELECT 1 FROM GenomicData g WHERE g.lab_id = MetadataWide.lab_id)"
+        return (exists if value else f"NOT {exists}"), {}, None
+
+    if field.lower() not in fields:
+        raise ValueError(f"Unknown field '{field}'.")
+    col, kind = fields[field.lower()]
+    name = f"p{index}"
+    ref = quote(col)
+
+    if op == "between":
+        low, high = value
+        return f"{ref} BETWEEN :{name}_lo AND :{name}_hi", {
+            f"{name}_lo": convert_value(low, kind), f"{name}_hi": convert_value(high, kind)
+        }, col
+    if op == "in":
+        names = [f"{name}_{i}" for i in range(len(value))]
+        return f"{ref} IN ({', '.join(':' + n for n in names)})", {
+            n: convert_value(v, kind) for n, v in zip(names, value)
+        }, col
+    if op == "contains":
+        return f"{ref} LIKE :{name}", {name: f"%{value}%"}, None
+    return f"{ref} {op} :{name}", {name: convert_value(value, kind)}, col
+
+
+def op_is_indexable(op):
+    """Return True if an operator can drive an index range or equality search."""
+    return op in ("=", "<", "<=", ">", ">=", "between", "in")
+
+
+def _estimate_rows(connection, sql, params):
+    """Count matches for one predicate, stopping after PROBE_LIMIT rows."""
+    return connection.execute(text(f"""
+        SELECT COUNT(*) FROM (SELECT 1 FROM MetadataWide WHERE {sql} LIMIT {PROBE_LIMIT})
+    """), params).scalar()
+
+
+def plan_query(connection, predicates):
+    """
+    Compile predicates into one parameterized SELECT over MetadataWide.
+
+    Indexed predicates are probed with a capped COUNT and ordered from most
+    to least selective; non-indexed ones (contains, has_fasta, unindexed
+    columns) go last. Only the most selective predicate (plus any column
+    that extends its composite index) is left able to use an index. The
+    others have their column wrapped in SQLite's unary "+", which stops the
+    engine from picking a weaker index, so each query is a single index
+    search followed by row filters.
+
+    Returns (sql, params, plan), where plan lists (predicate, estimate).
+    """
+    fields = _fields()
+    indexes = _indexes()
+    indexed = {cols[0] for cols in indexes}
+    compiled = []
+    for i, predicate in enumerate(predicates):
+        sql, params, col = _compile_predicate(predicate, i, fields)
+        if col in indexed and op_is_indexable(predicate[1]):
+            estimate = _estimate_rows(connection, sql, params)
+        else:
+            col, estimate = None, None
+        compiled.append((predicate, sql, params, col, estimate))
+
+    compiled.sort(key=lambda item: (item[4] is None, item[4] if item[4] is not None else 0))
+    # Columns that can extend the driving predicate's index (composite indexes)
+    driver = compiled[0][3] if compiled else None
+    usable = {col for cols in indexes if cols[0] == driver for col in cols}
+
+    where, params, plan = [], {}, []
+    for position, (predicate, sql, predicate_params, col, estimate) in enumerate(compiled):
+        if col is not None and position > 0 and col not in usable:
+            sql = sql.replace(quote(col), "+" + quote(col), 1)
+        where.append(sql)
+        params.update(predicate_params)
+        plan.append((predicate, estimate))
+
+    columns = ["lab_id"] + [quote(col) for _, col, _ in wide_columns()]
+    sql = f"SELECT {', '.join(columns)} FROM MetadataWide"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, params, plan
+
+
+def iter_query(predicates, batch_size=500, engine=None):
+    """
+    Run a structured query and yield one dict per matching sample, keyed by
+    schema.yaml field names. Rows are streamed in batches of `batch_size`, so
+    memory use does not grow with the number of matches.
+    """
+    engine = engine or get_engine()
+    names = ["Uehling Lab ID"] + [field for field, _, _ in wide_columns()]
+    with engine.connect() as connection:
+        sql, params, _ = plan_query(connection, predicates)
+        result = connection.execution_options(stream_results=True).execute(text(sql), params)
+        for batch in result.partitions(batch_size):
+            for row in batch:
+                yield dict(zip(names, row))
+
+
+def explain_query(predicates, engine=None):
+    """
+    Return the selectivity plan and SQLite's EXPLAIN QUERY PLAN for a query.
+    """
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        sql, params, plan = plan_query(connection, predicates)
+        steps = [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql), params)]
+    return {"sql": sql, "params": params, "plan": plan, "steps": steps}
@@ -0,0 +1,131 @@
+import json
+import re
+
+from sqlalchemy import text
+
+from modules.utils import get_engine
+from modules.seq_codec import sequence_slice
+from modules.sequence_store import stored_value_sql
+from modules.motif_search import reverse_complement
+from modules.instrumentation import span
+
+# Region retrieval: bases [start, end) of stored sequences, 0-based with the
+# end excluded (as in Python slices and motif search hits).
+#
+# Only the stored value of each sequence is fetched, and only the requested
+# bases are decoded from it: sequences in the flat-file store (see
+# fasta_store) are read through mmap at fixed line-width offsets, so a region
+# costs I/O proportional to its length; 2-bit values are unpacked over the
+# region alone. Batches of regions fetch each sequence once.
+
+BATCH_SIZE = 500
+STRANDS = {"+": "+", "1": "+", "plus": "+", "-": "-", "-1": "-", "minus": "-"}
+
+
+def parse_strand(strand):
+    """Normalise a strand given as +/-, 1/-1 or plus/minus."""
+    normalised = STRANDS.get(str(strand or "+").strip().lower())
+    if normalised is None:
+        raise ValueError(f"Unknown strand '{strand}'. Use + or -.")
+    return normalised
+
+
+def parse_region(lab_id, key, start, end, strand="+"):
+    """Validate one region and return it as a dict."""
+    start, end = int(start), int(end)
+    if start < 0 or end <= start:
+        raise ValueError(f"Invalid region {start}-{end} for {lab_id} {key}: need 0 <= start < end.")
+    return {"lab_id": str(lab_id).strip(), "key": str(key).strip(), "start": start, "end": end,
+            "strand": parse_strand(strand)}
+
+
+def read_regions_file(path):
+    """
+    Read regions from a tab, comma or space separated file with columns
+    lab_id, key, start, end and optionally strand. Blank lines, # comments
+    and a header row starting with "lab_id" are skipped.
+    """
+    regions = []
+    with open(path, "r") as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#") or line.lower().startswith("lab_id"):
+                continue
+            fields = [field for field in re.split(r"[\t,]|\s+", line) if field]
+            if len(fields) not in (4, 5):
+                raise ValueError(f"{path}:{number}: expected lab_id, key, start, end [, strand].")
+            regions.append(parse_region(*fields))
+    return regions
+
+
+def get_regions(regions, engine=None, batch_size=BATCH_SIZE):
+    """
+    Fetch many regions, given as dicts (see parse_region) or
+    (lab_id, key, start, end[, strand]) tuples. Yields one dict per region,
+    in order, with the region's sequence (reverse complemented on the "-"
+    strand), the sequence's full length and the end clipped to it.
+    "sequence" is None if the lab ID has no sequence with that key.
+    """
+    engine = engine or get_engine()
+    value_query = text(f"""
+        SELECT g.lab_id, g.key, g.seq_length, {stored_value_sql("g")}
+        FROM json_each(:pairs) AS p
+        JOIN GenomicData g ON g.lab_id = json_extract(p.value, '$[0]') AND g.key = json_extract(p.value, '$[1]')
+    """)
+    regions = [region if isinstance(region, dict) else parse_region(*region) for region in regions]
+    with engine.connect() as connection:
+        for i in range(0, len(regions), batch_size):
+            batch = regions[i:i + batch_size]
+            pairs = list(dict.fromkeys((region["lab_id"], region["key"]) for region in batch))
+            with span("fetch"):
+                stored = {(lab_id, key): (length, value) for lab_id, key, length, value in connection.execute(
+                    value_query, {"pairs": json.dumps(pairs)})}
+            for region in batch:
+                length, value = stored.get((region["lab_id"], region["key"]), (None, None))
+                sequence = sequence_slice(value, region["start"], region["end"]) if value is not None else None
+                if sequence is not None and region["strand"] == "-":
+                    sequence = reverse_complement(sequence)
+                end = region["end"] if length is None else min(region["end"], length)
+                yield {**region, "end": max(end, region["start"]), "length": length, "sequence": sequence}
+
+
+def get_region(lab_id, key, start, end, strand="+", engine=None):
+    """
+    Return bases [start, end) of the sequence stored under (lab_id, key) on
+    the given strand, or None if there is no such sequence. The end is
+    clipped to the sequence length.
+    """
+    return next(get_regions([parse_region(lab_id, key, start, end, strand)], engine))["sequence"]
+
+
+def region_name(region):
+    """FASTA header for an extracted region."""
+    return f"{region['key']}:{region['start']}-{region['end']}({region['strand']}) lab_id={region['lab_id']}"
+
+
+def extract_regions(regions, file_path=None, engine=None):
+    """
+    Fetch regions and write them as FASTA (to file_path, .gz compressed if
+    the name ends in .gz, or to the screen). Returns the list of results.
+    """
+    from modules.export_utils import open_output, write_fasta_record
+
+    try:
+        results = list(get_regions(regions, engine))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+    found = [region for region in results if region["sequence"] is not None]
+    for region in results:
+        if region["sequence"] is None:
+            print(f"No sequence '{region['key']}' stored for {region['lab_id']}.")
+    if file_path:
+        with open_output(file_path) as handle:
+            for region in found:
+                write_fasta_record(handle, region_name(region), region["sequence"])
+        print(f"Wrote {len(found)} regions to {file_path}")
+    else:
+        for region in found:
+            print(f">{region_name(region)}")
+            print(region["sequence"])
+    return results
@@ -1,18 +1,40 @@
 import pandas as pd
-from sqlalchemy import create_engine, inspect
-import os
-import yaml
-from modules.utils import load_schema
+from sqlalchemy import text
+from modules.utils import load_schema, load_config, get_engine, get_generation
+from modules.seq_codec import decode_sequence, sequence_slice
+from modules.kmer_index import find_motif_ids, find_motif_ids_after
+from modules.sequence_store import stored_value_sql
+from modules.metadata_fts import has_metadata_fts, search_metadata_fts, build_fts_query
+from modules.spatial import bbox_candidates, radius_boxes, haversine_km
+from modules.search_cache import get_search_cache
+from modules.instrumentation import span
+import base64
+import io
+import json
 import re
+from contextlib import redirect_stdout
 
 schema = load_schema()
 
-# Load DB path
-with open("config/config.yaml", "r") as file:
-    config = yaml.safe_load(file)
+# Shared engine configured from config/config.yaml
+engine = get_engine()
 
-DB_PATH = os.path.expanduser(config["database"]["path"])
-engine = create_engine(f"sqlite:///{DB_PATH}")
+# Bases of each sequence shown by a lab-ID search (two 60-column lines)
+PREVIEW_BASES = 120
+
+# Lab-ID lookups; migrations.check_query_plans() verifies these use indexes
+LAB_ID_METADATA_QUERY = """
+    SELECT key, value
+    FROM Metadata
+    WHERE lab_id = :lab_id
+"""
+LAB_ID_GENOMIC_QUERY = f"""
+    SELECT key, seq_length, {stored_value_sql()} AS value
+    FROM GenomicData
+    WHERE lab_id = :lab_id
+    ORDER BY seq_order
+    LIMIT 10
+"""
 
 def highlight_matches(seq, keyword, context=40, max_snippets=2):
     """Return up to max_snippets matches of keyword in seq, with up to `context` chars before/after each match."""
@@ -32,53 +54,318 @@ def highlight_matches(seq, keyword, context=40, max_snippets=2):
         snippets.append("...more matches...")
     return " | ".join(snippets)
 
-def search_db(keyword):
+def search_db(keyword, *, use_cache=True):
     """
     Search all tables for a keyword. If the keyword matches a Uehling Lab ID (ULXXX),
     return all metadata for that Lab ID and the first 10 FASTA sequences (first 2 lines of each).
+
+    Results (and the report printed for them) are cached until the next
+    import or delete; pass use_cache=False to always query the database.
+    To page through every match, use search_page() instead.
+    """
+    keyword = keyword.strip()
+    if not use_cache:
+        return _search_db(keyword)
+
+    cache = get_search_cache()
+    try:
+        with engine.connect() as connection:
+            generation = get_generation(connection)
+    except Exception:
+        # No DbState table yet (un-migrated database): skip the cache
+        return _search_db(keyword)
+    key = (str(engine.url), "search_db", keyword)
+    cached = cache.get(key, generation)
+    if cached is not None:
+        report, results = cached
+        print(report, end="")
+        return results.copy()
+
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        results = _search_db(keyword)
+    report = buffer.getvalue()
+    print(report, end="")
+    if results is not None:
+        cache.put(key, generation, (report, results.copy()))
+    return results
+
+
+# ---- Paginated search ----
+#
+# search_page() returns one page of a search and a cursor for the next. Pages
+# are keyset-paginated: the cursor records the last row returned (its id, or
+# (seq_order, id) for a lab ID's sequences), and the next page starts right
+# after it through the same index, never with an OFFSET. A page therefore
+# reads at most page_size + 1 rows whatever the total number of matches
+# (motif hits come from find_motif_ids_after(), which walks k-mer postings on
+# the same keyset; LIKE fallbacks stop scanning once the page is full), and
+# rows added or deleted between pages do not shift the rest of the results.
+#
+# Results come from a fixed sequence of stages, each walked in key order:
+#   lab ID:  that lab's Metadata (by id), then its sequences (by seq_order, id)
+#   keyword: matching Metadata (FTS5 in rowid order, or LIKE by id), then
+#            matching GenomicData (by id)
+
+PAGE_SIZE = 20
+
+
+def configured_page_size():
+    """Return search.page_size from config.yaml."""
+    return int(load_config().get("search", {}).get("page_size", PAGE_SIZE))
+
+
+def encode_cursor(keyword, stage, last):
+    """Return an opaque cursor token for the page after `last` in `stage`."""
+    payload = json.dumps([keyword, stage, last], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token, keyword):
+    """Return (stage, last) from a cursor; raises ValueError if it is not one for `keyword`."""
+    try:
+        cursor_keyword, stage, last = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid search cursor.")
+    if cursor_keyword != keyword:
+        raise ValueError(f"That cursor belongs to a search for '{cursor_keyword}', not '{keyword}'.")
+    return stage, last
+
+
+def _metadata_stage(connection, keyword):
+    """Pick the keyword search's Metadata stage, as search_db does."""
+    if has_metadata_fts(connection):
+        query = build_fts_query(keyword)
+        if query and connection.execute(text("SELECT 1 FROM MetadataFTS WHERE MetadataFTS MATCH :query LIMIT 1"),
+                                        {"query": query}).fetchone():
+            return "fts"
+    return "metadata_like"
+
+
+def _fetch_stage(connection, stage, keyword, last, limit, full):
+    """
+    Fetch up to `limit` rows of one stage after key `last` (None for the
+    start). Returns [(key, row)] with rows of (source, lab_id, key, value).
+    """
+    kw = f"%{keyword}%"
+    stored_value = stored_value_sql()
+    if stage == "lab_metadata":
+        rows = connection.execute(text("""
+            SELECT id, lab_id, key, value FROM Metadata
+            WHERE lab_id = :lab_id AND id > :last
+            ORDER BY id
+            LIMIT :limit
+        """), {"lab_id": keyword, "last": last or 0, "limit": limit}).fetchall()
+        return [(row_id, ("Metadata", lab_id, key, value)) for row_id, lab_id, key, value in rows]
+
+    if stage == "lab_fasta":
+        order, after = last or (-1, 0)
+        rows = connection.execute(text(f"""
+            SELECT seq_order, id, lab_id, key, {stored_value} FROM GenomicData
+            WHERE lab_id = :lab_id AND (seq_order, id) > (:order, :after)
+            ORDER BY seq_order, id
+            LIMIT :limit
+        """), {"lab_id": keyword, "order": order, "after": after, "limit": limit}).fetchall()
+        return [([seq_order, row_id], ("GenomicData", lab_id, key,
+                                       decode_sequence(value) if full else sequence_slice(value, 0, PREVIEW_BASES)))
+                for seq_order, row_id, lab_id, key, value in rows]
+
+    if stage == "fts":
+        # FTS5 walks its matches in rowid order, so this is a keyset too
+        rows = connection.execute(text("""
+            SELECT m.id, m.lab_id, m.key, m.value,
+                   snippet(MetadataFTS, 2, '[', ']', '...', 12)
+            FROM MetadataFTS
+            JOIN Metadata m ON m.id = MetadataFTS.rowid
+            WHERE MetadataFTS MATCH :query AND MetadataFTS.rowid > :last
+            ORDER BY MetadataFTS.rowid
+            LIMIT :limit
+        """), {"query": build_fts_query(keyword), "last": last or 0, "limit": limit}).fetchall()
+        return [(row_id, ("Metadata", lab_id, key, value if full else snippet))
+                for row_id, lab_id, key, value, snippet in rows]
+
+    if stage == "metadata_like":
+        rows = connection.execute(text("""
+            SELECT id, lab_id, key, value FROM Metadata
+            WHERE id > :last AND (lab_id LIKE :kw OR key LIKE :kw OR value LIKE :kw)
+            ORDER BY id
+            LIMIT :limit
+        """), {"kw": kw, "last": last or 0, "limit": limit}).fetchall()
+        return [(row_id, ("Metadata", lab_id, key, value)) for row_id, lab_id, key, value in rows]
+
+    # stage == "genomic"
+    motif_ids = find_motif_ids_after(connection, keyword, last or 0, limit)
+    if motif_ids is not None:
+        # The k-mer index yields the next `limit` motif hits; names are
+        # matched on the row keyset alongside, and the page is their union
+        name_ids = [row_id for (row_id,) in connection.execute(text("""
+            SELECT id FROM GenomicData
+            WHERE id > :last AND (lab_id LIKE :kw OR key LIKE :kw)
+            ORDER BY id
+            LIMIT :limit
+        """), {"kw": kw, "last": last or 0, "limit": limit})]
+        ids = sorted(set(motif_ids) | set(name_ids))[:limit]
+        rows = connection.execute(text(f"""
+            SELECT id, lab_id, key, {stored_value} FROM GenomicData
+            WHERE id IN (SELECT value FROM json_each(:ids))
+            ORDER BY id
+        """), {"ids": json.dumps(ids)}).fetchall()
+    else:
+        rows = connection.execute(text(f"""
+            SELECT id, lab_id, key, {stored_value} FROM GenomicData
+            WHERE id > :last AND (lab_id LIKE :kw OR key LIKE :kw
+               OR (CASE WHEN typeof(value) = 'text' THEN value ELSE seq_decode({stored_value}) END) LIKE :kw)
+            ORDER BY id
+            LIMIT :limit
+        """), {"kw": kw, "last": last or 0, "limit": limit}).fetchall()
+    results = []
+    for row_id, lab_id, key, value in rows:
+        sequence = decode_sequence(value)
+        if not full:
+            sequence = highlight_matches(sequence, keyword) or (
+                sequence[:40] + "..." if len(sequence) > 40 else sequence)
+        results.append((row_id, ("GenomicData", lab_id, key, sequence)))
+    return results
+
+
+def search_page(keyword, cursor=None, page_size=None, *, full=False, use_cache=True):
+    """
+    Return one page of search results and the cursor of the next page.
+
+    Returns (DataFrame of source, lab_id, key, value; next cursor), where the
+    cursor is None on the last page. Pass the cursor back (with the same
+    keyword) to get the following page. Values are previews (highlighted
+    snippets, the first PREVIEW_BASES of a lab's sequences) unless full=True,
+    which returns whole values for export. Raises ValueError for a cursor
+    that does not belong to this search.
+
+    Pages are cached like search_db results, until the next import or
+    delete; pass use_cache=False to always query the database.
+    """
+    keyword = keyword.strip()
+    page_size = page_size or configured_page_size()
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1.")
+    if not use_cache:
+        return _search_page(keyword, cursor, page_size, full)
+
+    cache = get_search_cache()
+    try:
+        with engine.connect() as connection:
+            generation = get_generation(connection)
+    except Exception:
+        # No DbState table yet (un-migrated database): skip the cache
+        return _search_page(keyword, cursor, page_size, full)
+    key = (str(engine.url), "search_page", keyword, cursor, page_size, full)
+    cached = cache.get(key, generation)
+    if cached is None:
+        cached = _search_page(keyword, cursor, page_size, full)
+        cache.put(key, generation, cached)
+    results, next_cursor = cached
+    return results.copy(), next_cursor
+
+
+def _search_page(keyword, cursor, page_size, full):
+    is_lab_id = keyword.upper().startswith("UL") and keyword[2:].isdigit()
+
+    with engine.connect() as connection:
+        if is_lab_id:
+            stages = ["lab_metadata", "lab_fasta"]
+        else:
+            stages = [_metadata_stage(connection, keyword), "genomic"]
+        stage, last = decode_cursor(cursor, keyword) if cursor else (stages[0], None)
+        if stage not in stages:
+            # e.g. the FTS index was added or dropped between pages
+            stage = "fts" if stage == "metadata_like" else "metadata_like" if stage == "fts" else None
+            if stage not in stages:
+                raise ValueError("Invalid search cursor.")
+
+        # One row more than the page shows whether another page follows
+        rows = []
+        with span("fetch"):
+            for stage in stages[stages.index(stage):]:
+                wanted = page_size + 1 - len(rows)
+                fetched = _fetch_stage(connection, stage, keyword, last, wanted, full)
+                rows += [(stage, key, row) for key, row in fetched]
+                if len(fetched) == wanted:
+                    break
+                last = None
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        stage, key, _ = rows[-1]
+        next_cursor = encode_cursor(keyword, stage, key)
+    results = pd.DataFrame([row for _, _, row in rows], columns=["source", "lab_id", "key", "value"])
+    return results, next_cursor
+
+
+def iter_search_pages(keyword, page_size=None, *, full=False):
+    """
+    Yield every page of a search as a DataFrame, fetching one page at a time.
+    Pages are read from the database, not the search cache.
+    """
+    cursor = None
+    while True:
+        page, cursor = search_page(keyword, cursor, page_size, full=full, use_cache=False)
+        if not page.empty:
+            yield page
+        if cursor is None:
+            return
+
+
+def export_search(keyword, file_path, file_type="csv", page_size=1000, append=False):
+    """
+    Stream all results of a search, with whole values, into a CSV/TSV file
+    one page at a time. Returns the number of rows written.
     """
+    from modules.export_utils import stream_pages_to_delimited
+
+    rows = stream_pages_to_delimited(iter_search_pages(keyword, page_size, full=True), file_path, file_type, append)
+    print(f"Exported {rows} rows to {file_path}")
+    return rows
+
+
+def search_cache_stats():
+    """Return hit/miss/eviction statistics for the search_db cache."""
+    return get_search_cache().stats()
+
+
+def _search_db(keyword):
     try:
         is_lab_id = keyword.upper().startswith("UL") and keyword[2:].isdigit()
 
         if is_lab_id:
-            # Fetch all metadata for this lab_id
-            query_metadata = """
-                SELECT key, value
-                FROM Metadata
-                WHERE lab_id = :lab_id
-            """
-            metadata = pd.read_sql(query_metadata, con=engine, params={"lab_id": keyword})
-            metadata['type'] = 'metadata'
-
-            # Fetch first 10 FASTA sequences for this lab_id
-            query_genomic = """
-                SELECT key, value
-                FROM GenomicData
-                WHERE lab_id = :lab_id
-                LIMIT 10
-            """
-            fasta = pd.read_sql(query_genomic, con=engine, params={"lab_id": keyword})
-            fasta['type'] = 'fasta'
-
-            print(f"\nMetadata for {keyword}:")
-            if not metadata.empty:
-                print(metadata[['key', 'value']].to_string(index=False))
-            else:
-                print("No metadata found.")
-
-            print(f"\nFASTA sequences for {keyword} (first 2 lines of each):")
-            if not fasta.empty:
-                for idx, row in fasta.iterrows():
-                    seq = row['value']
-                    lines = [seq[i:i+60] for i in range(0, len(seq), 60)]
-                    display_lines = lines[:2]
-                    print(f">{row['key']}")
-                    for l in display_lines:
-                        print(l)
-                    if len(lines) > 2:
-                        print("...")
-            else:
-                print("No FASTA sequences found.")
+            with span("fetch"):
+                # Fetch all metadata for this lab_id
+                metadata = pd.read_sql(LAB_ID_METADATA_QUERY, con=engine, params={"lab_id": keyword})
+                metadata['type'] = 'metadata'
+
+                # Fetch first 10 FASTA sequences for this lab_id. The results
+                # keep whole sequences for export; only the preview is printed.
+                fasta = pd.read_sql(LAB_ID_GENOMIC_QUERY, con=engine, params={"lab_id": keyword})
+                fasta['value'] = fasta['value'].map(decode_sequence)
+                fasta['type'] = 'fasta'
+
+            with span("render"):
+                print(f"\nMetadata for {keyword}:")
+                if not metadata.empty:
+                    print(metadata[['key', 'value']].to_string(index=False))
+                else:
+                    print("No metadata found.")
+
+                print(f"\nFASTA sequences for {keyword} (first 2 lines of each):")
+                if not fasta.empty:
+                    for idx, row in fasta.iterrows():
+                        seq = (row['value'] or "")[:PREVIEW_BASES]
+                        lines = [seq[i:i+60] for i in range(0, len(seq), 60)]
+                        print(f">{row['key']}")
+                        for l in lines:
+                            print(l)
+                        if pd.notna(row['seq_length']) and row['seq_length'] > PREVIEW_BASES:
+                            print(f"... ({int(row['seq_length']):,} bases)")
+                else:
+                    print("No FASTA sequences found.")
 
             # ---- RETURN FOR EXPORT ----
             results = pd.concat([metadata, fasta], ignore_index=True, sort=False)
@@ -88,58 +375,172 @@ def search_db(keyword):
             # Otherwise, search all tables for the keyword
             results = []
 
-            # Search Metadata
-            query_metadata = """
-                SELECT 'Metadata' as source, lab_id, key, value
-                FROM Metadata
-                WHERE lab_id LIKE :kw OR key LIKE :kw OR value LIKE :kw
-            """
-            results.append(pd.read_sql(query_metadata, con=engine, params={"kw": f"%{keyword}%"}))
-
-            # Search GenomicData
-            cols = ', '.join(schema["genomic_columns"])
-            query_genomic = f"""
-                SELECT {cols}
-                FROM GenomicData
-                WHERE lab_id LIKE :kw OR key LIKE :kw OR value LIKE :kw
-                ORDER BY seq_order
-                LIMIT 5
-            """
-            results.append(pd.read_sql(query_genomic, con=engine, params={"kw": f"%{keyword}%"}))
+            with span("fetch"):
+                # Search Metadata through the FTS5 index (ranked by bm25, highlighted
+                # by the engine). Fall back to a LIKE scan when the index is missing
+                # or finds nothing, so infix matches such as "ierella" still work.
+                metadata = None
+                with engine.connect() as connection:
+                    if has_metadata_fts(connection):
+                        rows = search_metadata_fts(connection, keyword)
+                        if rows:
+                            metadata = pd.DataFrame(rows, columns=['lab_id', 'key', 'value', 'snippet', 'rank'])
+                            metadata.insert(0, 'source', 'Metadata')
+                if metadata is None:
+                    query_metadata = """
+                        SELECT 'Metadata' as source, lab_id, key, value
+                        FROM Metadata
+                        WHERE lab_id LIKE :kw OR key LIKE :kw OR value LIKE :kw
+                    """
+                    metadata = pd.read_sql(query_metadata, con=engine, params={"kw": f"%{keyword}%"})
+                results.append(metadata)
+
+                # Search GenomicData. Motifs the k-mer index can answer only touch
+                # candidate rows; anything else falls back to a LIKE scan, with
+                # packed sequences decoded in SQL before matching.
+                stored_value = stored_value_sql()
+                cols = ', '.join(f"{stored_value} AS value" if col == "value" else col
+                                 for col in schema["genomic_columns"])
+                with engine.connect() as connection:
+                    motif_ids = find_motif_ids(connection, keyword)
+                if motif_ids is not None:
+                    # The (lab_id, key) unique index covers the name match, so no
+                    # sequence pages are read outside the candidate rows
+                    match = """id IN (SELECT id FROM GenomicData WHERE lab_id LIKE :kw OR key LIKE :kw)
+                       OR id IN (SELECT value FROM json_each(:ids))"""
+                else:
+                    match = f"""lab_id LIKE :kw OR key LIKE :kw
+                       OR (CASE WHEN typeof(value) = 'text' THEN value ELSE seq_decode({stored_value}) END) LIKE :kw"""
+                query_genomic = f"""
+                    SELECT {cols}
+                    FROM GenomicData
+                    WHERE {match}
+                    ORDER BY seq_order
+                    LIMIT 5
+                """
+                genomic = pd.read_sql(query_genomic, con=engine,
+                                      params={"kw": f"%{keyword}%", "ids": json.dumps(motif_ids or [])})
+                genomic['value'] = genomic['value'].map(decode_sequence)
+                results.append(genomic)
 
             # Combine and display results
             all_results = pd.concat(results, ignore_index=True)
             all_results = all_results.dropna(how='all', subset=[col for col in all_results.columns if col != 'source']) # Drops rows where all colmns except 'source' are empty
             
-            # Remove 'source' and 'seq_order' columns for display
-            display_cols = [col for col in all_results.columns if col not in ('source', 'seq_order')]
+            # Remove bookkeeping columns for display
+            display_cols = [col for col in all_results.columns
+                            if col not in ('source', 'seq_order', 'snippet', 'rank')]
             display_df = all_results[display_cols]
 
             display_df = display_df.dropna(how='all')
 
-            if 'value' in display_df.columns:
-                def smart_truncate(row):
-                    val = str(row['value'])
-                    if pd.isna(val):
-                        return val
-                    # Only highlight if the search term is in the value (for genomic data)
-                    if keyword.lower() in val.lower():
-                        return highlight_matches(val, keyword, context=40, max_snippets=2)
-                    else:
-                        # fallback: show first 40 chars as before
-                        return val[:40] + '...' if len(val) > 40 else val
-
-                display_df.loc[:, 'value'] = display_df.apply(smart_truncate, axis=1)
-                display_df = display_df.dropna(subset=['key', 'value'], how='all')
-
-            if not display_df.empty:
-                print(f"Results for keyword '{keyword}':")
-                print(display_df.head(10).to_string(index=False))
-            else:
-                print(f"No results found for: {keyword}")
+            with span("highlight"):
+                if 'value' in display_df.columns:
+                    snippets = all_results['snippet'] if 'snippet' in all_results.columns else None
+
+                    def smart_truncate(row):
+                        # FTS rows already carry an engine-built snippet
+                        if snippets is not None and isinstance(snippets.get(row.name), str):
+                            return snippets[row.name]
+                        val = str(row['value'])
+                        if pd.isna(val):
+                            return val
+                        # Only highlight if the search term is in the value (for genomic data)
+                        if keyword.lower() in val.lower():
+                            return highlight_matches(val, keyword, context=40, max_snippets=2)
+                        else:
+                            # fallback: show first 40 chars as before
+                            return val[:40] + '...' if len(val) > 40 else val
+
+                    display_df.loc[:, 'value'] = display_df.apply(smart_truncate, axis=1)
+                    display_df = display_df.dropna(subset=['key', 'value'], how='all')
+
+            with span("render"):
+                if not display_df.empty:
+                    print(f"Results for keyword '{keyword}':")
+                    print(display_df.head(10).to_string(index=False))
+                else:
+                    print(f"No results found for: {keyword}")
             return display_df
 
     except Exception as e:
         print(f"Error querying data: {e}")
 
-    
\ No newline at end of file
+
+def search_bbox(min_lat, max_lat, min_lon, max_lon):
+    """
+    Return samples whose coordinates fall inside a latitude/longitude box as a
+    DataFrame of lab_id, latitude and longitude. A box with min_lon > max_lon
+    wraps across the antimeridian.
+    """
+    if min_lon > max_lon:
+        boxes = [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    else:
+        boxes = [(min_lat, max_lat, min_lon, max_lon)]
+    rows = {}
+    with engine.connect() as connection:
+        for box in boxes:
+            for lab_id, lat, lon in bbox_candidates(connection, *box):
+                # The R*Tree is only approximate (32-bit floats), so re-check
+                if box[0] <= lat <= box[1] and box[2] <= lon <= box[3]:
+                    rows[lab_id] = (lab_id, lat, lon)
+    results = pd.DataFrame(list(rows.values()), columns=['lab_id', 'latitude', 'longitude'])
+    return results.sort_values('lab_id', ignore_index=True)
+
+
+def search_radius(lat, lon, radius_km):
+    """
+    Return samples within radius_km of (lat, lon), nearest first, as a
+    DataFrame of lab_id, latitude, longitude and distance_km. The R*Tree
+    narrows the search to a bounding box; haversine distance does the rest.
+    """
+    rows = {}
+    with engine.connect() as connection:
+        for box in radius_boxes(lat, lon, radius_km):
+            for lab_id, sample_lat, sample_lon in bbox_candidates(connection, *box):
+                distance = haversine_km(lat, lon, sample_lat, sample_lon)
+                if distance <= radius_km:
+                    rows[lab_id] = (lab_id, sample_lat, sample_lon, distance)
+    results = pd.DataFrame(list(rows.values()), columns=['lab_id', 'latitude', 'longitude', 'distance_km'])
+    return results.sort_values('distance_km', ignore_index=True)
+
+
+def search_snapshot(keyword, snapshot_dir=None):
+    """
+    Answer the same lab-ID and keyword searches as search_db from a Parquet
+    snapshot (see modules/snapshot.py) instead of the live database. Filters
+    are pushed down to Arrow, so lab-ID lookups only read the matching
+    partition and row groups. Returns a DataFrame with key, value, type and
+    (for keyword searches) lab_id columns. Needs pyarrow.
+    """
+    from modules.snapshot import open_snapshot, lab_prefix, PARTITION_COLUMN
+    import pyarrow.compute as pc
+
+    metadata_ds, genomic_ds, partition_by = open_snapshot(snapshot_dir)
+    is_lab_id = keyword.upper().startswith("UL") and keyword[2:].isdigit()
+
+    if is_lab_id:
+        condition = pc.field("lab_id") == keyword
+        if partition_by == "prefix":
+            condition = condition & (pc.field(PARTITION_COLUMN) == lab_prefix(keyword))
+        metadata = metadata_ds.to_table(columns=["key", "value"], filter=condition).to_pandas()
+        fasta = genomic_ds.to_table(columns=["key", "sequence", "seq_order"], filter=condition).to_pandas()
+        fasta = fasta.sort_values("seq_order").head(10).rename(columns={"sequence": "value"})
+        metadata["type"] = "metadata"
+        fasta["type"] = "fasta"
+        return pd.concat([metadata, fasta[["key", "value", "type"]]], ignore_index=True, sort=False)
+
+    def contains(column):
+        return pc.match_substring(pc.field(column), keyword, ignore_case=True)
+
+    metadata = metadata_ds.to_table(
+        columns=["lab_id", "key", "value"],
+        filter=contains("lab_id") | contains("key") | contains("value"),
+    ).to_pandas()
+    fasta = genomic_ds.scanner(
+        columns=["lab_id", "key", "sequence"],
+        filter=contains("lab_id") | contains("key") | contains("sequence"),
+    ).head(5).to_pandas().rename(columns={"sequence": "value"})
+    metadata["type"] = "metadata"
+    fasta["type"] = "fasta"
+    return pd.concat([metadata, fasta], ignore_index=True, sort=False)
@@ -0,0 +1,132 @@
+import atexit
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from modules.utils import load_config
+
+# In-process LRU cache for search results. Entries are tagged with the
+# database generation (see utils.bump_generation) they were computed at, and
+# the whole cache is dropped as soon as a newer generation is seen, so a
+# search never returns data from before an import or delete.
+
+DEFAULT_CACHE_SIZE = 256
+CACHE_FORMAT = 1
+
+
+class SearchCache:
+    """
+    A size-bounded LRU mapping of query keys to results, invalidated by the
+    database generation. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _sync(self, generation):
+        # Caller holds the lock
+        if generation != self.generation:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, key, generation):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            self._sync(generation)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, generation, value):
+        """Cache a value computed at the given generation."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._sync(generation)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "generation": self.generation,
+            }
+
+    def save(self, path):
+        """Write the cached entries to disk so the next session starts warm."""
+        with self._lock:
+            state = {"format": CACHE_FORMAT, "generation": self.generation, "entries": list(self._entries.items())}
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as handle:
+            pickle.dump(state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """
+        Load entries saved by save(). Entries are only used if the database is
+        still at the saved generation; a missing or unreadable file is ignored.
+        """
+        try:
+            with open(path, "rb") as handle:
+                state = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return 0
+        if not isinstance(state, dict) or state.get("format") != CACHE_FORMAT:
+            return 0
+        with self._lock:
+            self.generation = state["generation"]
+            self._entries = OrderedDict(state["entries"][-self.max_entries:] if self.max_entries > 0 else [])
+            return len(self._entries)
+
+
+_cache = None
+
+
+def cache_settings():
+    """Return (max_entries, persist_path) from config.yaml; the path may be None."""
+    settings = load_config().get("search", {})
+    return int(settings.get("cache_size", DEFAULT_CACHE_SIZE)), settings.get("cache_path") or None
+
+
+def get_search_cache():
+    """
+    Return the process-wide search cache, creating it on first use. If
+    search.cache_path is set, the cache is loaded from there and saved back
+    when the program exits.
+    """
+    global _cache
+    if _cache is None:
+        max_entries, path = cache_settings()
+        _cache = SearchCache(max_entries)
+        if path:
+            _cache.load(path)
+            atexit.register(_cache.save, path)
+    return _cache
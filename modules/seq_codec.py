@@ -0,0 +1,250 @@
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_config
+
+# Packed values are BLOBs starting with MAGIC plus a one-byte format tag.
+# Plain sequences stay TEXT, so existing rows keep working untouched.
+MAGIC = b"\x00SQ"
+TWOBIT = b"2"
+ZLIB = b"z"
+# Reference to a sequence in the flat-file store (see fasta_store)
+FLATFILE = b"F"
+ENCODINGS = ("plain", "2bit", "zlib")
+
+# Fall back to zlib when more than this fraction of bases are not A/C/G/T
+TWOBIT_MAX_EXCEPTION_RATIO = 0.05
+
+_CODES = np.full(256, 255, dtype=np.uint8)
+for _i, _base in enumerate(b"ACGT"):
+    _CODES[_base] = _i
+_BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+_HEADER = struct.Struct("<QI")
+_RUN = struct.Struct("<QI")
+
+
+def _exception_runs(mask):
+    """Return (start, length) pairs for the True runs in a boolean mask."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), (ends - starts).tolist()))
+
+
+def _pack_2bit(raw):
+    """
+    Pack an ASCII sequence at 2 bits per base.
+
+    Anything other than upper-case A/C/G/T (N, IUPAC codes, soft-masked
+    lower case) is recorded verbatim in a run-length exception list and
+    stored as A in the packed body. Returns None if there are too many
+    exceptions for 2-bit packing to pay off.
+    """
+    arr = np.frombuffer(raw, dtype=np.uint8)
+    codes = _CODES[arr]
+    mask = codes == 255
+    if mask.sum() > TWOBIT_MAX_EXCEPTION_RATIO * len(arr):
+        return None
+
+    runs = _exception_runs(mask)
+    codes = np.where(mask, 0, codes).astype(np.uint8)
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    quads = padded.reshape(-1, 4)
+    body = (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+
+    parts = [MAGIC, TWOBIT, _HEADER.pack(len(arr), len(runs))]
+    parts.extend(_RUN.pack(start, length) for start, length in runs)
+    parts.extend(raw[start:start + length] for start, length in runs)
+    parts.append(body.astype(np.uint8).tobytes())
+    return b"".join(parts)
+
+
+def _unpack_2bit(blob, start=0, end=None):
+    """Unpack bases [start, end) of a 2-bit value, touching only their bytes."""
+    length, n_runs = _HEADER.unpack_from(blob, len(MAGIC) + 1)
+    start, end, _ = slice(start, end).indices(length)
+    if start >= end:
+        return ""
+    offset = len(MAGIC) + 1 + _HEADER.size
+    runs = [_RUN.unpack_from(blob, offset + i * _RUN.size) for i in range(n_runs)]
+    offset += n_runs * _RUN.size
+    exceptions = []
+    for run_start, run_length in runs:
+        exceptions.append((run_start, blob[offset:offset + run_length]))
+        offset += run_length
+
+    first_byte = start // 4
+    packed = np.frombuffer(blob, dtype=np.uint8, count=(end + 3) // 4 - first_byte, offset=offset + first_byte)
+    codes = np.stack([(packed >> 6) & 3, (packed >> 4) & 3, (packed >> 2) & 3, packed & 3], axis=1)
+    seq = _BASES[codes.ravel()[start - first_byte * 4:end - first_byte * 4]]
+    for run_start, run in exceptions:
+        low, high = max(run_start, start), min(run_start + len(run), end)
+        if low < high:
+            seq[low - start:high - start] = np.frombuffer(run[low - run_start:high - run_start], dtype=np.uint8)
+    return seq.tobytes().decode("ascii")
+
+
+def is_packed(value):
+    """Return True if a stored GenomicData value is a packed BLOB."""
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:len(MAGIC)]) == MAGIC
+
+
+def is_file_reference(value):
+    """Return True if a stored value points into the flat-file store."""
+    return is_packed(value) and bytes(value[len(MAGIC):len(MAGIC) + 1]) == FLATFILE
+
+
+def encode_sequence(seq, encoding="plain"):
+    """
+    Encode a sequence for storage in GenomicData.value.
+
+    "plain" returns the string unchanged, "2bit" packs pure ACGT data (and
+    falls back to zlib for exception-heavy sequences), "zlib" always
+    compresses. Non-ASCII input is left as plain text.
+    """
+    if encoding == "plain" or not seq:
+        return seq
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown sequence encoding '{encoding}'. Choose one of {ENCODINGS}.")
+    try:
+        raw = seq.encode("ascii")
+    except UnicodeEncodeError:
+        return seq
+    if encoding == "2bit":
+        packed = _pack_2bit(raw)
+        if packed is not None:
+            return packed
+    return MAGIC + ZLIB + zlib.compress(raw, 6)
+
+
+def decode_sequence(value):
+    """
+    Decode a stored GenomicData value back into a sequence string.
+    Plain TEXT values (and None) are returned as they are.
+    """
+    if not is_packed(value):
+        return value
+    value = bytes(value)
+    tag = value[len(MAGIC):len(MAGIC) + 1]
+    if tag == TWOBIT:
+        return _unpack_2bit(value)
+    if tag == ZLIB:
+        return zlib.decompress(value[len(MAGIC) + 1:]).decode("ascii")
+    if tag == FLATFILE:
+        from modules.fasta_store import read_reference
+        return read_reference(value)
+    raise ValueError(f"Unknown packed sequence format {tag!r}.")
+
+
+def sequence_slice(value, start=0, end=None):
+    """
+    Return bases [start, end) of a stored value. Sequences in the flat-file
+    store are read without loading the rest of the sequence, and 2-bit
+    values are only unpacked over the requested range.
+    """
+    if is_file_reference(value):
+        from modules.fasta_store import read_reference
+        return read_reference(value, start, end)
+    if is_packed(value) and bytes(value[len(MAGIC):len(MAGIC) + 1]) == TWOBIT:
+        return _unpack_2bit(bytes(value), start, end)
+    seq = decode_sequence(value)
+    return seq[start:end] if seq is not None else None
+
+
+def configured_encoding():
+    """Return the sequence encoding selected in config.yaml (default: plain)."""
+    return load_config().get("storage", {}).get("sequence_encoding", "plain")
+
+
+def register_sqlite_functions(dbapi_connection, connection_record=None):
+    """
+    Register seq_decode() on a SQLite connection so SQL such as LIKE can
+    see through packed values. Usable as a SQLAlchemy "connect" listener.
+    """
+    dbapi_connection.create_function("seq_decode", 1, decode_sequence, deterministic=True)
+
+
+def convert_sequence_storage(encoding, batch_size=1000, vacuum=True):
+    """
+    Re-encode every stored sequence (GenomicData.value and SequenceBlob.value)
+    in place with the given encoding and report the space saved. Works in
+    rowid-ordered batches, committing each one, so memory stays bounded and
+    the conversion can simply be rerun if stopped.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown sequence encoding '{encoding}'. Choose one of {ENCODINGS}.")
+
+    engine = get_engine()
+    db_path = engine.url.database
+    file_before = os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None
+    start = time.perf_counter()
+
+    rows_seen, rows_changed = 0, 0
+    bytes_before, bytes_after = 0, 0
+    # Deduplicated sequences keep their value in SequenceBlob (see sequence_store)
+    for table in ("GenomicData", "SequenceBlob"):
+        with engine.connect() as connection:
+            if not connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                      {"name": table}).fetchone():
+                continue
+        select_query = text(f"""
+            SELECT rowid, value FROM {table}
+            WHERE rowid > :last_id AND value IS NOT NULL
+            ORDER BY rowid
+            LIMIT :batch_size
+        """)
+        update_query = text(f"UPDATE {table} SET value = :value WHERE rowid = :id")
+        last_id = 0
+        while True:
+            with engine.begin() as connection:
+                rows = connection.execute(select_query, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+                if not rows:
+                    break
+                updates = []
+                for row_id, value in rows:
+                    if is_file_reference(value):
+                        continue
+                    new_value = encode_sequence(decode_sequence(value), encoding)
+                    bytes_before += len(value)
+                    bytes_after += len(new_value)
+                    if new_value != value:
+                        updates.append({"id": row_id, "value": new_value})
+                if updates:
+                    connection.execute(update_query, updates)
+                rows_seen += len(rows)
+                rows_changed += len(updates)
+                last_id = rows[-1][0]
+
+    if vacuum:
+        with engine.connect() as connection:
+            connection.execute(text("VACUUM"))
+    file_after = os.path.getsize(db_path) if file_before is not None else None
+
+    elapsed = time.perf_counter() - start
+    saved = bytes_before - bytes_after
+    print(f"Converted {rows_changed} of {rows_seen} sequences to '{encoding}' in {elapsed:.2f}s.")
+    print(f"Sequence payload: {bytes_before:,} -> {bytes_after:,} bytes ({saved:,} saved).")
+    if file_before is not None:
+        print(f"Database file: {file_before:,} -> {file_after:,} bytes.")
+    return {
+        "encoding": encoding,
+        "rows": rows_seen,
+        "converted": rows_changed,
+        "payload_bytes_before": bytes_before,
+        "payload_bytes_after": bytes_after,
+        "file_bytes_before": file_before,
+        "file_bytes_after": file_after,
+        "seconds": elapsed,
+    }
+
+
+if __name__ == "__main__":
+    convert_sequence_storage(sys.argv[1] if len(sys.argv) > 1 else configured_encoding())
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import sys
+import time
+from collections import Counter
+
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_config, bump_generation
+from modules.seq_codec import encode_sequence, decode_sequence, configured_encoding, is_file_reference
+
+# Content-addressed sequence storage.
+#
+# With storage.deduplicate on, a GenomicData row keeps only seq_hash (a
+# 128-bit BLAKE2b digest of the sequence text) and leaves value NULL. Each
+# distinct sequence body is stored once in SequenceBlob, encoded like any
+# GenomicData.value, with refcount = the number of GenomicData rows pointing
+# at it. Deletes release their references and drop bodies nobody uses, so
+# storage grows with unique sequence content rather than with imports.
+#
+# Rows written before deduplication (or with it off) keep their inline value;
+# readers select stored_value_sql(), which falls back from one to the other.
+
+
+def configured_dedup():
+    """Return True if new sequences should go to SequenceBlob (config.yaml)."""
+    return bool(load_config().get("storage", {}).get("deduplicate", False))
+
+
+def sequence_hash(sequence):
+    """Return the content address of a sequence."""
+    return hashlib.blake2b(sequence.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def stored_value_sql(table="GenomicData"):
+    """
+    SQL expression for a GenomicData row's stored value, inline or from
+    SequenceBlob. Decode it with decode_sequence() / seq_decode() as usual.
+    """
+    return (f"COALESCE({table}.value, "
+            f"(SELECT SequenceBlob.value FROM SequenceBlob WHERE SequenceBlob.hash = {table}.seq_hash))")
+
+
+def ensure_blob_table(connection):
+    """Create SequenceBlob and the GenomicData.seq_hash column pointing at it."""
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS SequenceBlob (
+            hash TEXT PRIMARY KEY,
+            value,
+            length INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0
+        )
+    """))
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(GenomicData)"))]
+    if "seq_hash" not in columns:
+        connection.execute(text("ALTER TABLE GenomicData ADD COLUMN seq_hash TEXT"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS idx_genomic_seq_hash ON GenomicData (seq_hash)"))
+
+
+def blob_rows(sequences, encoding):
+    """
+    Turn sequences into (seq_hash, encoded value, length) for store_blobs().
+    Needs no database, so batch imports run it in workers.
+    """
+    return [(sequence_hash(sequence), encode_sequence(sequence, encoding), len(sequence)) for sequence in sequences]
+
+
+def store_blobs(connection, blobs):
+    """
+    Add one reference per (seq_hash, value, length) entry, storing bodies
+    not seen before. Call in the transaction that inserts the GenomicData
+    rows, so references and rows commit (or roll back) together.
+    """
+    if not blobs:
+        return 0
+    if not hasattr(connection, "exec_driver_sql"):
+        connection = connection.connection()
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO SequenceBlob (hash, value, length, refcount) VALUES (?, ?, ?, 0)",
+        list({seq_hash: (seq_hash, value, length) for seq_hash, value, length in blobs}.values()),
+    )
+    connection.exec_driver_sql(
+        "UPDATE SequenceBlob SET refcount = refcount + ? WHERE hash = ?",
+        [(count, seq_hash) for seq_hash, count in Counter(seq_hash for seq_hash, _, _ in blobs).items()],
+    )
+    return len(blobs)
+
+
+def release_sequences(connection, seq_ids_query, params):
+    """
+    Drop the SequenceBlob references held by the GenomicData rows selected
+    by seq_ids_query and delete bodies no longer referenced. Call before
+    deleting the rows, in the same transaction.
+    """
+    counts = connection.execute(text(f"""
+        SELECT seq_hash, COUNT(*) FROM GenomicData
+        WHERE id IN ({seq_ids_query}) AND seq_hash IS NOT NULL
+        GROUP BY seq_hash
+    """), params).fetchall()
+    if not counts:
+        return 0
+    connection.execute(text("UPDATE SequenceBlob SET refcount = refcount - :count WHERE hash = :hash"),
+                       [{"hash": seq_hash, "count": count} for seq_hash, count in counts])
+    return connection.execute(text("""
+        DELETE FROM SequenceBlob
+        WHERE refcount <= 0 AND hash IN (SELECT value FROM json_each(:hashes))
+    """), {"hashes": json.dumps([seq_hash for seq_hash, _ in counts])}).rowcount
+
+
+def recount_blobs(connection):
+    """
+    Recompute every refcount from GenomicData and delete unreferenced
+    bodies. Returns the number of bodies removed.
+    """
+    connection.execute(text("""
+        UPDATE SequenceBlob SET refcount = (
+            SELECT COUNT(*) FROM GenomicData WHERE GenomicData.seq_hash = SequenceBlob.hash
+        )
+    """))
+    return connection.execute(text("DELETE FROM SequenceBlob WHERE refcount <= 0")).rowcount
+
+
+def blob_stats(connection):
+    """Return unique bodies, their bases and payload bytes, and references."""
+    row = connection.execute(text("""
+        SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(length(value)), 0), COALESCE(SUM(refcount), 0)
+        FROM SequenceBlob
+    """)).fetchone()
+    return {"unique_sequences": row[0], "bases": row[1], "payload_bytes": row[2], "references": row[3]}
+
+
+def deduplicate_existing(batch_size=1000):
+    """
+    Move inline GenomicData values into SequenceBlob, then fix up refcounts.
+    Works in id-ordered batches, committing each one, so it can be rerun if
+    stopped. Run VACUUM afterwards to return the freed pages to the OS.
+    """
+    engine = get_engine()
+    encoding = configured_encoding()
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        ensure_blob_table(connection)
+
+    select_query = text("""
+        SELECT id, value FROM GenomicData
+        WHERE id > :last_id AND value IS NOT NULL
+        ORDER BY id
+        LIMIT :batch_size
+    """)
+    update_query = text("UPDATE GenomicData SET value = NULL, seq_hash = :seq_hash WHERE id = :id")
+    last_id, moved = 0, 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select_query, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+            if not rows:
+                break
+            sequences = [(row_id, decode_sequence(value)) for row_id, value in rows]
+            blobs = blob_rows([sequence for _, sequence in sequences], encoding)
+            # Sequences in the flat-file store keep their file reference
+            blobs = [(seq_hash, value if is_file_reference(value) else encoded, length)
+                     for (seq_hash, encoded, length), (_, value) in zip(blobs, rows)]
+            store_blobs(connection, blobs)
+            connection.execute(update_query, [
+                {"id": row_id, "seq_hash": seq_hash} for (row_id, _), (seq_hash, _, _) in zip(sequences, blobs)
+            ])
+            bump_generation(connection)
+            moved += len(rows)
+            last_id = rows[-1][0]
+
+    with engine.begin() as connection:
+        removed = recount_blobs(connection)
+        stats = blob_stats(connection)
+    elapsed = time.perf_counter() - start
+    print(f"Moved {moved} inline sequences to SequenceBlob in {elapsed:.2f}s "
+          f"({removed} unreferenced bodies removed).")
+    print(f"{stats['references']:,} sequences share {stats['unique_sequences']:,} unique bodies "
+          f"({stats['bases']:,} bases, {stats['payload_bytes']:,} bytes stored).")
+    return {"moved": moved, "removed": removed, "seconds": elapsed, **stats}
+
+
+if __name__ == "__main__":
+    deduplicate_existing(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,300 @@
+import json
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_config, ensure_state_table, get_state, set_state
+from modules.seq_codec import decode_sequence
+from modules.kmer_index import kmer_array, MAX_K
+from modules.sequence_store import stored_value_sql
+
+# MinHash similarity search.
+#
+# Each sequence gets a sketch: for each of `num_hashes` hash functions, the
+# smallest hash over its canonical k-mers (the lesser of a k-mer and its
+# reverse complement, so strand does not matter), kept as uint32. The share
+# of equal slots between two sketches estimates their k-mer Jaccard index.
+#
+# Sketches are cut into bands of `band_rows` slots. Two sequences land in the
+# same SketchBand bucket when a whole band matches, so a query only compares
+# against sequences that share at least one bucket (banded LSH). With the
+# default 64 bands of 2 rows, pairs with Jaccard >= 0.3 (roughly 95% identity
+# at k=15) are found with >99% probability.
+
+DEFAULTS = {"k": 15, "num_hashes": 128, "band_rows": 2}
+MAX_CANDIDATES = 5000
+# Rows of the k-mer x hash matrix computed at once, to bound memory
+HASH_CHUNK = 65536
+_COMPLEMENT = str.maketrans("ACGTacgt", "TGCAtgca")
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix64(x):
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    x = (x ^ (x >> np.uint64(30))) * _M1
+    x = (x ^ (x >> np.uint64(27))) * _M2
+    return x ^ (x >> np.uint64(31))
+
+
+def configured_sketch_params():
+    """Return (enabled, params) for similarity sketches from config.yaml."""
+    settings = load_config().get("similarity", {})
+    params = {name: int(settings.get(name, default)) for name, default in DEFAULTS.items()}
+    if not 1 <= params["k"] <= MAX_K:
+        raise ValueError(f"similarity.k must be between 1 and {MAX_K}.")
+    if params["num_hashes"] % params["band_rows"]:
+        raise ValueError("similarity.num_hashes must be a multiple of similarity.band_rows.")
+    return bool(settings.get("enabled", False)), params
+
+
+def ensure_sketch_tables(connection):
+    """
+    Create SequenceSketch (one uint32 array per sequence) and SketchBand
+    (LSH bucket -> sequence postings).
+    """
+    ensure_state_table(connection)
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS SequenceSketch (
+            seq_id INTEGER PRIMARY KEY,
+            kmers INTEGER NOT NULL,
+            sketch BLOB NOT NULL
+        )
+    """))
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS SketchBand (
+            band_hash INTEGER NOT NULL,
+            seq_id INTEGER NOT NULL,
+            PRIMARY KEY (band_hash, seq_id)
+        ) WITHOUT ROWID
+    """))
+
+
+def canonical_kmers(sequence, k):
+    """Return the distinct canonical k-mer values of a sequence."""
+    raw = sequence.encode("ascii", errors="replace")
+    forward, _ = kmer_array(raw, k)
+    if len(forward) == 0:
+        return forward
+    reverse, _ = kmer_array(sequence.translate(_COMPLEMENT)[::-1].encode("ascii", errors="replace"), k)
+    return np.unique(np.minimum(forward, reverse[::-1]))
+
+
+def sketch_sequence(sequence, params):
+    """
+    Return (number of distinct k-mers, sketch as a uint32 array), or None if
+    the sequence has no valid k-mer.
+    """
+    kmers = canonical_kmers(sequence.upper(), params["k"]).astype(np.uint64)
+    if len(kmers) == 0:
+        return None
+    seeds = _mix64(np.arange(1, params["num_hashes"] + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+    sketch = np.full(params["num_hashes"], np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i in range(0, len(kmers), HASH_CHUNK):
+        hashes = _mix64(kmers[i:i + HASH_CHUNK, None] ^ seeds[None, :])
+        sketch = np.minimum(sketch, hashes.min(axis=0))
+    return len(kmers), (sketch >> np.uint64(32)).astype("<u4")
+
+
+def band_hashes(sketch, params):
+    """Return one signed 64-bit bucket key per band of a sketch."""
+    rows = params["band_rows"]
+    bands = sketch.astype(np.uint64).reshape(-1, rows)
+    key = np.arange(len(bands), dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    for j in range(rows):
+        key = _mix64(key ^ bands[:, j])
+    return key.view(np.int64).tolist()
+
+
+def sketch_rows(rows, params):
+    """
+    Sketch (seq_id, sequence) pairs. Returns [(seq_id, kmers, sketch bytes,
+    band hashes)]. Needs no database, so batch imports run it in workers.
+    """
+    sketches = []
+    for seq_id, sequence in rows:
+        result = sketch_sequence(sequence, params) if sequence else None
+        if result is not None:
+            n_kmers, sketch = result
+            sketches.append((seq_id, n_kmers, sketch.tobytes(), band_hashes(sketch, params)))
+    return sketches
+
+
+def write_sketches(connection, sketches):
+    """Store sketches from sketch_rows() and their LSH bucket postings."""
+    if not sketches:
+        return 0
+    if not hasattr(connection, "exec_driver_sql"):
+        connection = connection.connection()
+    connection.exec_driver_sql(
+        "INSERT OR REPLACE INTO SequenceSketch (seq_id, kmers, sketch) VALUES (?, ?, ?)",
+        [(seq_id, n_kmers, sketch) for seq_id, n_kmers, sketch, _ in sketches],
+    )
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO SketchBand (band_hash, seq_id) VALUES (?, ?)",
+        [(band, seq_id) for seq_id, _, _, bands in sketches for band in bands],
+    )
+    return len(sketches)
+
+
+def prepare_sketches(connection):
+    """
+    Called before an import writes sequences. Returns the sketch parameters
+    if new sequences should be sketched, or None if sketching is disabled.
+
+    As with the k-mer index, disabling sketches or changing their parameters
+    marks the index incomplete until rebuild_sketches() is run.
+    """
+    ensure_sketch_tables(connection)
+    enabled, params = configured_sketch_params()
+    state = get_state(connection, "sketch_params")
+    if not enabled or (state is not None and json.loads(state) != params):
+        set_state(connection, "sketch_complete", "0")
+        return None
+    if state is None:
+        has_sequences = connection.execute(text("SELECT 1 FROM GenomicData LIMIT 1")).fetchone()
+        set_state(connection, "sketch_params", json.dumps(params))
+        set_state(connection, "sketch_complete", "0" if has_sequences else "1")
+    return params
+
+
+def delete_sketches(connection, seq_ids_query, params):
+    """
+    Remove the sketches of the GenomicData rows selected by seq_ids_query.
+    Their SketchBand postings are left behind (like KmerIndex postings) and
+    skipped at query time.
+    """
+    connection.execute(text(f"DELETE FROM SequenceSketch WHERE seq_id IN ({seq_ids_query})"), params)
+
+
+def rebuild_sketches(batch_size=1000):
+    """Sketch every stored sequence from scratch with the configured parameters."""
+    _, params = configured_sketch_params()
+    engine = get_engine()
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        ensure_sketch_tables(connection)
+        connection.execute(text("DELETE FROM SequenceSketch"))
+        connection.execute(text("DELETE FROM SketchBand"))
+        set_state(connection, "sketch_params", json.dumps(params))
+        set_state(connection, "sketch_complete", "0")
+
+    select_query = text(f"SELECT id, {stored_value_sql()} FROM GenomicData "
+                        "WHERE id > :last_id ORDER BY id LIMIT :batch_size")
+    last_id, n_sequences, n_sketched = 0, 0, 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select_query, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+            if not rows:
+                break
+            n_sketched += write_sketches(connection, sketch_rows(
+                [(row_id, decode_sequence(value)) for row_id, value in rows], params))
+            n_sequences += len(rows)
+            last_id = rows[-1][0]
+
+    with engine.begin() as connection:
+        set_state(connection, "sketch_complete", "1")
+    elapsed = time.perf_counter() - start
+    print(f"Sketched {n_sketched} of {n_sequences} sequences (k={params['k']}, "
+          f"{params['num_hashes']} hashes) in {elapsed:.2f}s.")
+    return {"sequences": n_sequences, "sketched": n_sketched, "seconds": elapsed, **params}
+
+
+def ani_estimate(jaccard, k):
+    """Mash-style identity estimate from a k-mer Jaccard index (0 when J is 0)."""
+    if jaccard <= 0:
+        return 0.0
+    return max(0.0, 1 + math.log(2 * jaccard / (1 + jaccard)) / k)
+
+
+def similar_sequences(connection, sequence, top_k=10, max_candidates=MAX_CANDIDATES):
+    """
+    Return up to top_k stored sequences most similar to `sequence` as dicts
+    with seq_id, lab_id, key, jaccard, ani and shared_hashes, best first.
+    Uses the parameters the stored sketches were built with.
+    """
+    state = get_state(connection, "sketch_params")
+    if state is None:
+        return []
+    params = json.loads(state)
+    result = sketch_sequence(sequence, params)
+    if result is None:
+        return []
+    _, query_sketch = result
+
+    # Sequences sharing the most LSH buckets first, in case there are many
+    candidates = connection.execute(text("""
+        SELECT s.seq_id, g.lab_id, g.key, s.sketch
+        FROM (
+            SELECT seq_id, COUNT(*) AS bands FROM SketchBand
+            WHERE band_hash IN (SELECT value FROM json_each(:bands))
+            GROUP BY seq_id
+            ORDER BY bands DESC
+            LIMIT :max_candidates
+        ) AS hits
+        JOIN SequenceSketch s ON s.seq_id = hits.seq_id
+        JOIN GenomicData g ON g.id = hits.seq_id
+    """), {"bands": json.dumps(band_hashes(query_sketch, params)), "max_candidates": max_candidates}).fetchall()
+    if not candidates:
+        return []
+
+    sketches = np.frombuffer(b"".join(row[3] for row in candidates), dtype="<u4").reshape(len(candidates), -1)
+    shared = (sketches == query_sketch[None, :]).sum(axis=1)
+    order = np.argsort(-shared, kind="stable")[:top_k]
+    hits = []
+    for i in order.tolist():
+        seq_id, lab_id, key, _ = candidates[i]
+        jaccard = float(shared[i]) / params["num_hashes"]
+        hits.append({"seq_id": seq_id, "lab_id": lab_id, "key": key, "jaccard": round(jaccard, 4),
+                     "ani": round(ani_estimate(jaccard, params["k"]), 4), "shared_hashes": int(shared[i])})
+    return hits
+
+
+def read_query(query):
+    """
+    Return [(name, sequence)] for a query given as a FASTA file path or as a
+    bare sequence.
+    """
+    from modules.data_import import iter_fasta
+
+    try:
+        with open(query, "rb") as handle:
+            records = [(record_id, sequence) for record_id, sequence, _ in iter_fasta(handle)]
+    except OSError:
+        records = [("query", "".join(query.split()))]
+    return records
+
+
+def find_similar(query, top_k=10, engine=None):
+    """
+    Find the stored sequences most similar to each record of a query FASTA
+    (or a single sequence). Returns a DataFrame of query, lab_id, key,
+    jaccard, ani and shared_hashes joined to the hit's MetadataWide row.
+    """
+    engine = engine or get_engine()
+    rows = []
+    with engine.connect() as connection:
+        if get_state(connection, "sketch_complete") == "0":
+            print("Warning: some sequences have no sketch yet; run python -m modules.similarity to rebuild.")
+        for name, sequence in read_query(query):
+            for hit in similar_sequences(connection, sequence, top_k):
+                rows.append({"query": name, **hit})
+        results = pd.DataFrame(rows, columns=["query", "seq_id", "lab_id", "key", "jaccard", "ani", "shared_hashes"])
+        has_metadata = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'MetadataWide'"
+        )).fetchone()
+        if results.empty or not has_metadata:
+            return results
+        metadata = pd.read_sql(text("""
+            SELECT * FROM MetadataWide WHERE lab_id IN (SELECT value FROM json_each(:lab_ids))
+        """), connection, params={"lab_ids": json.dumps(results["lab_id"].unique().tolist())})
+    return results.merge(metadata, on="lab_id", how="left")
+
+
+if __name__ == "__main__":
+    rebuild_sketches(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,234 @@
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from modules.utils import get_engine, load_config
+from modules.seq_codec import decode_sequence
+from modules.sequence_store import stored_value_sql
+from modules.metadata_wide import column_name
+
+# Parquet snapshots of Metadata and GenomicData for read-heavy analytics.
+#
+#   <snapshot>/metadata/partition=UL0/part-0.parquet
+#   <snapshot>/genomic/partition=UL0/part-0.parquet
+#   <snapshot>/snapshot.json
+#
+# Rows are written in lab_id order, so every row group's min/max statistics
+# cover a narrow lab_id range and lab-ID filters skip most of the file.
+# pyarrow is optional and only imported when a snapshot is written or read.
+
+SNAPSHOT_CHUNK_SIZE = 50000
+ROW_GROUP_SIZE = 65536
+PARTITION_COLUMN = "partition"
+PROJECT_FIELD = "Project Funding"
+UNKNOWN_PARTITION = "unknown"
+
+
+def require_pyarrow():
+    """Import pyarrow lazily, with a clear message when it is not installed."""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.compute
+    except ImportError as e:
+        raise ImportError("Parquet snapshots need pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def snapshot_settings():
+    """Return (path, partition_by) from config.yaml."""
+    settings = load_config().get("snapshot", {})
+    return settings.get("path", "./database/snapshot"), settings.get("partition_by", "prefix")
+
+
+def lab_prefix(lab_id):
+    """Partition name for a lab ID: everything but the last two characters (blocks of 100)."""
+    lab_id = str(lab_id)
+    return lab_id[:-2] if len(lab_id) > 2 else lab_id
+
+
+def partition_name(value):
+    """Make a project name safe to use as a directory name."""
+    if value is None or str(value).strip() == "":
+        return UNKNOWN_PARTITION
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in str(value).strip())
+
+
+def _schemas(pa):
+    metadata = pa.schema([
+        ("lab_id", pa.string()),
+        ("key", pa.string()),
+        ("value", pa.string()),
+        (PARTITION_COLUMN, pa.string()),
+    ])
+    genomic = pa.schema([
+        ("lab_id", pa.string()),
+        ("key", pa.string()),
+        ("seq_order", pa.int64()),
+        ("sequence", pa.large_string()),
+        (PARTITION_COLUMN, pa.string()),
+    ])
+    return metadata, genomic
+
+
+def _lab_id_filter(lab_ids, column):
+    if not lab_ids:
+        return "", {}
+    return f" AND {column} IN (SELECT value FROM json_each(:lab_ids))", {"lab_ids": json.dumps(list(lab_ids))}
+
+
+def _partition_sql(partition_by, table):
+    """SELECT expression (and join) giving the raw partition value for each row."""
+    if partition_by == "project":
+        project = column_name(PROJECT_FIELD)
+        return f'w."{project}"', f" LEFT JOIN MetadataWide w ON w.lab_id = {table}.lab_id"
+    if partition_by == "prefix":
+        return f"{table}.lab_id", ""
+    raise ValueError(f"Unknown partition_by '{partition_by}'. Choose 'prefix' or 'project'.")
+
+
+def _to_partition(partition_by, value):
+    return lab_prefix(value) if partition_by == "prefix" else partition_name(value)
+
+
+def _record_batches(connection, sql, params, schema, convert, chunksize):
+    """Stream query rows as Arrow record batches of at most `chunksize` rows."""
+    pa = require_pyarrow()
+    result = connection.execution_options(stream_results=True).execute(text(sql), params)
+    for rows in result.partitions(chunksize):
+        columns = list(zip(*(convert(row) for row in rows)))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+
+
+def _write_dataset(batches, schema, base_dir, dictionary_columns):
+    pa = require_pyarrow()
+    ds = pa.dataset
+    if os.path.isdir(base_dir):
+        shutil.rmtree(base_dir)
+    fmt = ds.ParquetFileFormat()
+    # Low-cardinality columns are dictionary encoded; zstd compresses the
+    # sequence text far better than the default snappy
+    options = fmt.make_write_options(compression="zstd", use_dictionary=dictionary_columns)
+    written = []
+    ds.write_dataset(
+        batches, base_dir, schema=schema, format=fmt, file_options=options,
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive"),
+        max_rows_per_group=ROW_GROUP_SIZE, min_rows_per_group=min(ROW_GROUP_SIZE, SNAPSHOT_CHUNK_SIZE),
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda f: written.append(f.metadata.num_rows if f.metadata else 0),
+    )
+    # An empty table still gets a directory, so the snapshot can be opened
+    os.makedirs(base_dir, exist_ok=True)
+    return sum(written)
+
+
+def write_snapshot(snapshot_dir=None, partition_by=None, lab_ids=None,
+                   chunksize=SNAPSHOT_CHUNK_SIZE, engine=None):
+    """
+    Write Metadata and GenomicData to a partitioned Parquet snapshot,
+    replacing any previous snapshot in the same directory. Pass lab_ids to
+    snapshot only those samples. Sequences are stored decoded.
+    Returns a summary dict (also saved as snapshot.json).
+    """
+    pa = require_pyarrow()
+    default_dir, default_partition = snapshot_settings()
+    snapshot_dir = snapshot_dir or default_dir
+    partition_by = partition_by or default_partition
+    engine = engine or get_engine()
+    metadata_schema, genomic_schema = _schemas(pa)
+    start = time.perf_counter()
+
+    with engine.connect() as connection:
+        part, join = _partition_sql(partition_by, "Metadata")
+        where, params = _lab_id_filter(lab_ids, "Metadata.lab_id")
+        metadata_rows = _write_dataset(_record_batches(
+            connection,
+            f"SELECT Metadata.lab_id, Metadata.key, Metadata.value, {part} FROM Metadata{join} "
+            f"WHERE 1 = 1{where} ORDER BY Metadata.lab_id, Metadata.key",
+            params, metadata_schema,
+            lambda row: (row[0], row[1], row[2], _to_partition(partition_by, row[3])),
+            chunksize,
+        ), metadata_schema, os.path.join(snapshot_dir, "metadata"), ["lab_id", "key", PARTITION_COLUMN])
+
+        part, join = _partition_sql(partition_by, "GenomicData")
+        where, params = _lab_id_filter(lab_ids, "GenomicData.lab_id")
+        genomic_rows = _write_dataset(_record_batches(
+            connection,
+            f"SELECT GenomicData.lab_id, GenomicData.key, GenomicData.seq_order, {stored_value_sql()}, {part} "
+            f"FROM GenomicData{join} WHERE 1 = 1{where} ORDER BY GenomicData.lab_id, GenomicData.seq_order",
+            params, genomic_schema,
+            lambda row: (row[0], row[1], row[2], decode_sequence(row[3]), _to_partition(partition_by, row[4])),
+            chunksize,
+        ), genomic_schema, os.path.join(snapshot_dir, "genomic"), ["lab_id", PARTITION_COLUMN])
+
+    summary = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "partition_by": partition_by,
+        "lab_ids": list(lab_ids) if lab_ids else None,
+        "metadata_rows": metadata_rows,
+        "sequences": genomic_rows,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    with open(os.path.join(snapshot_dir, "snapshot.json"), "w") as handle:
+        json.dump(summary, handle, indent=2)
+    print(f"Wrote snapshot of {metadata_rows} metadata rows and {genomic_rows} sequences "
+          f"to {snapshot_dir} in {summary['seconds']:.2f}s.")
+    return summary
+
+
+def write_results_snapshot(results, file_path):
+    """
+    Save a search result DataFrame as a single Parquet file, so a filtered
+    result can be shared or reloaded with its column types intact.
+    """
+    pa = require_pyarrow()
+    import pyarrow.parquet as pq
+
+    folder = os.path.dirname(file_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    table = pa.Table.from_pandas(results, preserve_index=False)
+    pq.write_table(table, file_path, compression="zstd")
+    print(f"Wrote {len(results)} rows to {file_path}")
+    return file_path
+
+
+def snapshot_info(snapshot_dir=None):
+    """Return the snapshot.json summary, or None if there is no snapshot."""
+    snapshot_dir = snapshot_dir or snapshot_settings()[0]
+    path = os.path.join(snapshot_dir, "snapshot.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def open_snapshot(snapshot_dir=None):
+    """
+    Open a snapshot's tables as Arrow datasets. Returns
+    (metadata, genomic, partition_by).
+    """
+    pa = require_pyarrow()
+    snapshot_dir = snapshot_dir or snapshot_settings()[0]
+    info = snapshot_info(snapshot_dir)
+    if info is None:
+        raise FileNotFoundError(f"No snapshot found in {snapshot_dir}. Run: python -m modules.snapshot")
+    metadata_schema, genomic_schema = _schemas(pa)
+    datasets = [
+        pa.dataset.dataset(os.path.join(snapshot_dir, name), format="parquet", schema=schema,
+                           partitioning=pa.dataset.partitioning(
+                               pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive"))
+        for name, schema in (("metadata", metadata_schema), ("genomic", genomic_schema))
+    ]
+    return datasets[0], datasets[1], info["partition_by"]
+
+
+if __name__ == "__main__":
+    write_snapshot(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import math
+
+from sqlalchemy import text
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# SampleLocation is an R*Tree over sample coordinates. R*Tree rowids must be
+# integers, so each lab_id maps to a stable 56-bit hash and is also kept as an
+# auxiliary column. Coordinates come from MetadataWide's typed latitude and
+# longitude, so this is refreshed together with MetadataWide.
+
+
+def location_id(lab_id):
+    """Return the R*Tree rowid for a lab ID."""
+    return int.from_bytes(hashlib.blake2b(str(lab_id).encode(), digest_size=7).digest(), "big")
+
+
+def ensure_sample_locations(connection):
+    """Create the SampleLocation R*Tree if it is missing."""
+    connection.execute(text("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS SampleLocation USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon, +lab_id
+        )
+    """))
+
+
+def refresh_sample_locations(connection, lab_ids):
+    """
+    Re-index the coordinates of the given lab IDs from MetadataWide. Lab IDs
+    without valid coordinates are dropped from the tree.
+    """
+    lab_ids = list(dict.fromkeys(str(lab_id) for lab_id in lab_ids))
+    if not lab_ids:
+        return 0
+    ensure_sample_locations(connection)
+    connection.execute(text("DELETE FROM SampleLocation WHERE id = :id"),
+                       [{"id": location_id(lab_id)} for lab_id in lab_ids])
+    rows = connection.execute(text("""
+        SELECT lab_id, latitude, longitude FROM MetadataWide
+        WHERE lab_id IN (SELECT value FROM json_each(:lab_ids))
+          AND latitude BETWEEN -90 AND 90
+          AND longitude BETWEEN -180 AND 180
+    """), {"lab_ids": json.dumps(lab_ids)}).fetchall()
+    if rows:
+        connection.execute(text("""
+            INSERT INTO SampleLocation (id, min_lat, max_lat, min_lon, max_lon, lab_id)
+            VALUES (:id, :lat, :lat, :lon, :lon, :lab_id)
+        """), [{"id": location_id(lab_id), "lat": lat, "lon": lon, "lab_id": lab_id} for lab_id, lat, lon in rows])
+    return len(rows)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_boxes(lat, lon, radius_km):
+    """
+    Return (min_lat, max_lat, min_lon, max_lon) boxes that together cover
+    every point within radius_km of (lat, lon). Boxes are split at the
+    antimeridian, and widen to all longitudes near the poles.
+    """
+    d_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    # Widest longitude span is at the latitude edge closest to a pole
+    widest = max(abs(min_lat), abs(max_lat))
+    d_lon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+    if d_lon >= 180.0:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    min_lon, max_lon = lon - d_lon, lon + d_lon
+    if min_lon < -180.0:
+        return [(min_lat, max_lat, min_lon + 360.0, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360.0)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def bbox_candidates(connection, min_lat, max_lat, min_lon, max_lon):
+    """
+    Return (lab_id, latitude, longitude) for samples whose R*Tree entry falls
+    in the box. The tree stores 32-bit floats rounded outwards, so callers
+    refine against the exact MetadataWide coordinates returned here.
+    """
+    return connection.execute(text("""
+        SELECT w.lab_id, w.latitude, w.longitude
+        FROM SampleLocation s
+        JOIN MetadataWide w ON w.lab_id = s.lab_id
+        WHERE s.max_lat >= :min_lat AND s.min_lat <= :max_lat
+          AND s.max_lon >= :min_lon AND s.min_lon <= :max_lon
+    """), {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}).fetchall()
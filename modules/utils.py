@@ -1,17 +1,135 @@
-import yaml
 import os
-from sqlalchemy import create_engine
+import re
+from functools import lru_cache
+from sqlalchemy import create_engine, event, text
 
 
+def _read_yaml(path):
+    # yaml is only needed here, and the C loader is several times faster
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(path, "r") as file:
+        return yaml.load(file, Loader=loader)
+
+@lru_cache(maxsize=None)
+def load_config():
+    """
+    Load the project configuration from config.yaml. Parsed once per process
+    and shared, so callers must not modify the returned dict; call
+    clear_config_cache() to pick up edits.
+    """
+    return _read_yaml("config/config.yaml")
+
+# One engine per database URL, shared by every module in the process
+_ENGINES = {}
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Apply PRAGMA settings to a raw SQLite connection.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            if not re.fullmatch(r"\w+", str(name)) or not re.fullmatch(r"-?\w+", str(value)):
+                raise ValueError(f"Invalid SQLite pragma {name}={value!r} in config.yaml")
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
 def get_engine():
     """
-    Load the database path from config.yaml and return a SQLAlchemy engine.
+    Return the shared SQLAlchemy engine for the database in config.yaml.
+
+    The engine is created once per process with the pool settings from the
+    `database` section, and every new connection gets the configured SQLite
+    pragmas (WAL journal, mmap, cache size, ...) plus the project's SQL
+    functions such as seq_decode(). Statements are timed by
+    modules.instrumentation unless instrumentation.enabled is false.
+    """
+    config = load_config()
+    db_config = config["database"]
+
+    db_path = os.path.expanduser(db_config["path"])
+    url = f"sqlite:///{db_path}"
+    if url in _ENGINES:
+        return _ENGINES[url]
+
+    from modules.seq_codec import register_sqlite_functions
+    from modules.instrumentation import instrument_engine
+
+    engine = create_engine(
+        url,
+        pool_size=db_config.get("pool_size", 5),
+        max_overflow=db_config.get("max_overflow", 10),
+        pool_timeout=db_config.get("pool_timeout", 30),
+    )
+    pragmas = {**DEFAULT_PRAGMAS, **(db_config.get("pragmas") or {})}
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+        register_sqlite_functions(dbapi_connection)
+
+    # Statement timings and the slow-query log (see modules/instrumentation.py)
+    instrument_engine(engine)
+    _ENGINES[url] = engine
+    return engine
+
+def ensure_state_table(connection):
+    """
+    Create the DbState table, a small key/value store for database-wide
+    bookkeeping such as index status.
+    """
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS DbState (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """))
+
+def get_state(connection, key, default=None):
+    """
+    Read a value from DbState.
+    """
+    row = connection.execute(text("SELECT value FROM DbState WHERE key = :key"), {"key": key}).fetchone()
+    return row[0] if row else default
+
+def set_state(connection, key, value):
+    """
+    Write a value to DbState.
     """
-    with open("config/config.yaml", "r") as file:
-        config = yaml.safe_load(file)
+    connection.execute(text("""
+        INSERT INTO DbState (key, value) VALUES (:key, :value)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """), {"key": key, "value": value})
 
-    db_path = os.path.expanduser(config["database"]["path"])
-    return create_engine(f"sqlite:///{db_path}")
+def get_generation(connection):
+    """
+    Return the database generation, a counter bumped by every import and
+    delete. Cached search results are only valid for the generation they
+    were computed at.
+    """
+    return int(get_state(connection, "generation", 0))
+
+def bump_generation(connection):
+    """
+    Advance the database generation. Call inside the transaction that
+    changes the data, so the bump commits (or rolls back) with it.
+    """
+    ensure_state_table(connection)
+    connection.execute(text("""
+        INSERT INTO DbState (key, value) VALUES ('generation', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    """))
 
 def print_row_key_value(row_dict, title="Row Data"):
     """
@@ -22,8 +140,14 @@ def print_row_key_value(row_dict, title="Row Data"):
     for key, value in row_dict.items():
         print(f"{key:<{max_len}} | {value}")
 
+@lru_cache(maxsize=None)
 def load_schema():
-    ## Load the schema definitions from schema.yaml
-    with open("config/schema.yaml", "r") as file:
-        schema = yaml.safe_load(file)
-    return schema
\ No newline at end of file
+    ## Load the schema definitions from schema.yaml (parsed once, like load_config)
+    return _read_yaml("config/schema.yaml")
+
+def clear_config_cache():
+    """
+    Forget the parsed config.yaml and schema.yaml so the next call re-reads them.
+    """
+    load_config.cache_clear()
+    load_schema.cache_clear()
\ No newline at end of file
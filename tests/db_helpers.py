@@ -0,0 +1,19 @@
+from sqlalchemy import create_engine, event
+
+from modules.seq_codec import register_sqlite_functions
+
+
+def make_test_engine(db_path):
+    """
+    Create a throwaway SQLite database with the project schema.
+    """
+    engine = create_engine(f"sqlite:///{db_path}")
+    event.listen(engine, "connect", register_sqlite_functions)
+    with open("database/schema.sql", "r") as file:
+        script = file.read()
+    connection = engine.raw_connection()
+    try:
+        connection.executescript(script)
+    finally:
+        connection.close()
+    return engine
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.batch_import import import_files, lab_id_from_filename
+from modules.kmer_index import find_motif_ids
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestBatchImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        patcher = patch("modules.data_import.Session", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def write_fasta(self, name, records):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as handle:
+            for key, seq in records:
+                handle.write(f">{key} description\n{seq[:70]}\n{seq[70:]}\n")
+        return path
+
+    def fetch(self, sql):
+        with self.engine.connect() as connection:
+            return connection.execute(text(sql)).fetchall()
+
+    def test_lab_id_from_filename(self):
+        self.assertEqual(lab_id_from_filename("/runs/ul012_run3.fasta"), "UL012")
+        self.assertIsNone(lab_id_from_filename("reads.fasta"))
+
+    def test_parallel_import_with_bad_file(self):
+        sheet_path = os.path.join(self.tmpdir.name, "samples.xlsx")
+        make_metadata_sheet(["UL001", "UL002"]).to_excel(sheet_path, index=False)
+        good = [self.write_fasta(f"UL00{n}_run.fasta", [(f"r{n}_{i}", "ACGTTGCAAT" * (12 + i)) for i in range(25)])
+                for n in (1, 2)]
+        bad = self.write_fasta("UL003.fasta", [("dup", "ACGT" * 30), ("dup", "ACGT" * 30)])
+
+        summary = import_files([*good, bad, sheet_path, os.path.join(self.tmpdir.name, "notes.txt")],
+                               workers=2, batch_size=10)
+
+        status = {os.path.basename(r["file"]): r["status"] for r in summary["files"]}
+        self.assertEqual(status, {"UL001_run.fasta": "ok", "UL002_run.fasta": "ok", "UL003.fasta": "error",
+                                  "samples.xlsx": "ok", "notes.txt": "error"})
+        self.assertEqual(summary["sequences"], 50)
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM GenomicData WHERE lab_id = 'UL003'"), [(0,)])
+        orders = self.fetch("SELECT seq_order FROM GenomicData WHERE lab_id = 'UL001' ORDER BY id")
+        self.assertEqual([row[0] for row in orders], list(range(25)))
+        self.assertEqual(self.fetch("""
+            SELECT value FROM Metadata WHERE lab_id = 'UL002' AND key = 'Extracted by'
+        """), [("Extracted by UL002",)])
+
+        with self.engine.connect() as connection:
+            ids = find_motif_ids(connection, "ACGTTGCAATACGTTGCA")
+        self.assertEqual(len(ids), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
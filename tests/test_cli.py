@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from sqlalchemy.orm import sessionmaker
+
+from modules.cli import load_manifest, run
+from db_helpers import make_test_engine
+
+
+class TestHeadlessCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine),
+                              ("modules.search.engine", self.engine),
+                              ("modules.export_utils.engine", self.engine),
+                              ("modules.db_info.engine", self.engine),
+                              ("modules.migrations.get_engine", lambda: self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        os.makedirs(os.path.join(self.tmpdir.name, "run7"))
+        with open(os.path.join(self.tmpdir.name, "run7", "reads.fasta"), "w") as handle:
+            handle.write(">r1\nACGTACGTACGTAAAA\n>r2\nTTTTGGGGCCCCAAAA\n")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def run_cli(self, *argv):
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            status = run(list(argv))
+        return status, json.loads(buffer.getvalue())
+
+    def test_manifest_formats(self):
+        yaml_path = os.path.join(self.tmpdir.name, "run.yaml")
+        with open(yaml_path, "w") as handle:
+            handle.write("files:\n  - path: run7/reads.fasta\n    lab_id: UL042\n  - samples.xlsx\n")
+        csv_path = os.path.join(self.tmpdir.name, "run.csv")
+        with open(csv_path, "w") as handle:
+            handle.write("path,lab_id\nrun7/reads.fasta,UL042\n")
+        expected = (os.path.join(self.tmpdir.name, "run7/reads.fasta"), "UL042")
+        self.assertEqual(load_manifest(yaml_path)[0], expected)
+        self.assertEqual(load_manifest(yaml_path)[1][1], None)
+        self.assertEqual(load_manifest(csv_path), [expected])
+
+    def test_import_search_export_delete(self):
+        manifest = os.path.join(self.tmpdir.name, "run.csv")
+        with open(manifest, "w") as handle:
+            handle.write("path,lab_id\nrun7/reads.fasta,UL042\n")
+
+        status, summary = self.run_cli("import", "--manifest", manifest, "--workers", "1")
+        self.assertEqual((status, summary["ok"]), (0, True))
+        self.assertEqual(summary["result"]["sequences"], 2)
+
+        status, summary = self.run_cli("search", "UL042")
+        fasta = [row for row in summary["result"]["results"] if row["type"] == "fasta"]
+        self.assertEqual([row["key"] for row in fasta], ["r1", "r2"])
+
+        out = os.path.join(self.tmpdir.name, "out.fasta")
+        status, summary = self.run_cli("export", "sequences", out, "--format", "fasta")
+        self.assertEqual(summary["result"]["rows"], 2)
+
+        status, summary = self.run_cli("delete", "UL042")
+        self.assertEqual((status, summary["ok"]), (1, False))
+        status, summary = self.run_cli("delete", "UL042", "--yes")
+        self.assertEqual(summary["result"]["deleted"][0]["sequences"], 2)
+
+        status, summary = self.run_cli("info")
+        self.assertEqual(summary["result"]["genomic_data"]["count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata, import_fasta, iter_fasta, _melt_metadata
+from modules.utils import load_schema
+from db_helpers import make_test_engine
+
+
+def make_metadata_sheet(lab_ids):
+    """
+    Build a metadata sheet with every schema column filled in.
+    """
+    columns = load_schema()["metadata_columns"]
+    data = {col: [f"{col} {lab_id}" for lab_id in lab_ids] for col in columns}
+    data["Uehling Lab ID"] = list(lab_ids)
+    return pd.DataFrame(data)
+
+
+class TestBulkMetadataImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        patcher = patch("modules.data_import.Session", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_melt_metadata(self):
+        sheet = make_metadata_sheet(["UL001", "UL002"])
+        rows = _melt_metadata(sheet, load_schema()["metadata_columns"])
+
+        self.assertEqual(len(rows), 2 * len(load_schema()["metadata_columns"]))
+        self.assertIn(("UL001", "Uehling Lab ID", "UL001"),
+                      set(rows.itertuples(index=False, name=None)))
+
+    @patch("modules.data_import.pd.read_excel")
+    def test_import_replaces_existing_lab_ids(self, mock_read_excel):
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO Metadata (lab_id, key, value) VALUES ('UL001', 'Stale Key', 'old')"
+            ))
+
+        mock_read_excel.return_value = make_metadata_sheet(["UL001", "UL002", "UL001"])
+        summary = import_metadata("mock_file_path.xlsx", batch_size=7)
+
+        n_columns = len(load_schema()["metadata_columns"])
+        with self.engine.connect() as connection:
+            count = connection.execute(text("SELECT COUNT(*) FROM Metadata")).scalar()
+            stale = connection.execute(text(
+                "SELECT COUNT(*) FROM Metadata WHERE key = 'Stale Key'"
+            )).scalar()
+
+        self.assertEqual(summary["lab_ids"], 2)
+        self.assertEqual(count, 2 * n_columns)
+        self.assertEqual(stale, 0)
+
+
+class TestStreamingFastaImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        patcher = patch("modules.data_import.Session", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fasta_path = os.path.join(self.tmpdir.name, "reads.fasta")
+        with open(self.fasta_path, "w") as handle:
+            for i in range(5):
+                handle.write(f">seq{i} sample read {i}\n{'ACGT' * 20}\n{'TTGA' * (i + 1)}\n")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_iter_fasta_offsets_resume(self):
+        with open(self.fasta_path, "rb") as handle:
+            records = list(iter_fasta(handle))
+            resumed = list(iter_fasta(handle, records[1][2]))
+
+        self.assertEqual([r[0] for r in records], [f"seq{i}" for i in range(5)])
+        self.assertEqual(records[0][1], "ACGT" * 20 + "TTGA")
+        self.assertEqual(resumed, records[2:])
+
+    def test_interrupted_import_resumes(self):
+        def interrupted(handle, offset=0):
+            for n, record in enumerate(iter_fasta(handle, offset)):
+                if n == 3:
+                    raise IOError("connection lost")
+                yield record
+
+        with patch("modules.data_import.iter_fasta", interrupted):
+            self.assertIsNone(import_fasta(self.fasta_path, lab_id="UL001", batch_size=2))
+
+        with self.engine.connect() as connection:
+            partial = connection.execute(text("SELECT COUNT(*) FROM GenomicData")).scalar()
+        self.assertEqual(partial, 2)
+
+        summary = import_fasta(self.fasta_path, lab_id="UL001", batch_size=2)
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(
+                "SELECT key, seq_order FROM GenomicData ORDER BY seq_order"
+            )).fetchall()
+            checkpoints = connection.execute(text("SELECT COUNT(*) FROM ImportCheckpoint")).scalar()
+
+        self.assertEqual(summary["sequences"], 3)
+        self.assertEqual(rows, [(f"seq{i}", i) for i in range(5)])
+        self.assertEqual(checkpoints, 0)
+
+    def test_replaced_file_does_not_resume(self):
+        def interrupted(handle, offset=0):
+            for n, record in enumerate(iter_fasta(handle, offset)):
+                if n == 3:
+                    raise IOError("connection lost")
+                yield record
+
+        with patch("modules.data_import.iter_fasta", interrupted):
+            import_fasta(self.fasta_path, lab_id="UL001", batch_size=2)
+
+        # Same size and modification time, different records
+        stat = os.stat(self.fasta_path)
+        with open(self.fasta_path) as handle:
+            replaced = handle.read().replace(">seq", ">new")
+        with open(self.fasta_path, "w") as handle:
+            handle.write(replaced)
+        os.utime(self.fasta_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        summary = import_fasta(self.fasta_path, lab_id="UL001", batch_size=2)
+        self.assertEqual(summary["sequences"], 5)
+        with self.engine.connect() as connection:
+            keys = [row[0] for row in connection.execute(text("SELECT key FROM GenomicData WHERE key LIKE 'new%'"))]
+        self.assertEqual(sorted(keys), [f"new{i}" for i in range(5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata, import_fasta
+from modules.batch_import import import_files
+from modules.delete import delete_fasta, delete_lab_id
+from modules.db_stats import (length_bucket, bucket_bounds, n50, recompute_stats, table_stats,
+                              length_histogram, lab_stats)
+from modules.utils import load_schema
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestDbStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with patch("modules.data_import.pd.read_excel", return_value=make_metadata_sheet(["UL001", "UL002"])):
+            import_metadata("mock_file_path.xlsx")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def import_lengths(self, lab_id, lengths):
+        path = os.path.join(self.tmpdir.name, f"{lab_id}.fasta")
+        with open(path, "w") as handle:
+            for i, length in enumerate(lengths):
+                handle.write(f">{lab_id}_{i}\n{'ACGT' * (length // 4)}{'A' * (length % 4)}\n")
+        import_fasta(path, lab_id=lab_id, batch_size=2)
+
+    def snapshot(self):
+        with self.engine.connect() as connection:
+            return table_stats(connection), length_histogram(connection), lab_stats(connection, order_by="lab_id")
+
+    def test_buckets_and_n50(self):
+        for bucket in range(0, 80):
+            low, high = bucket_bounds(bucket)
+            if low <= high:
+                self.assertEqual(length_bucket(low), bucket)
+                self.assertEqual(length_bucket(high), bucket)
+                self.assertNotEqual(length_bucket(high + 1), bucket)
+        self.assertEqual(n50([2, 3, 4, 5, 6, 7, 8, 9, 10]), 8)
+        self.assertIsNone(n50([]))
+
+    def test_imports_and_deletes_keep_stats_in_step(self):
+        self.import_lengths("UL001", [100, 200, 300, 1000, 5000])
+        self.import_lengths("UL003", [50, 60])
+        tables, (histogram, estimate), samples = self.snapshot()
+
+        n_columns = len(load_schema()["metadata_columns"])
+        self.assertEqual(tables["GenomicData"]["count"], 7)
+        self.assertEqual(tables["GenomicData"]["bases"], 6710)
+        self.assertEqual(tables["Metadata"]["count"], 3 * n_columns)
+        self.assertEqual(tables["LabStats"]["count"], 3)
+        self.assertIsNotNone(tables["GenomicData"]["last_uploaded"])
+        self.assertEqual(sum(entry["sequences"] for entry in histogram), 7)
+        self.assertEqual(length_bucket(estimate), length_bucket(5000))
+        ul001 = samples[0]
+        self.assertEqual((ul001["sequences"], ul001["bases"], ul001["n50"]), (5, 6600, 5000))
+
+        delete_fasta("UL001")
+        delete_lab_id("UL003")
+        tables, (histogram, _), samples = self.snapshot()
+        self.assertEqual((tables["GenomicData"]["count"], tables["GenomicData"]["bases"]), (0, 0))
+        self.assertEqual(histogram, [])
+        self.assertEqual([sample["lab_id"] for sample in samples], ["UL001", "UL002"])
+        self.assertEqual(samples[0]["sequences"], 0)
+
+    def test_recompute_matches_incremental(self):
+        self.import_lengths("UL002", [10, 20, 30])
+        incremental = self.snapshot()
+        with self.engine.begin() as connection:
+            # Simulate drift from a hand edit
+            connection.execute(text("UPDATE TableStats SET row_count = 999"))
+        recompute_stats(self.engine)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_batched_imports_add_increments(self):
+        lengths = [(i * 37) % 900 + 5 for i in range(60)]
+        # Batches add their own rows; the full per-lab rescan is never run
+        with patch("modules.data_import.refresh_lab_stats") as rescan:
+            self.import_lengths("UL001", lengths[:40])
+        rescan.assert_not_called()
+        path = os.path.join(self.tmpdir.name, "UL001_more.fasta")
+        with open(path, "w") as handle:
+            handle.writelines(f">more{i}\n{'C' * length}\n" for i, length in enumerate(lengths[40:]))
+        import_files([path], workers=1, batch_size=3)
+
+        incremental = self.snapshot()
+        ul001 = incremental[2][0]
+        self.assertEqual((ul001["sequences"], ul001["bases"]), (60, sum(lengths)))
+        self.assertEqual((ul001["min_length"], ul001["max_length"], ul001["n50"]),
+                         (min(lengths), max(lengths), n50(lengths)))
+        recompute_stats(self.engine)
+        self.assertEqual(self.snapshot(), incremental)
+
+
+if __name__ == "__main__":
+    unittest.main()
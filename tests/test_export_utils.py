@@ -0,0 +1,79 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata, import_fasta, iter_fasta
+from modules.export_utils import export_metadata, export_sequences, export_table, parse_row_selection
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestStreamingExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.export_utils.engine", self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.sequences = {f"seq{i}": "ACGTTGCA" * (i * 5 + 1) for i in range(7)}
+        fasta_path = self.path("reads.fasta")
+        with open(fasta_path, "w") as handle:
+            for key, seq in self.sequences.items():
+                handle.write(f">{key}\n{seq}\n")
+        import_fasta(fasta_path, lab_id="UL001")
+        with patch("modules.data_import.pd.read_excel", return_value=make_metadata_sheet(["UL001", "UL002"])):
+            import_metadata("mock_file_path.xlsx")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_fasta_round_trip_gzip(self):
+        out = self.path("out.fasta.gz")
+        self.assertEqual(export_sequences(out, "fasta", chunksize=3), 7)
+        with gzip.open(out, "rb") as handle:
+            lines = handle.read().splitlines()
+            handle.seek(0)
+            records = {key: seq for key, seq, _ in iter_fasta(handle)}
+        self.assertEqual(records, self.sequences)
+        self.assertLessEqual(max(len(line) for line in lines), 60)
+
+    def test_tsv_sequences_and_append(self):
+        out = self.path("out.tsv")
+        export_sequences(out, "tsv", lab_ids=["UL001"], chunksize=2)
+        export_sequences(out, "tsv", lab_ids=["UL001"], append=True)
+        df = pd.read_csv(out, sep="\t")
+        self.assertEqual(list(df.columns), ["lab_id", "key", "sequence"])
+        self.assertEqual(len(df), 14)
+        self.assertEqual(df.loc[df["key"] == "seq3", "sequence"].iloc[0], self.sequences["seq3"])
+
+    def test_metadata_csv(self):
+        out = self.path("meta.csv")
+        self.assertEqual(export_metadata(out, "csv", lab_ids=["UL002"]), 1)
+        df = pd.read_csv(out)
+        self.assertEqual(df["Uehling Lab ID"].tolist(), ["UL002"])
+        self.assertEqual(df["Extracted by"].tolist(), ["Extracted by UL002"])
+
+    def test_export_table_and_row_selection(self):
+        self.assertEqual(parse_row_selection("1, 3-4, 9", 5), [0, 2, 3])
+        out = self.path("table.csv")
+        df = pd.DataFrame({"key": ["a", "b"], "value": ["1", "2"]})
+        export_table(df, out, "csv")
+        export_table(df, out, "csv", append=True)
+        self.assertEqual(len(pd.read_csv(out)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
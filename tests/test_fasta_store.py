@@ -0,0 +1,95 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_fasta
+from modules.batch_import import import_files
+from modules.export_utils import export_sequences
+from modules.fasta_store import FastaStore, read_reference, unpack_reference
+from modules.seq_codec import decode_sequence, sequence_slice, is_file_reference, encode_sequence
+from modules.sequence_store import stored_value_sql
+from modules.search import search_db
+from db_helpers import make_test_engine
+
+
+def random_sequence(length, seed):
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+class TestFastaStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmpdir.name, "sequences")
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        settings = ("flatfile", self.store_dir, 7)
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.export_utils.engine", self.engine),
+                              ("modules.fasta_store.store_settings", lambda: settings)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_slices_read_only_requested_bases(self):
+        store = FastaStore(self.store_dir, line_width=7)
+        sequences = [random_sequence(n, n) for n in (0, 1, 7, 8, 50)]
+        references = store.append([(f"s{i}", seq) for i, seq in enumerate(sequences)])
+        store.close()
+        for seq, reference in zip(sequences, references):
+            self.assertEqual(decode_sequence(reference), seq)
+            for start, end in ((0, 3), (5, 9), (6, 7), (10, None), (-4, None)):
+                self.assertEqual(sequence_slice(reference, start, end), seq[start:end])
+        self.assertEqual(sequence_slice(encode_sequence(sequences[-1], "2bit"), 3, 9), sequences[-1][3:9])
+
+        # The .fai index matches what samtools would build
+        with open(os.path.join(self.store_dir, "store-0001.fa.fai")) as handle:
+            fai = [line.split("\t") for line in handle.read().splitlines()]
+        self.assertEqual([int(entry[2]) for entry in fai], [unpack_reference(ref)[1] for ref in references])
+
+    def test_imports_write_references(self):
+        sequences = {f"r{i}": random_sequence(100 + i, i) for i in range(5)}
+        path = os.path.join(self.tmpdir.name, "UL002.fasta")
+        with open(path, "w") as handle:
+            handle.writelines(f">{key}\n{seq}\n" for key, seq in sequences.items())
+        import_fasta(path, lab_id="UL001", batch_size=2)
+        import_files([path], workers=1)
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(f"SELECT key, {stored_value_sql()} FROM GenomicData")).fetchall()
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all(is_file_reference(value) for _, value in rows))
+        self.assertEqual({key: read_reference(value) for key, value in rows}, sequences)
+
+        out = os.path.join(self.tmpdir.name, "out.fasta")
+        export_sequences(out, "fasta", lab_ids=["UL001"])
+        with open(out) as handle:
+            exported = handle.read()
+        self.assertEqual(exported.count(">"), 5)
+        self.assertIn(sequences["r4"][:60], exported)
+
+    def test_search_db_returns_whole_sequences(self):
+        sequence = random_sequence(400, 7)
+        path = os.path.join(self.tmpdir.name, "UL001.fasta")
+        with open(path, "w") as handle:
+            handle.write(f">long\n{sequence}\n")
+        for lab_id, backend in (("UL001", "sqlite"), ("UL002", "flatfile")):
+            settings = (backend, self.store_dir, 7)
+            with patch("modules.fasta_store.store_settings", lambda: settings), \
+                    patch("modules.search.engine", self.engine):
+                import_fasta(path, lab_id=lab_id)
+                results = search_db(lab_id, use_cache=False)
+            self.assertEqual(results.loc[results["type"] == "fasta", "value"].tolist(), [sequence])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from modules.instrumentation import Instrumentation, profile_command
+from db_helpers import make_test_engine
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        self.log_path = os.path.join(self.tmpdir.name, "slow.log")
+        self.instrumentation = Instrumentation(slow_query_ms=10_000, slow_query_log=self.log_path)
+        self.instrumentation.install(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_statement_timings_and_row_counts(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO Metadata (lab_id, key, value) VALUES (:lab_id, :key, '')"),
+                               [{"lab_id": "UL001", "key": f"k{i}"} for i in range(3)])
+            for _ in range(2):
+                connection.execute(text("SELECT   value FROM Metadata\n WHERE lab_id = 'UL001'")).fetchall()
+
+        summary = self.instrumentation.summary()
+        statements = {entry["statement"]: entry for entry in summary["top_statements"]}
+        self.assertEqual(statements["SELECT value FROM Metadata WHERE lab_id = 'UL001'"]["count"], 2)
+        insert = next(entry for key, entry in statements.items() if key.startswith("INSERT INTO Metadata"))
+        self.assertEqual(insert["affected_rows"], 3)
+        self.assertEqual(summary["slow_queries"], [])
+
+    def test_failed_statement_does_not_skew_later_timings(self):
+        with self.engine.connect() as connection:
+            with self.assertRaises(Exception):
+                connection.execute(text("SELECT no_such_column FROM Metadata"))
+            connection.rollback()
+            connection.execute(text("SELECT COUNT(*) FROM Metadata")).scalar()
+            self.assertNotIn("instrumentation_start", connection.connection.info)
+
+        statements = {entry["statement"]: entry for entry in self.instrumentation.summary()["top_statements"]}
+        self.assertNotIn("SELECT no_such_column FROM Metadata", statements)
+        self.assertEqual(statements["SELECT COUNT(*) FROM Metadata"]["count"], 1)
+
+    def test_slow_queries_are_logged_with_plan(self):
+        self.instrumentation.slow_query_ms = 0
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT value FROM Metadata WHERE lab_id = :lab_id"), {"lab_id": "UL001"})
+
+        slow = self.instrumentation.summary()["slow_queries"][-1]
+        self.assertTrue(slow["statement"].startswith("SELECT value FROM Metadata"))
+        self.assertTrue(any("Metadata" in line for line in slow["plan"]))
+        with open(self.log_path) as log:
+            self.assertIn("SELECT value FROM Metadata", log.read())
+
+    def test_span_counts_sql_time(self):
+        with self.instrumentation.span("fetch"):
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT COUNT(*) FROM GenomicData")).scalar()
+
+        stage = self.instrumentation.summary()["stages"]["fetch"]
+        self.assertEqual(stage["count"], 1)
+        self.assertGreater(stage["sql_seconds"], 0)
+        self.assertLessEqual(stage["sql_seconds"], stage["seconds"])
+
+    def test_profile_command_writes_stats(self):
+        profile_dir = os.path.join(self.tmpdir.name, "profiles")
+        with profile_command("search", profile_dir) as path:
+            sum(range(1000))
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.basename(path).startswith("search-"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_fasta
+from modules.kmer_index import kmer_array, encode_kmer, kmer_postings, find_motif_ids, rebuild_kmer_index
+from modules.sequence_store import stored_value_sql
+from db_helpers import make_test_engine
+
+
+def random_sequence(rng, length):
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+class TestKmerArray(unittest.TestCase):
+
+    def test_matches_naive_windows(self):
+        seq = "ACGTNACGTTGCAacgtRR" + "GATTACA" * 3
+        kmers, positions = kmer_array(seq.encode(), 5)
+        expected = [
+            (encode_kmer(seq[i:i + 5]), i) for i in range(len(seq) - 4)
+            if set(seq[i:i + 5].upper()) <= set("ACGT")
+        ]
+        self.assertEqual(list(zip(kmers.tolist(), positions.tolist())), expected)
+
+    def test_chunked_postings_match_one_pass(self):
+        rng = random.Random(3)
+        rows = [(i, random_sequence(rng, rng.randint(0, 300))) for i in range(20)]
+        self.assertEqual(sorted(kmer_postings(rows, 6, chunk_bases=250)), sorted(kmer_postings(rows, 6)))
+
+
+class TestKmerSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target in ("modules.kmer_index.get_engine", "modules.seq_codec.get_engine"):
+            patcher = patch(target, return_value=self.engine)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("modules.data_import.Session", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        rng = random.Random(7)
+        self.sequences = [random_sequence(rng, rng.randint(50, 400)) for _ in range(60)]
+        self.fasta_path = os.path.join(self.tmpdir.name, "reads.fasta")
+        with open(self.fasta_path, "w") as handle:
+            for i, seq in enumerate(self.sequences):
+                handle.write(f">read{i}\n{seq}\n")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def naive_ids(self, motif):
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(f"SELECT id, {stored_value_sql()} FROM GenomicData")).fetchall()
+        return sorted(row_id for row_id, value in rows if motif in value)
+
+    def check_motifs(self):
+        rng = random.Random(11)
+        with self.engine.connect() as connection:
+            for seq in rng.sample(self.sequences, 10):
+                start = rng.randint(0, len(seq) - 30)
+                motif = seq[start:start + rng.randint(12, 30)]
+                self.assertEqual(find_motif_ids(connection, motif), self.naive_ids(motif))
+            self.assertEqual(find_motif_ids(connection, "A" * 40), self.naive_ids("A" * 40))
+            self.assertIsNone(find_motif_ids(connection, "ACGT"))
+            self.assertIsNone(find_motif_ids(connection, "ACGTNNACGTACGTAC"))
+
+    def test_index_built_during_import(self):
+        import_fasta(self.fasta_path, lab_id="UL001", batch_size=16)
+        self.check_motifs()
+
+    def test_rebuild_offline(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (lab_id, key, value, seq_order)
+                VALUES ('UL002', :key, :value, :seq_order)
+            """), [{"key": f"read{i}", "value": seq, "seq_order": i} for i, seq in enumerate(self.sequences)])
+        with self.engine.connect() as connection:
+            self.assertIsNone(find_motif_ids(connection, self.sequences[0][:20]))
+
+        rebuild_kmer_index(batch_size=25)
+        self.check_motifs()
+
+
+if __name__ == "__main__":
+    unittest.main()
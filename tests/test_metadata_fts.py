@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from modules.metadata_fts import build_fts_query, ensure_metadata_fts, search_metadata_fts
+from modules.search import search_db
+from db_helpers import make_test_engine
+
+
+class TestMetadataFTS(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        rows = [
+            ("UL001", "Top ITS Blast Hit", "Mortierella elongata"),
+            ("UL001", "Extracted by", "Dr. Smith"),
+            ("UL002", "Top ITS Blast Hit", "Mortierella alpina"),
+            ("UL002", "ITS Taxonomy Comments", "Mortierella sp., Mortierella-like colony"),
+            ("UL003", "Top ITS Blast Hit", "Umbelopsis isabellina"),
+        ]
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO Metadata (lab_id, key, value) VALUES (:l, :k, :v)"),
+                               [{"l": l, "k": k, "v": v} for l, k, v in rows])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_build_fts_query(self):
+        self.assertEqual(build_fts_query("Dr. Smith"), '"Dr"* "Smith"*')
+        self.assertIsNone(build_fts_query("  ...  "))
+
+    def test_prefix_ranked_and_highlighted(self):
+        with self.engine.connect() as connection:
+            rows = search_metadata_fts(connection, "Mortier")
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0].key, "ITS Taxonomy Comments")
+        self.assertIn("[Mortierella]", rows[0].snippet)
+
+    def test_triggers_keep_index_in_sync(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("DELETE FROM Metadata WHERE lab_id = 'UL002'"))
+            connection.execute(text(
+                "UPDATE Metadata SET value = 'Umbelopsis ramanniana' WHERE lab_id = 'UL001' AND key = 'Top ITS Blast Hit'"
+            ))
+        with self.engine.connect() as connection:
+            self.assertEqual(search_metadata_fts(connection, "Mortierella"), [])
+            self.assertEqual([row.lab_id for row in search_metadata_fts(connection, "Umbelopsis")], ["UL001", "UL003"])
+
+    def test_ensure_rebuilds_existing_rows(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("DROP TABLE MetadataFTS"))
+            for trigger in ("insert", "delete", "update"):
+                connection.execute(text(f"DROP TRIGGER Metadata_fts_{trigger}"))
+            self.assertTrue(ensure_metadata_fts(connection))
+        with self.engine.connect() as connection:
+            self.assertEqual(len(search_metadata_fts(connection, "smith")), 1)
+
+    def test_search_db_routes_to_fts(self):
+        with patch("modules.search.engine", self.engine):
+            results = search_db("isabell")
+
+        self.assertEqual(results["lab_id"].tolist(), ["UL003"])
+        self.assertEqual(results["value"].tolist(), ["Umbelopsis [isabellina]"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata, import_fasta
+from modules.delete import delete_metadata
+from modules.metadata_wide import convert_value, column_name, rebuild_metadata_wide
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestMetadataWide(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("modules.metadata_wide.get_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        sheet = make_metadata_sheet(["UL001", "UL002", "UL003"])
+        sheet["Extracted by"] = ["Dr. Smith", "Dr. Smith", "Dr. Jones"]
+        sheet["Extraction Date"] = [datetime(2025, 1, 1), datetime(2025, 3, 1), datetime(2025, 3, 2)]
+        sheet["ITS Top Hit Similarity"] = [98.5, float("nan"), 91.0]
+        with patch("modules.data_import.pd.read_excel", return_value=sheet):
+            import_metadata("mock_file_path.xlsx")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def fetch(self, sql, params=None):
+        with self.engine.connect() as connection:
+            return connection.execute(text(sql), params or {}).fetchall()
+
+    def test_convert_value(self):
+        self.assertEqual(convert_value("97.5", "REAL"), 97.5)
+        self.assertIsNone(convert_value("nan", "REAL"))
+        self.assertEqual(convert_value("2025-01-01 00:00:00", "DATE"), "2025-01-01")
+        self.assertEqual(convert_value("3/14/2024", "DATE"), "2024-03-14")
+        self.assertIsNone(convert_value("", "TEXT"))
+        self.assertEqual(column_name("16S Top Hit Similarity"), "16s_top_hit_similarity")
+
+    def test_import_populates_typed_rows(self):
+        rows = self.fetch("""
+            SELECT lab_id, its_top_hit_similarity, extraction_date FROM MetadataWide ORDER BY lab_id
+        """)
+        self.assertEqual(rows, [("UL001", 98.5, "2025-01-01"), ("UL002", None, "2025-03-01"),
+                                ("UL003", 91.0, "2025-03-02")])
+
+    def test_two_field_filter_is_one_index_search(self):
+        sql = """
+            SELECT lab_id FROM MetadataWide
+            WHERE extracted_by = :who AND extraction_date > :after
+        """
+        params = {"who": "Dr. Smith", "after": "2025-02-01"}
+        self.assertEqual(self.fetch(sql, params), [("UL002",)])
+        plan = [row[-1] for row in self.fetch("EXPLAIN QUERY PLAN " + sql, params)]
+        self.assertEqual(len(plan), 1)
+        self.assertTrue(plan[0].startswith("SEARCH MetadataWide USING INDEX"), plan)
+
+    def test_fasta_placeholder_and_delete_update_rows(self):
+        fasta_path = os.path.join(self.tmpdir.name, "reads.fasta")
+        with open(fasta_path, "w") as handle:
+            handle.write(">r1\nACGT\n")
+        import_fasta(fasta_path, lab_id="UL009")
+        self.assertEqual(self.fetch("SELECT extracted_by FROM MetadataWide WHERE lab_id = 'UL009'"), [(None,)])
+
+        delete_metadata("UL001")
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM MetadataWide WHERE lab_id = 'UL001'"), [(0,)])
+
+    def test_rebuild(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("DELETE FROM MetadataWide"))
+        self.assertEqual(rebuild_metadata_wide(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, event, text
+
+from modules.migrations import migrate, check_query_plans, column_names, LATEST_VERSION
+from modules.seq_codec import register_sqlite_functions
+
+LEGACY_SCHEMA = """
+CREATE TABLE Metadata (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lab_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    UNIQUE(lab_id, key)
+);
+CREATE TABLE GenomicData (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lab_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    UNIQUE(lab_id, key)
+);
+INSERT INTO Metadata (lab_id, key, value) VALUES ('UL001', 'Extracted by', 'Dr. Smith');
+INSERT INTO GenomicData (lab_id, key, value) VALUES ('UL001', 'a', 'ACGT'), ('UL002', 'b', 'GGCC'), ('UL001', 'c', 'TTAA');
+"""
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmpdir.name, 'legacy.sqlite')}")
+        event.listen(self.engine, "connect", register_sqlite_functions)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_upgrades_legacy_database(self):
+        connection = self.engine.raw_connection()
+        connection.executescript(LEGACY_SCHEMA)
+        connection.close()
+
+        self.assertEqual(migrate(self.engine, verbose=False), LATEST_VERSION)
+
+        with self.engine.begin() as connection:
+            self.assertIn("seq_order", column_names(connection, "GenomicData"))
+            self.assertIn("file_uploaded", column_names(connection, "Metadata"))
+            orders = connection.execute(text("SELECT key, seq_order FROM GenomicData ORDER BY id")).fetchall()
+            connection.execute(text("INSERT INTO Metadata (lab_id, key, value) VALUES ('UL002', 'k', 'v')"))
+            stamped = connection.execute(text(
+                "SELECT file_uploaded FROM Metadata WHERE lab_id = 'UL002'"
+            )).scalar()
+            fts_hits = connection.execute(text(
+                "SELECT COUNT(*) FROM MetadataFTS WHERE MetadataFTS MATCH 'smith'"
+            )).scalar()
+
+        self.assertEqual(orders, [("a", 0), ("b", 0), ("c", 1)])
+        self.assertIsNotNone(stamped)
+        self.assertEqual(fts_hits, 1)
+
+        # Running again is a no-op
+        self.assertEqual(migrate(self.engine, verbose=False), LATEST_VERSION)
+
+    def test_lab_id_queries_do_not_scan(self):
+        migrate(self.engine, verbose=False)
+        plans = check_query_plans(self.engine, verbose=False)
+
+        for steps in plans.values():
+            self.assertTrue(steps)
+            self.assertFalse([step for step in steps if step.startswith("SCAN")], steps)
+
+
+if __name__ == "__main__":
+    unittest.main()
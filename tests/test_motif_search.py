@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from modules.motif_search import (MotifMatcher, parse_motifs, read_motif_file, reverse_complement,
+                                  search_motifs, KNOWN_PRIMERS)
+from modules.seq_codec import encode_sequence
+from db_helpers import make_test_engine
+
+ITS1F = KNOWN_PRIMERS["ITS1F"]
+
+
+class TestMotifSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_iupac_and_reverse_strand(self):
+        self.assertEqual(reverse_complement("ACGTRYN"), "NRYACGT")
+        matcher = MotifMatcher({"fITS7": "GTGARTCATCGAATCTTTG"})
+        forward = "GTGAGTCATCGAATCTTTG"
+        sequence = "TT" + forward + "CC" + reverse_complement("GTGAATCATCGAATCTTTG") + "A"
+        hits = [(name, strand, start, end, match) for _, name, strand, start, end, match, _ in
+                matcher.scan([("s1", sequence)])]
+        self.assertEqual(hits, [
+            ("fITS7", "+", 2, 21, forward),
+            ("fITS7", "-", 23, 42, reverse_complement("GTGAATCATCGAATCTTTG")),
+        ])
+
+    def test_no_match_across_sequences_or_mismatch(self):
+        matcher = MotifMatcher({"m": "ACGTACGTAC"})
+        rows = [("a", "TTTTACGTA"), ("b", "CGTACTTTT"), ("c", "ACGTACGTAG")]
+        self.assertEqual(list(matcher.scan(rows)), [])
+
+    def test_parse_motifs(self):
+        motifs = parse_motifs(["ITS1F", "probe = acgu", ""])
+        self.assertEqual(motifs, {"ITS1F": ITS1F, "probe": "ACGT"})
+        with self.assertRaises(ValueError):
+            parse_motifs(["bad=ACGTX"])
+
+        path = os.path.join(self.tmpdir.name, "primers.fasta")
+        with open(path, "w") as handle:
+            handle.write(">ITS4 reverse\nTCCTCCGCTT\nATTGATATGC\n")
+        self.assertEqual(read_motif_file(path), {"ITS4": KNOWN_PRIMERS["ITS4"]})
+
+    def test_streams_stored_sequences(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (lab_id, key, value, seq_order) VALUES (:lab_id, :key, :value, 0)
+            """), [
+                {"lab_id": "UL001", "key": "r1", "value": "AAAA" + ITS1F + "AAAA"},
+                {"lab_id": "UL002", "key": "r2", "value": encode_sequence("GG" + reverse_complement(ITS1F), "2bit")},
+                {"lab_id": "UL003", "key": "r3", "value": "ACGT" * 20},
+            ])
+        hits = list(search_motifs({"ITS1F": ITS1F}, engine=self.engine, batch_size=1))
+        self.assertEqual([(hit["lab_id"], hit["strand"], hit["start"]) for hit in hits],
+                         [("UL001", "+", 4), ("UL002", "-", 2)])
+        self.assertEqual(hits[0]["context"], f"AAAA[{ITS1F}]AAAA")
+
+        only = list(search_motifs({"ITS1F": ITS1F}, lab_ids=["UL002"], engine=self.engine))
+        self.assertEqual([hit["key"] for hit in only], ["r2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata
+from modules.query import parse_predicate, iter_query, explain_query
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestParsePredicate(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_predicate("ITS Top Hit Similarity >= 97"), ("ITS Top Hit Similarity", ">=", "97"))
+        self.assertEqual(parse_predicate("Extraction Date between 2025-01-01 and 2025-06-30"),
+                         ("Extraction Date", "between", ("2025-01-01", "2025-06-30")))
+        self.assertEqual(parse_predicate("DNA Extraction Method = Method A"), ("DNA Extraction Method", "=", "Method A"))
+        self.assertEqual(parse_predicate("has_fasta"), ("has_fasta", "=", True))
+        self.assertEqual(parse_predicate("has_fasta = no"), ("has_fasta", "=", False))
+        with self.assertRaises(ValueError):
+            parse_predicate("Extraction Date")
+
+
+class TestStructuredQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        patcher = patch("modules.data_import.Session", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        lab_ids = [f"UL{i:03d}" for i in range(200)]
+        sheet = make_metadata_sheet(lab_ids)
+        sheet["Extracted by"] = ["Dr. Smith" if i % 10 == 0 else "Dr. Jones" for i in range(200)]
+        sheet["Extraction Date"] = [datetime(2025, 1, 1) + timedelta(days=i) for i in range(200)]
+        sheet["ITS Top Hit Similarity"] = [90 + (i % 10) for i in range(200)]
+        sheet["DNA Extraction Method"] = ["Method A" if i % 2 else "Method B" for i in range(200)]
+        self.sheet = sheet
+        with patch("modules.data_import.pd.read_excel", return_value=sheet):
+            import_metadata("mock_file_path.xlsx")
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (lab_id, key, value, seq_order) VALUES ('UL010', 'r1', 'ACGT', 0)
+            """))
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_results_match_python_filter(self):
+        predicates = [
+            ("DNA Extraction Method", "=", "Method B"),
+            ("Extracted by", "=", "Dr. Smith"),
+            ("Extraction Date", ">", "2025-02-01"),
+            ("ITS Top Hit Similarity", ">=", "90"),
+        ]
+        rows = list(iter_query(predicates, batch_size=3, engine=self.engine))
+        sheet = self.sheet
+        expected = sheet[(sheet["DNA Extraction Method"] == "Method B") & (sheet["Extracted by"] == "Dr. Smith")
+                         & (sheet["Extraction Date"] > datetime(2025, 2, 1))]
+        self.assertEqual(sorted(row["Uehling Lab ID"] for row in rows), sorted(expected["Uehling Lab ID"]))
+        self.assertIsInstance(rows[0]["ITS Top Hit Similarity"], float)
+
+    def test_most_selective_predicate_drives_single_index_search(self):
+        explained = explain_query([
+            ("DNA Extraction Method", "=", "Method B"),
+            ("Extracted by", "=", "Dr. Smith"),
+            ("Extraction Date", ">", "2025-02-01"),
+        ], engine=self.engine)
+
+        self.assertEqual(explained["plan"][0][0][0], "Extracted by")
+        self.assertEqual(len(explained["steps"]), 1)
+        self.assertIn("extracted_by", explained["steps"][0])
+        self.assertIn("extraction_date>?", explained["steps"][0])
+
+    def test_has_fasta(self):
+        rows = list(iter_query([("has_fasta", "=", True)], engine=self.engine))
+        self.assertEqual([row["Uehling Lab ID"] for row in rows], ["UL010"])
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            list(iter_query([("Colour", "=", "red")], engine=self.engine))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from modules.regions import get_region, get_regions, read_regions_file, parse_region
+from modules.motif_search import reverse_complement
+from modules.fasta_store import FastaStore
+from modules.seq_codec import encode_sequence
+from db_helpers import make_test_engine
+
+
+def random_sequence(length, seed):
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+class TestRegions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        store_dir = os.path.join(self.tmpdir.name, "sequences")
+        patcher = patch("modules.fasta_store.store_settings", lambda: ("flatfile", store_dir, 60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.sequences = {"plain": random_sequence(500, 1), "packed": random_sequence(500, 2) + "NNRY",
+                          "stored": random_sequence(20000, 3)}
+        store = FastaStore(store_dir)
+        values = {"plain": self.sequences["plain"], "packed": encode_sequence(self.sequences["packed"], "2bit"),
+                  "stored": store.append([("stored", self.sequences["stored"])])[0]}
+        store.close()
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (lab_id, key, value, seq_order, seq_length)
+                VALUES ('UL001', :key, :value, 0, :length)
+            """), [{"key": key, "value": values[key], "length": len(self.sequences[key])} for key in values])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_region_from_each_storage_form(self):
+        for key, sequence in self.sequences.items():
+            self.assertEqual(get_region("UL001", key, 10, 70, engine=self.engine), sequence[10:70])
+            self.assertEqual(get_region("UL001", key, 5, 9, "-", engine=self.engine),
+                             reverse_complement(sequence[5:9]))
+        self.assertEqual(get_region("UL001", "stored", 10000, 10500, engine=self.engine),
+                         self.sequences["stored"][10000:10500])
+        self.assertIsNone(get_region("UL001", "missing", 0, 10, engine=self.engine))
+        with self.assertRaises(ValueError):
+            parse_region("UL001", "plain", 10, 5)
+
+    def test_batch_clips_and_keeps_order(self):
+        path = os.path.join(self.tmpdir.name, "regions.tsv")
+        with open(path, "w") as handle:
+            handle.write("lab_id\tkey\tstart\tend\tstrand\n# flanks\n"
+                         "UL001\tpacked\t495\t600\t+\nUL001\tplain\t0\t4\tminus\nUL002\tplain\t0\t4\n")
+        results = list(get_regions(read_regions_file(path), engine=self.engine, batch_size=2))
+        self.assertEqual([(r["key"], r["end"], r["sequence"]) for r in results], [
+            ("packed", 504, self.sequences["packed"][495:]),
+            ("plain", 4, reverse_complement(self.sequences["plain"][:4])),
+            ("plain", 4, None),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata
+from modules.delete import delete_metadata
+from modules.search import search_db, search_cache_stats
+from modules.search_cache import SearchCache
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine),
+                              ("modules.search.engine", self.engine),
+                              ("modules.search_cache._cache", SearchCache(max_entries=2))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.import_sheet(["UL001", "UL002"])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def import_sheet(self, lab_ids):
+        with patch("modules.data_import.pd.read_excel", return_value=make_metadata_sheet(lab_ids)):
+            import_metadata("mock_file_path.xlsx")
+
+    def test_lru_eviction(self):
+        cache = SearchCache(max_entries=2)
+        cache.put("a", 0, 1)
+        cache.put("b", 0, 2)
+        self.assertEqual(cache.get("a", 0), 1)
+        cache.put("c", 0, 3)
+        self.assertIsNone(cache.get("b", 0))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    def test_hits_until_import_or_delete(self):
+        first = search_db("UL001")
+        with patch("modules.search._search_db") as uncached:
+            again = search_db(" UL001 ")
+            uncached.assert_not_called()
+        self.assertTrue(again.equals(first))
+        self.assertEqual(search_cache_stats()["hits"], 1)
+
+        delete_metadata("UL001")
+        self.assertFalse((search_db("UL001")["type"] == "metadata").any())
+
+        self.import_sheet(["UL001"])
+        self.assertTrue((search_db("UL001")["type"] == "metadata").any())
+        self.assertGreaterEqual(search_cache_stats()["invalidations"], 2)
+
+    def test_persisted_cache(self):
+        search_db("UL002")
+        path = os.path.join(self.tmpdir.name, "cache.pickle")
+        from modules.search_cache import get_search_cache
+        get_search_cache().save(path)
+
+        warm = SearchCache(max_entries=2)
+        self.assertEqual(warm.load(path), 1)
+        with patch("modules.search_cache._cache", warm), patch("modules.search._search_db") as uncached:
+            search_db("UL002")
+            uncached.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_fasta
+from modules.search import search_page, iter_search_pages, export_search, encode_cursor, PREVIEW_BASES
+from modules import kmer_index
+from db_helpers import make_test_engine
+
+
+class TestSearchPages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.search.engine", self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO Metadata (lab_id, key, value) VALUES (:l, :k, :v)"), [
+                {"l": f"UL{i:03d}", "k": "Top ITS Blast Hit", "v": f"Mortierella strain {i}"} for i in range(1, 8)
+            ] + [{"l": "UL001", "k": "Extracted by", "v": "Dr. Smith"}])
+        path = os.path.join(self.tmpdir.name, "UL001.fasta")
+        with open(path, "w") as handle:
+            for i in range(5):
+                handle.write(f">contig{i}\n{'ACGT' * 50}GAATTC{i}\n")
+        import_fasta(path, lab_id="UL001")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def all_pages(self, keyword, page_size):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page, cursor = search_page(keyword, cursor, page_size)
+            self.assertLessEqual(len(page), page_size)
+            rows += page[["source", "lab_id", "key"]].values.tolist()
+            pages += 1
+            if cursor is None:
+                return rows, pages
+
+    def test_keyword_pages_cover_every_match_once(self):
+        rows, pages = self.all_pages("Mortierella", 3)
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(pages, 3)
+        self.assertEqual(len({tuple(row) for row in rows}), 7)
+
+        # Pages continue from Metadata into GenomicData
+        rows, _ = self.all_pages("GAATTC", 2)
+        self.assertEqual([key for _, _, key in rows], [f"contig{i}" for i in range(5)])
+
+    def test_motif_page_work_does_not_follow_hit_count(self):
+        primer = "GATTACAGGCCTTAAG"
+        path = os.path.join(self.tmpdir.name, "UL002.fasta")
+        with open(path, "w") as handle:
+            handle.writelines(f">hit{i}\n{'T' * (i % 7)}{primer}CCC\n" for i in range(300))
+        import_fasta(path, lab_id="UL002")
+
+        examined = []
+        match_tiles = kmer_index._match_tiles
+
+        def counting(connection, tiles, first_postings):
+            examined.append(len(first_postings))
+            return match_tiles(connection, tiles, first_postings)
+
+        with patch("modules.kmer_index._match_tiles", counting):
+            page, cursor = search_page(primer, page_size=5)
+        self.assertEqual(page["key"].tolist(), [f"hit{i}" for i in range(5)])
+        self.assertLessEqual(sum(examined), kmer_index.MOTIF_CHUNK_POSTINGS)
+
+        rows, _ = self.all_pages(primer, 40)
+        self.assertEqual([key for _, _, key in rows], [f"hit{i}" for i in range(300)])
+
+    def test_lab_id_pages_follow_sequence_order(self):
+        rows, pages = self.all_pages("UL001", 4)
+        self.assertEqual([row[0] for row in rows], ["Metadata"] * 2 + ["GenomicData"] * 5)
+        self.assertEqual([key for _, _, key in rows[2:]], [f"contig{i}" for i in range(5)])
+        self.assertEqual(pages, 2)
+
+        page, _ = search_page("UL001", page_size=10)
+        self.assertTrue(all(len(value) <= PREVIEW_BASES for value in page["value"].iloc[2:]))
+        page, _ = search_page("UL001", page_size=10, full=True)
+        self.assertEqual(page["value"].iloc[2], "ACGT" * 50 + "GAATTC0")
+
+    def test_cursor_is_stable_across_inserts(self):
+        first, cursor = search_page("Mortierella", page_size=4)
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO Metadata (lab_id, key, value) VALUES ('UL000', 'Note', 'Mortierella?')"))
+        second, _ = search_page("Mortierella", cursor, page_size=10)
+        self.assertEqual(second["lab_id"].tolist(), ["UL005", "UL006", "UL007", "UL000"])
+
+    def test_pages_are_cached_until_import(self):
+        first = search_page("UL001", page_size=3)
+        with patch("modules.search._search_page") as uncached:
+            again = search_page("UL001", page_size=3)
+        uncached.assert_not_called()
+        self.assertEqual(again[0].values.tolist(), first[0].values.tolist())
+        self.assertEqual(again[1], first[1])
+
+        path = os.path.join(self.tmpdir.name, "more.fasta")
+        with open(path, "w") as handle:
+            handle.write(">extra\nACGT\n")
+        import_fasta(path, lab_id="UL001")
+        with patch("modules.search._search_page", return_value=first) as uncached:
+            search_page("UL001", page_size=3)
+        uncached.assert_called_once()
+
+    def test_rejects_cursor_from_other_search(self):
+        with self.assertRaises(ValueError):
+            search_page("Smith", encode_cursor("Mortierella", "fts", 3))
+        with self.assertRaises(ValueError):
+            search_page("Smith", "not a cursor")
+
+    def test_export_streams_all_pages(self):
+        out = os.path.join(self.tmpdir.name, "results.csv")
+        self.assertEqual(len(list(iter_search_pages("UL001", 3))), 3)
+        with patch("modules.search.iter_search_pages", wraps=iter_search_pages) as pages:
+            self.assertEqual(export_search("UL001", out, page_size=3), 7)
+        pages.assert_called_once_with("UL001", 3, full=True)
+        with open(out, newline="") as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(rows[-1]["value"], "ACGT" * 50 + "GAATTC4")
+
+
+if __name__ == "__main__":
+    unittest.main()
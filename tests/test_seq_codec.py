@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from modules.seq_codec import encode_sequence, decode_sequence, is_packed, convert_sequence_storage
+from db_helpers import make_test_engine
+
+
+class TestSequenceCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        sequences = [
+            "ACGT" * 1000 + "A",
+            "NNNNNACGTACGTRYKMacgtACGTNN",
+            "ACGTTGCA" * 50 + "N" * 3 + "GATTACA",
+            "",
+        ]
+        for encoding in ("plain", "2bit", "zlib"):
+            for seq in sequences:
+                self.assertEqual(decode_sequence(encode_sequence(seq, encoding)), seq)
+
+    def test_2bit_is_compact(self):
+        seq = "ACGT" * 2500 + "NNNN" + "GATTACA" * 100
+        packed = encode_sequence(seq, "2bit")
+
+        self.assertTrue(is_packed(packed))
+        self.assertLess(len(packed), len(seq) / 3.5)
+
+    def test_plain_values_pass_through(self):
+        self.assertEqual(decode_sequence("ACGT"), "ACGT")
+        self.assertIsNone(decode_sequence(None))
+        self.assertFalse(is_packed("ACGT"))
+
+
+class TestConvertSequenceStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        patcher = patch("modules.seq_codec.get_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.sequences = {f"seq{i}": "ACGT" * 500 + "N" * i for i in range(20)}
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (lab_id, key, value, seq_order)
+                VALUES ('UL001', :key, :value, 0)
+            """), [{"key": k, "value": v} for k, v in self.sequences.items()])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_convert_in_place_and_back(self):
+        report = convert_sequence_storage("2bit", batch_size=7)
+
+        self.assertEqual(report["converted"], 20)
+        self.assertLess(report["payload_bytes_after"], report["payload_bytes_before"] / 3)
+        with self.engine.connect() as connection:
+            rows = dict(connection.execute(text("SELECT key, value FROM GenomicData")).fetchall())
+        self.assertTrue(all(is_packed(value) for value in rows.values()))
+        self.assertEqual({k: decode_sequence(v) for k, v in rows.items()}, self.sequences)
+
+        convert_sequence_storage("plain", vacuum=False)
+        with self.engine.connect() as connection:
+            rows = dict(connection.execute(text("SELECT key, value FROM GenomicData")).fetchall())
+        self.assertEqual(rows, self.sequences)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_fasta
+from modules.batch_import import import_files
+from modules.delete import delete_fasta
+from modules.export_utils import export_sequences
+from modules.sequence_store import sequence_hash, stored_value_sql, deduplicate_existing
+from modules.seq_codec import decode_sequence
+from db_helpers import make_test_engine
+
+SHARED = "ACGTTGCAAT" * 30
+
+
+class TestSequenceStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine),
+                              ("modules.export_utils.engine", self.engine),
+                              ("modules.sequence_store.get_engine", lambda: self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def write_fasta(self, name, records):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as handle:
+            for key, sequence in records:
+                handle.write(f">{key}\n{sequence}\n")
+        return path
+
+    def fetch(self, sql):
+        with self.engine.connect() as connection:
+            return connection.execute(text(sql)).fetchall()
+
+    def blobs(self):
+        return dict((seq_hash, refcount) for seq_hash, refcount in self.fetch("SELECT hash, refcount FROM SequenceBlob"))
+
+    def test_shared_sequences_are_stored_once(self):
+        import_fasta(self.write_fasta("a.fasta", [("r1", SHARED), ("r2", "GGCC" * 10)]), lab_id="UL001")
+        import_files([self.write_fasta("UL002.fasta", [("x1", SHARED), ("x2", SHARED)])], workers=1)
+        self.assertEqual(self.blobs(), {sequence_hash(SHARED): 3, sequence_hash("GGCC" * 10): 1})
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM GenomicData WHERE value IS NOT NULL"), [(0,)])
+
+        rows = self.fetch(f"SELECT key, {stored_value_sql()} FROM GenomicData ORDER BY id")
+        self.assertEqual([(key, decode_sequence(value)) for key, value in rows],
+                         [("r1", SHARED), ("r2", "GGCC" * 10), ("x1", SHARED), ("x2", SHARED)])
+        out = os.path.join(self.tmpdir.name, "out.csv")
+        self.assertEqual(export_sequences(out, "csv", lab_ids=["UL002"]), 2)
+        with open(out) as handle:
+            self.assertEqual(handle.read().count(SHARED), 2)
+
+        delete_fasta("UL001")
+        self.assertEqual(self.blobs(), {sequence_hash(SHARED): 2})
+        delete_fasta("UL002")
+        self.assertEqual(self.blobs(), {})
+
+    def test_deduplicate_existing_rows(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO GenomicData (lab_id, key, value, seq_order) VALUES (:lab_id, :key, :value, 0)
+            """), [{"lab_id": f"UL00{i}", "key": "r", "value": SHARED} for i in range(1, 4)])
+        summary = deduplicate_existing(batch_size=2)
+        self.assertEqual((summary["moved"], summary["unique_sequences"], summary["references"]), (3, 1, 3))
+        self.assertEqual(self.blobs(), {sequence_hash(SHARED): 3})
+        self.assertEqual(deduplicate_existing()["moved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_fasta
+from modules.delete import delete_fasta
+from modules.motif_search import reverse_complement
+from modules.similarity import sketch_sequence, similar_sequences, ani_estimate, find_similar, DEFAULTS
+from db_helpers import make_test_engine
+
+
+def random_sequence(length, seed):
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+def mutate(sequence, rate, seed):
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT".replace(base, "")) if rng.random() < rate else base for base in sequence)
+
+
+class TestSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.reference = random_sequence(2000, 1)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def import_records(self, lab_id, records):
+        path = os.path.join(self.tmpdir.name, f"{lab_id}.fasta")
+        with open(path, "w") as handle:
+            for key, sequence in records:
+                handle.write(f">{key}\n{sequence}\n")
+        import_fasta(path, lab_id=lab_id)
+
+    def test_sketch_is_strand_independent(self):
+        _, forward = sketch_sequence(self.reference, DEFAULTS)
+        _, reverse = sketch_sequence(reverse_complement(self.reference), DEFAULTS)
+        self.assertEqual(forward.tolist(), reverse.tolist())
+        self.assertIsNone(sketch_sequence("ACGTNNNN", DEFAULTS))
+        self.assertEqual(ani_estimate(1.0, 15), 1.0)
+        self.assertEqual(ani_estimate(0.0, 15), 0.0)
+
+    def test_finds_near_identical_sequences(self):
+        self.import_records("UL001", [("same", self.reference), ("close", mutate(self.reference, 0.01, 2))])
+        self.import_records("UL002", [(f"other{i}", random_sequence(2000, 10 + i)) for i in range(5)])
+
+        with self.engine.connect() as connection:
+            hits = similar_sequences(connection, reverse_complement(self.reference), top_k=3)
+        self.assertEqual([hit["key"] for hit in hits], ["same", "close"])
+        self.assertEqual(hits[0]["jaccard"], 1.0)
+        self.assertGreater(hits[1]["ani"], 0.97)
+
+        results = find_similar(self.reference, top_k=1, engine=self.engine)
+        self.assertEqual(results["key"].tolist(), ["same"])
+
+    def test_delete_removes_sketches(self):
+        self.import_records("UL001", [("same", self.reference)])
+        delete_fasta("UL001")
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT COUNT(*) FROM SequenceSketch")).scalar(), 0)
+            self.assertEqual(similar_sequences(connection, self.reference), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
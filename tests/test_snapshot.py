@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata, import_fasta
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestParquetSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        patcher = patch("modules.data_import.Session", sessionmaker(bind=self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        sheet = make_metadata_sheet(["UL001", "UL002", "UL150"])
+        sheet["Project Funding"] = ["NSF grant", "NSF grant", None]
+        with patch("modules.data_import.pd.read_excel", return_value=sheet):
+            import_metadata("mock_file_path.xlsx")
+        fasta_path = os.path.join(self.tmpdir.name, "reads.fasta")
+        for lab_id, motif in (("UL001", "ACGT"), ("UL150", "TTGA")):
+            with open(fasta_path, "w") as handle:
+                for i in range(12):
+                    handle.write(f">{lab_id}_seq{i}\n{motif * (i + 20)}\n")
+            import_fasta(fasta_path, lab_id=lab_id)
+        self.snapshot_dir = os.path.join(self.tmpdir.name, "snapshot")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_prefix_partitions_and_lab_id_search(self):
+        from modules.snapshot import write_snapshot
+        from modules.search import search_snapshot
+
+        summary = write_snapshot(self.snapshot_dir, "prefix", chunksize=5, engine=self.engine)
+        self.assertEqual(summary["sequences"], 24)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.snapshot_dir, "genomic"))),
+                         ["partition=UL0", "partition=UL1"])
+
+        results = search_snapshot("UL150", self.snapshot_dir)
+        fasta = results[results["type"] == "fasta"]
+        self.assertEqual(len(fasta), 10)
+        self.assertEqual(fasta["value"].iloc[0], "TTGA" * 20)
+        self.assertIn("Extracted by UL150", results["value"].tolist())
+
+    def test_keyword_search_and_project_partitions(self):
+        from modules.snapshot import write_snapshot
+        from modules.search import search_snapshot
+
+        write_snapshot(self.snapshot_dir, "project", engine=self.engine)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.snapshot_dir, "metadata"))),
+                         ["partition=NSF_grant", "partition=unknown"])
+        results = search_snapshot("ttgattga", self.snapshot_dir)
+        self.assertEqual(set(results["lab_id"]), {"UL150"})
+        self.assertEqual(len(results), 5)
+
+    def test_results_snapshot(self):
+        from modules.snapshot import write_results_snapshot
+
+        path = os.path.join(self.tmpdir.name, "results.parquet")
+        df = pd.DataFrame({"lab_id": ["UL001"], "distance_km": [1.5]})
+        write_results_snapshot(df, path)
+        pd.testing.assert_frame_equal(pd.read_parquet(path), df)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy.orm import sessionmaker
+
+from modules.data_import import import_metadata
+from modules.delete import delete_metadata
+from modules.search import search_bbox, search_radius
+from modules.spatial import haversine_km, radius_boxes
+from db_helpers import make_test_engine
+from test_data_import import make_metadata_sheet
+
+
+class TestSpatialSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = make_test_engine(os.path.join(self.tmpdir.name, "test.sqlite"))
+        for target, value in (("modules.data_import.Session", sessionmaker(bind=self.engine)),
+                              ("modules.delete.engine", self.engine),
+                              ("modules.search.engine", self.engine)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        rng = random.Random(7)
+        self.points = {f"UL{i:03d}": (rng.uniform(-89, 89), rng.uniform(-180, 180)) for i in range(300)}
+        # Samples either side of the antimeridian
+        self.points["UL900"] = (10.0, 179.9)
+        self.points["UL901"] = (10.0, -179.9)
+        lab_ids = list(self.points)
+        sheet = make_metadata_sheet(lab_ids)
+        sheet["Latitude"] = [self.points[lab_id][0] for lab_id in lab_ids]
+        sheet["Longitude"] = [self.points[lab_id][1] for lab_id in lab_ids]
+        with patch("modules.data_import.pd.read_excel", return_value=sheet):
+            import_metadata("mock_file_path.xlsx")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def brute_force(self, lat, lon, radius_km):
+        return {lab_id for lab_id, (plat, plon) in self.points.items()
+                if haversine_km(lat, lon, plat, plon) <= radius_km}
+
+    def test_radius_matches_brute_force(self):
+        for lat, lon, radius in ((0, 0, 3000), (60, 100, 1500), (-85, 20, 800), (45, -170, 2500)):
+            results = search_radius(lat, lon, radius)
+            self.assertEqual(set(results["lab_id"]), self.brute_force(lat, lon, radius))
+            self.assertTrue(results["distance_km"].is_monotonic_increasing)
+
+    def test_radius_crosses_antimeridian(self):
+        results = search_radius(10.0, 179.95, 50)
+        self.assertEqual(set(results["lab_id"]) & {"UL900", "UL901"}, {"UL900", "UL901"})
+        self.assertEqual(len(radius_boxes(10.0, 179.95, 50)), 2)
+
+    def test_bbox_wraps_antimeridian(self):
+        results = search_bbox(9.0, 11.0, 179.0, -179.0)
+        self.assertEqual(set(results["lab_id"]), {"UL900", "UL901"})
+
+    def test_delete_and_reimport_update_index(self):
+        delete_metadata("UL900")
+        self.assertEqual(set(search_bbox(9.0, 11.0, 179.0, -179.0)["lab_id"]), {"UL901"})
+
+        sheet = make_metadata_sheet(["UL901"])
+        sheet["Latitude"] = [-40.0]
+        sheet["Longitude"] = [-179.95]
+        with patch("modules.data_import.pd.read_excel", return_value=sheet):
+            import_metadata("mock_file_path.xlsx")
+        self.assertTrue(search_bbox(9.0, 11.0, 179.0, -179.0).empty)
+        self.assertEqual(list(search_radius(-40.0, 179.95, 20)["lab_id"]), ["UL901"])
+
+
+if __name__ == "__main__":
+    unittest.main()
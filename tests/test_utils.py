@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from modules import utils
+
+
+class TestSharedEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = {
+            "database": {
+                "type": "sqlite",
+                "path": os.path.join(self.tmpdir.name, "shared.sqlite"),
+                "pool_size": 2,
+                "pragmas": {"synchronous": "OFF", "cache_size": -1024},
+            }
+        }
+        patcher = patch("modules.utils.load_config", return_value=self.config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        engine = utils._ENGINES.pop(f"sqlite:///{self.config['database']['path']}", None)
+        if engine is not None:
+            engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_engine_is_shared(self):
+        self.assertIs(utils.get_engine(), utils.get_engine())
+
+    def test_pragmas_and_functions_applied_on_connect(self):
+        with utils.get_engine().connect() as connection:
+            self.assertEqual(connection.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(connection.execute(text("PRAGMA synchronous")).scalar(), 0)
+            self.assertEqual(connection.execute(text("PRAGMA cache_size")).scalar(), -1024)
+            self.assertEqual(connection.execute(text("SELECT seq_decode('ACGT')")).scalar(), "ACGT")
+
+    def test_rejects_unsafe_pragmas(self):
+        self.config["database"]["pragmas"] = {"synchronous": "OFF; DROP TABLE Metadata"}
+        with self.assertRaises(ValueError):
+            with utils.get_engine().connect():
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()